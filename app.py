@@ -1,31 +1,388 @@
-from flask import Flask, request, jsonify
+import gzip
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from time import perf_counter
+from flask import Flask, Response, request, jsonify
 import yaml
 from flask_cors import CORS
-from pydna_cf_simulator.parse_CF_shorthand import parse_CF_shorthand
-from pydna_cf_simulator.simulate_CF import simulate_CF
+from pydna_cf_simulator.parse_CF_shorthand import parse_CF_shorthand, make_sequence
+from pydna_cf_simulator.simulate_batch import simulate_batch, init_worker_cache, WORKER_DIED
+from pydna_cf_simulator.step_cache import StepCache
+from pydna_cf_simulator.digest_cache import shared_cache as shared_digest_cache
+from pydna_cf_simulator.amplicon_finder import index_cache
+from pydna_cf_simulator.primer_search import mask_cache
+from pydna_cf_simulator.persistent_step_cache import SQLiteStepCache
+from pydna_cf_simulator.simulation_session import SimulationSession
+from pydna_cf_simulator.plan_CF import final_products
+from pydna_cf_simulator.result_encoding import encode_polynucleotide, SEQUENCE_FORMATS
+from pydna_cf_simulator.sequence_store import SequenceStore
+from pydna_cf_simulator.warm_start import warm_context
+from pydna_cf_simulator.limits import SimulationLimits, LimitExceeded, KillableWorkerPool, check_limits, iter_simulate_limited
 
 app = Flask(__name__)
 CORS(app)
 
-@app.route('/simulate', methods=['POST'])
-def simulate():
-    cf_shorthand = request.json['cf']
-    cf = parse_CF_shorthand(cf_shorthand)
-    result = simulate_CF(cf)
-    return jsonify({k: vars(v) for k, v in result.items()})
+# Number of worker processes used by /simulate_batch (default: one per CPU)
+BATCH_PROCESSES = int(os.environ.get('CF_SIMULATOR_PROCESSES', os.cpu_count() or 1))
+batch_executor = None
 
-@app.route('/.well-known/ai-plugin.json')
-def serve_plugin_json():
+# The worker pools are made on first use, by whichever request thread comes first
+pools_lock = threading.Lock()
+
+# Products of PCR, Digest, Ligate and Gibson steps shared between requests,
+# optionally backed by a SQLite file that survives restarts
+CACHE_BYTES = int(os.environ.get('CF_SIMULATOR_CACHE_BYTES', 64 * 1024 * 1024))
+CACHE_PATH = os.environ.get('CF_SIMULATOR_CACHE_PATH')
+CACHE_PATH_BYTES = int(os.environ.get('CF_SIMULATOR_CACHE_PATH_BYTES', 1024 * 1024 * 1024))
+persistent_cache = SQLiteStepCache(CACHE_PATH, CACHE_PATH_BYTES) if CACHE_PATH else None
+step_cache = StepCache(CACHE_BYTES, persistent_cache)
+
+# Restriction maps and fragments of digested sequences, shared by all
+# simulations in the server process
+shared_digest_cache.max_bytes = int(os.environ.get('CF_SIMULATOR_DIGEST_CACHE_BYTES', 64 * 1024 * 1024))
+
+# Seed indexes and mismatch masks of PCR templates, shared by all simulations in the server process
+index_cache.max_bytes = int(os.environ.get('CF_SIMULATOR_INDEX_CACHE_BYTES', index_cache.max_bytes))
+mask_cache.max_bytes = int(os.environ.get('CF_SIMULATOR_MASK_CACHE_BYTES', mask_cache.max_bytes))
+
+# Sessions of /simulate requests that resubmit edited CFs, least recently
+# used first
+SESSION_LIMIT = int(os.environ.get('CF_SIMULATOR_SESSIONS', 256))
+sessions = OrderedDict()
+sessions_lock = threading.Lock()
+
+# Sequences uploaded to /sequences that CFs refer to as @ID
+STORE_SIZE = int(os.environ.get('CF_SIMULATOR_STORE_SIZE', 1024))
+sequence_store = SequenceStore(STORE_SIZE)
+
+# Limits of each /simulate request, which a request may lower (default: none).
+# With a time limit, simulations run in worker processes that are killed
+# when they run over.
+def optional_number(name, kind):
+    value = os.environ.get(name)
+    return kind(value) if value else None
+
+server_limits = SimulationLimits(optional_number('CF_SIMULATOR_MAX_LENGTH', int),
+                                 optional_number('CF_SIMULATOR_MAX_STEPS', int),
+                                 optional_number('CF_SIMULATOR_MAX_SECONDS', float))
+limited_pool = None
+# Threads that wait on the killable workers for the CFs of time-limited batches
+limited_threads = None
+
+# Mismatches PCR primers may have in their 3' end, for requests that do not
+# give "pcr_mismatches" (default: none, exact 3' match as in pydna)
+PCR_MISMATCHES = optional_number('CF_SIMULATOR_PCR_MISMATCHES', int)
+
+def get_session(session_id):
+    with sessions_lock:
+        session = sessions.get(session_id)
+        if session is None:
+            session = sessions[session_id] = SimulationSession(step_cache)
+            while len(sessions) > SESSION_LIMIT:
+                sessions.popitem(last=False)
+        sessions.move_to_end(session_id)
+        return session
+
+def get_limited_pool():
+    global limited_pool
+    with pools_lock:
+        if limited_pool is None:
+            limited_pool = KillableWorkerPool(BATCH_PROCESSES)
+        return limited_pool
+
+def get_limited_threads():
+    global limited_threads
+    with pools_lock:
+        if limited_threads is None:
+            limited_threads = ThreadPoolExecutor(max_workers=BATCH_PROCESSES, thread_name_prefix='limited-batch')
+        return limited_threads
+
+class InvalidRequest(ValueError):
+    # A request body with a malformed option, answered with HTTP 400
+    pass
+
+def request_limits(body):
+    """
+    Return the server's limits, lowered by any in the request's "limits".
+    Raises InvalidRequest unless each requested limit is a known one and a
+    non-negative integer, or a positive number of seconds.
+    """
+    requested = body.get('limits') or {}
+    if not isinstance(requested, dict):
+        raise InvalidRequest('"limits" must be an object.')
+    unknown = sorted(set(requested) - set(SimulationLimits._fields))
+    if unknown:
+        raise InvalidRequest(f"Unknown limit(s) {', '.join(unknown)}; use {', '.join(SimulationLimits._fields)}.")
+    limits = []
+    for field, server_value in zip(SimulationLimits._fields, server_limits):
+        value = requested.get(field)
+        if value is not None:
+            check_limit_value(field, value)
+        if value is None or (server_value is not None and server_value < value):
+            value = server_value
+        limits.append(value)
+    return SimulationLimits(*limits)
+
+def check_limit_value(field, value):
+    if field == 'max_seconds':
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not value > 0:
+            raise InvalidRequest(f"The limit {field} must be a positive number, but it is {value!r}.")
+    elif isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise InvalidRequest(f"The limit {field} must be a non-negative integer, but it is {value!r}.")
+
+def iter_products(cf, targets, body, limits, on_step):
+    """
+    Yield the output name and product of each step simulated for a
+    /simulate request: in the request's session, in a killable worker
+    process when there is a time limit, or here.
+    """
+    session_id = body.get('session')
+    if session_id is not None:
+        # Sessions keep their products in this process, so only the limits
+        # that can be checked before simulating apply
+        check_limits(cf, limits, targets)
+        return get_session(session_id).iter_simulate(cf, targets, on_step=on_step)
+    if limits.max_seconds is not None:
+        return get_limited_pool().iter_simulate(cf, limits, targets, on_step)
+    return iter_simulate_limited(cf, limits, step_cache, targets, on_step)
+
+def get_batch_executor():
+    global batch_executor
+    with pools_lock:
+        if batch_executor is None:
+            batch_executor = ProcessPoolExecutor(max_workers=BATCH_PROCESSES, mp_context=warm_context(),
+                                                 initializer=init_worker_cache, initargs=(CACHE_BYTES, persistent_cache))
+        return batch_executor
+
+def apply_pcr_mismatches(cf, body):
+    # Let the CF's PCRs anneal with the request's (or the server's) number of
+    # mismatches, unless a step sets its own
+    mismatches = body.get('pcr_mismatches', PCR_MISMATCHES)
+    if mismatches is None:
+        return
+    if isinstance(mismatches, bool) or not isinstance(mismatches, int) or mismatches < 0:
+        raise InvalidRequest(f'"pcr_mismatches" must be a non-negative integer, but it is {mismatches!r}.')
+    for step in cf.steps:
+        if step.operation == 'PCR' and step.max_mismatches is None:
+            step.max_mismatches = mismatches
+
+def result_targets(cf, body):
+    """
+    Return the names a /simulate request asks for, or None for every
+    sequence and product. "include" narrows "targets" (or the whole CF) to
+    the products of steps ("products") or to the products no other step
+    uses ("final").
+    """
+    targets = body.get('targets')
+    include = body.get('include', 'all')
+    if include == 'all':
+        return targets
+    if include == 'products':
+        names = targets if targets is not None else [step.output for step in cf.steps]
+        return [name for name in names if name not in cf.sequences]
+    if include == 'final':
+        final = final_products(cf)
+        return final if targets is None else [name for name in targets if name in final]
+    raise InvalidRequest(f"Unknown include option '{include}'; use one of all, products, final.")
+
+def sequence_format(body):
+    # The request's "sequences" format, checked before anything is simulated
+    sequences = body.get('sequences', 'full')
+    if sequences not in SEQUENCE_FORMATS:
+        raise InvalidRequest(f"Unknown sequence format {sequences!r}; use one of {', '.join(SEQUENCE_FORMATS)}.")
+    return sequences
+
+def simulate_response(body):
+    """
+    Simulate the CF of a /simulate request body and return the response
+    data; shared by this app and the ASGI front end in asgi.py. With
+    "stream", a generator of NDJSON lines is returned instead.
+    """
+    limits = request_limits(body)
+    sequences = sequence_format(body)
+    cf = parse_CF_shorthand(body['cf'], sequence_store)
+    apply_pcr_mismatches(cf, body)
+    targets = result_targets(cf, body)
+    if body.get('stream'):
+        return simulate_stream(cf, targets, body, limits)
+    records = [] if body.get('instrument') else None
+    on_step = records.append if records is not None else None
+    result = dict(cf.sequences)
+    for name, product in iter_products(cf, targets, body, limits, on_step):
+        result[name] = product
+    # In the same order as simulate_CF
+    if targets is not None:
+        result = {name: result[name] for name in targets}
+    else:
+        for step in cf.steps:
+            result[step.output] = result.pop(step.output)
+    products = {k: encode_polynucleotide(v, sequences) for k, v in result.items()}
+    if records is not None:
+        return {'products': products, 'steps': [record._asdict() for record in records]}
+    return products
+
+def simulate_stream(cf, targets, body, limits):
+    """
+    Yield the NDJSON lines of a streamed /simulate response: one
+    {"name": ..., "product": {...}} line for each entry of the usual
+    response, the sequences first and each step's product as soon as the
+    step finishes, then a {"summary": {...}} line. An error ends the stream
+    with an {"error": "..."} line.
+    """
+    start = perf_counter()
+    sequences = body.get('sequences', 'full')
+    records = [] if body.get('instrument') else None
+    on_step = records.append if records is not None else None
+    wanted = set(targets) if targets is not None else None
+    count = 0
+    try:
+        for name, poly in cf.sequences.items():
+            if wanted is None or name in wanted:
+                count += 1
+                yield json.dumps({'name': name, 'product': encode_polynucleotide(poly, sequences)}) + '\n'
+        for name, product in iter_products(cf, targets, body, limits, on_step):
+            if wanted is None or name in wanted:
+                count += 1
+                yield json.dumps({'name': name, 'product': encode_polynucleotide(product, sequences)}) + '\n'
+    except LimitExceeded as e:
+        yield json.dumps(e.to_dict()) + '\n'
+        return
+    except Exception as e:
+        yield json.dumps({'error': str(e)}) + '\n'
+        return
+    summary = {'products': count, 'seconds': perf_counter() - start}
+    if records is not None:
+        summary['steps'] = [record._asdict() for record in records]
+    yield json.dumps({'summary': summary}) + '\n'
+
+def gzip_json(data):
+    # Response body of a request with "compress"
+    return gzip.compress(json.dumps(data).encode(), compresslevel=6)
+
+def json_response(data, body):
+    if body.get('compress'):
+        return Response(gzip_json(data), mimetype='application/json', headers={'Content-Encoding': 'gzip'})
+    return jsonify(data)
+
+def register_response(body):
+    # Register the sequence of a /sequences request body and return its ID
+    poly = make_sequence(body['sequence'], body.get('type'))
+    return {'id': sequence_store.register(poly)}
+
+def sequence_response(sequence_id):
+    # The registered sequence with an ID, or None
+    poly = sequence_store.get(sequence_id)
+    return poly.to_dict() if poly is not None else None
+
+def simulate_batch_response(body):
+    """
+    Simulate the CFs of a /simulate_batch request body, each under the
+    request's limits: on the batch workers, or on killable workers when
+    there is a time limit.
+    """
+    limits = request_limits(body)
+    cfs = [resolve_stored_sequences(cf_shorthand) for cf_shorthand in body['cfs']]
+    if limits.max_seconds is not None:
+        pool = get_limited_pool()
+        results = list(get_limited_threads().map(lambda cf: simulate_killable(cf, limits, pool), cfs))
+    else:
+        executor = get_batch_executor()
+        results = simulate_batch(cfs, executor=executor, limits=limits if limits != SimulationLimits() else None)
+        if any(result.get('error') == WORKER_DIED for result in results):
+            discard_batch_executor(executor)
+    response = []
+    for result in results:
+        if 'result' in result:
+            result = {'result': {k: v.to_dict() for k, v in result['result'].items()}}
+        response.append(result)
+    return response
+
+def discard_batch_executor(executor):
+    # A pool with a dead worker takes no more work; the next batch starts a new one
+    global batch_executor
+    with pools_lock:
+        if batch_executor is executor:
+            batch_executor = None
+    executor.shutdown(wait=False)
+
+def resolve_stored_sequences(cf_shorthand):
+    """
+    Return a batch CF that refers to registered sequences parsed here, where
+    the sequence store is, so the workers receive the sequences themselves.
+    Other CFs, and ones that fail to parse, are left for the workers to parse
+    and report on.
+    """
+    if not isinstance(cf_shorthand, str) or '@' not in cf_shorthand:
+        return cf_shorthand
+    try:
+        return parse_CF_shorthand(cf_shorthand, sequence_store)
+    except ValueError:
+        return cf_shorthand
+
+def simulate_killable(cf, limits, pool):
+    # One CF of a time-limited batch, with any error returned as simulate_batch does
+    try:
+        if isinstance(cf, str):
+            cf = parse_CF_shorthand(cf)
+        result = dict(cf.sequences)
+        result.update(pool.iter_simulate(cf, limits))
+        return {'result': result}
+    except LimitExceeded as e:
+        return e.to_dict()
+    except Exception as e:
+        return {'error': str(e)}
+
+def plugin_json():
     with open('ai-plugin.json', 'r') as f:
         plugin_json = yaml.safe_load(f)
     with open('docs/cf_shorthand_specification.md', 'r') as f:
         plugin_json['description_for_model'] += '\n\n' + f.read()
-    return jsonify(plugin_json)
+    return plugin_json
 
-@app.route('/openapi.yaml')
-def serve_openapi_yaml():
+def openapi_yaml():
     with open('openapi.yaml', 'r') as f:
         return f.read()
 
+@app.errorhandler(LimitExceeded)
+def limit_exceeded(e):
+    return jsonify(e.to_dict()), 422
+
+@app.errorhandler(InvalidRequest)
+def invalid_request(e):
+    return jsonify({'error': str(e)}), 400
+
+@app.route('/simulate', methods=['POST'])
+def simulate():
+    response = simulate_response(request.json)
+    if request.json.get('stream'):
+        return Response(response, mimetype='application/x-ndjson')
+    return json_response(response, request.json)
+
+@app.route('/simulate_batch', methods=['POST'])
+def simulate_batch_endpoint():
+    return json_response(simulate_batch_response(request.json), request.json)
+
+@app.route('/sequences', methods=['POST'])
+def register_sequence():
+    return json_response(register_response(request.json), request.json)
+
+@app.route('/sequences/<sequence_id>')
+def get_sequence(sequence_id):
+    poly = sequence_response(sequence_id)
+    if poly is None:
+        return jsonify({'error': f"Unknown sequence ID '{sequence_id}'."}), 404
+    return jsonify(poly)
+
+@app.route('/.well-known/ai-plugin.json')
+def serve_plugin_json():
+    return jsonify(plugin_json())
+
+@app.route('/openapi.yaml')
+def serve_openapi_yaml():
+    return openapi_yaml()
+
 if __name__ == '__main__':
     app.run(port=8234)
\ No newline at end of file
@@ -0,0 +1,320 @@
+import asyncio
+import functools
+import json
+import os
+import signal
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from pydna_cf_simulator.limits import LimitExceeded
+from pydna_cf_simulator.warm_start import warm_up
+from app import InvalidRequest, simulate_response, simulate_batch_response, register_response, sequence_response, plugin_json, openapi_yaml, gzip_json
+
+# Threads running /simulate and /simulate_batch requests (default: one per CPU)
+WORKERS = int(os.environ.get('CF_SIMULATOR_WORKERS', os.cpu_count() or 1))
+# Requests that may wait for a free worker before new ones get a 429
+QUEUE_LIMIT = int(os.environ.get('CF_SIMULATOR_QUEUE', 32))
+# Seconds a request may wait for a free worker before it gets a 503
+QUEUE_TIMEOUT = float(os.environ.get('CF_SIMULATOR_QUEUE_TIMEOUT', 30))
+
+
+class QueueFull(Exception):
+    pass
+
+
+class QueueTimeout(Exception):
+    pass
+
+
+class WorkerPool:
+    """
+    Runs blocking request handlers on a bounded pool of threads.
+
+    At most `workers` handlers run at once and at most `queue_limit` wait
+    for a free worker; run raises QueueFull when a request arrives with the
+    queue full, and QueueTimeout when it waited `queue_timeout` seconds
+    without getting a worker. Handlers never queue inside the executor, so
+    a request that gives up waiting costs nothing.
+    """
+    def __init__(self, workers=WORKERS, queue_limit=QUEUE_LIMIT, queue_timeout=QUEUE_TIMEOUT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.queue_timeout = queue_timeout
+        self.pending = 0
+        self._slots = asyncio.Semaphore(workers)
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    async def run(self, function, *args):
+        if self.pending >= self.workers + self.queue_limit:
+            raise QueueFull()
+        self.pending += 1
+        try:
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise QueueTimeout() from None
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._executor, functools.partial(function, *args))
+            finally:
+                self._slots.release()
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def send_response(send, status, body, content_type='application/json', headers=()):
+    if not isinstance(body, bytes):
+        body = json.dumps(body).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type.encode()),
+                    (b'content-length', str(len(body)).encode()),
+                    (b'access-control-allow-origin', b'*'),
+                    *headers],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+# NDJSON lines a streaming response may hold before its worker waits for the client
+STREAM_BUFFER = 16
+
+
+class StreamClosed(Exception):
+    pass
+
+
+def handle_json(handler, body, emit):
+    """
+    Run a handler on the decoded request body; on a worker, so that decoding
+    a large CF does not hold up the event loop. A handler that returns a
+    generator of lines is run to the end here, passing each line to `emit`
+    and then None. With "compress", the response is returned gzipped.
+    """
+    body = json.loads(body)
+    result = handler(body)
+    if isinstance(result, (dict, list)):
+        return gzip_json(result) if body.get('compress') else result
+    try:
+        for line in result:
+            emit(line.encode())
+    finally:
+        result.close()
+        emit(None)
+    return None
+
+
+class SimulatorApp:
+    """
+    ASGI front end of the simulator.
+
+    /simulate, /simulate_batch and POST /sequences run on a WorkerPool; when
+    its queue is full they answer 429, and when a request waits too long for
+    a worker, 503, both with a Retry-After header. /openapi.yaml,
+    /.well-known/ai-plugin.json and GET /sequences/ID are served on the
+    event loop itself and so stay responsive however busy the workers are.
+    """
+    post_routes = {
+        '/simulate': simulate_response,
+        '/simulate_batch': simulate_batch_response,
+        '/sequences': register_response,
+    }
+
+    def __init__(self, pool=None):
+        self._pool = pool
+
+    @property
+    def pool(self):
+        # Created on first use, inside the server's event loop
+        if self._pool is None:
+            self._pool = WorkerPool()
+        return self._pool
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self._pool is not None:
+                    self._pool.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope, receive, send):
+        path, method = scope['path'], scope['method']
+        if method == 'OPTIONS':
+            requested = dict(scope['headers']).get(b'access-control-request-headers', b'')
+            await send_response(send, 204, b'', headers=[(b'access-control-allow-methods', b'GET, POST, OPTIONS'),
+                                                         (b'access-control-allow-headers', requested)])
+        elif path == '/openapi.yaml' and method == 'GET':
+            await send_response(send, 200, openapi_yaml().encode(), 'text/yaml; charset=utf-8')
+        elif path == '/.well-known/ai-plugin.json' and method == 'GET':
+            await send_response(send, 200, plugin_json())
+        elif path.startswith('/sequences/') and method == 'GET':
+            sequence_id = path[len('/sequences/'):]
+            poly = sequence_response(sequence_id)
+            if poly is None:
+                await send_response(send, 404, {'error': f"Unknown sequence ID '{sequence_id}'."})
+            else:
+                await send_response(send, 200, poly)
+        elif path in self.post_routes and method == 'POST':
+            await self.simulate(self.post_routes[path], receive, send)
+        elif path in self.post_routes or path in ('/openapi.yaml', '/.well-known/ai-plugin.json'):
+            await send_response(send, 405, {'error': f'Method {method} is not allowed for {path}.'})
+        else:
+            await send_response(send, 404, {'error': f'No route for {path}.'})
+
+    async def simulate(self, handler, receive, send):
+        body = await read_body(receive)
+        if body is None:
+            return
+        loop = asyncio.get_running_loop()
+        lines = asyncio.Queue(STREAM_BUFFER)
+        closed = threading.Event()
+
+        def emit(line):
+            # Called on the worker; waits while the buffer is full
+            if closed.is_set() and line is not None:
+                raise StreamClosed()
+            asyncio.run_coroutine_threadsafe(lines.put(line), loop).result()
+
+        task = asyncio.ensure_future(self.pool.run(handle_json, handler, body, emit))
+        first = asyncio.ensure_future(lines.get())
+        await asyncio.wait({task, first}, return_when=asyncio.FIRST_COMPLETED)
+        if first.done():
+            await self.stream(first.result(), lines, closed, send)
+        else:
+            first.cancel()
+        await self.respond(task, send)
+
+    async def stream(self, line, lines, closed, send):
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(b'content-type', b'application/x-ndjson'), (b'access-control-allow-origin', b'*')],
+        })
+        try:
+            while line is not None:
+                await send({'type': 'http.response.body', 'body': line, 'more_body': True})
+                line = await lines.get()
+            await send({'type': 'http.response.body', 'body': b''})
+        except Exception:
+            # The client went away; stop the worker at its next line
+            closed.set()
+            while line is not None:
+                line = await lines.get()
+
+    async def respond(self, task, send):
+        retry = [(b'retry-after', b'1')]
+        try:
+            result = await task
+        except QueueFull:
+            await send_response(send, 429, {'error': 'Too many simulations are queued; try again later.'}, headers=retry)
+        except QueueTimeout:
+            await send_response(send, 503, {'error': 'No simulation worker became free in time; try again later.'}, headers=retry)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            await send_response(send, 400, {'error': 'The request body is not valid JSON.'})
+        except StreamClosed:
+            pass
+        except LimitExceeded as e:
+            await send_response(send, 422, e.to_dict())
+        except InvalidRequest as e:
+            await send_response(send, 400, {'error': str(e)})
+        except Exception as e:
+            await send_response(send, 500, {'error': str(e)})
+        else:
+            if isinstance(result, bytes):
+                await send_response(send, 200, result, headers=[(b'content-encoding', b'gzip')])
+            elif result is not None:
+                await send_response(send, 200, result)
+
+
+def serve_preforked(app, host='127.0.0.1', port=8234, processes=WORKERS):
+    """
+    Serve `app` from `processes` server processes forked from this one once
+    it has warmed up, so that each starts with pydna and the enzyme tables
+    already loaded and shares their memory with the others. A process that
+    exits is replaced until SIGINT or SIGTERM stops them all.
+    """
+    import uvicorn
+
+    warm_up()
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(2048)
+    children = set()
+    stopping = False
+
+    def fork():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            status = 1
+            try:
+                uvicorn.Server(uvicorn.Config(app, lifespan='on')).run(sockets=[listener])
+                status = 0
+            finally:
+                os._exit(status)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for _ in range(processes):
+        fork()
+    while children:
+        try:
+            pid, _ = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            fork()
+    listener.close()
+
+
+app = SimulatorApp()
+
+if __name__ == '__main__':
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description='Serve the CF simulator.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8234)
+    parser.add_argument('--prefork', type=int, metavar='PROCESSES',
+                        help='warm up once, then fork this many server processes sharing the port')
+    args = parser.parse_args()
+    if args.prefork:
+        serve_preforked(app, args.host, args.port, args.prefork)
+    else:
+        uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,154 @@
+import json
+import random
+
+from pydna_cf_simulator.amplicon_finder import SEED_LENGTH
+from pydna_cf_simulator.sequence_kernels import reverse_complement
+from pydna_cf_simulator.restriction_scanner import default_scanner
+
+# Enzymes used to cut PCR products and vectors for ligation
+CLONING_ENZYMES = ['EcoRI', 'BamHI', 'XhoI', 'SpeI', 'XbaI', 'PstI', 'HindIII', 'NotI', 'KpnI', 'SacI', 'SalI', 'BglII']
+GOLDEN_GATE_ENZYMES = ['BsaI', 'BsmBI', 'BbsI']
+
+PRIMER_LENGTH = 22
+
+
+def random_dna(rng, length, avoid=()):
+    # Random sequence without the sites of the `avoid` enzymes
+    while True:
+        sequence = ''.join(rng.choices('ACGT', k=length))
+        if not sites(sequence, avoid):
+            return sequence
+
+
+def sites(sequence, enzymes):
+    # Enzymes among `enzymes` with a recognition site in the sequence
+    return {name for _, name, _, _ in default_scanner().find_sites(sequence, False) if name in enzymes}
+
+
+def enzyme_site(name):
+    return str(default_scanner().enzymes[name].site)
+
+
+def unique_seed(template, primer):
+    # Whether the 3' seed of a primer anneals once to the template
+    seed = primer[-SEED_LENGTH:]
+    return template.count(seed) + reverse_complement(template).count(seed) == 1
+
+
+def pick_amplicon(rng, template, length):
+    # Primers amplifying `length` bases of the template, with unique seeds
+    while True:
+        start = rng.randrange(0, len(template) - length)
+        forward = template[start:start + PRIMER_LENGTH]
+        reverse = reverse_complement(template[start + length - PRIMER_LENGTH:start + length])
+        if unique_seed(template, forward) and unique_seed(template, reverse):
+            return forward, reverse, template[start:start + length]
+
+
+def CF_to_JSON(construction_file):
+    # The JSON form of a ConstructionFile, as read by parse_CF_JSON
+    steps = []
+    for step in construction_file.steps:
+        steps.append({key: value for key, value in vars(step).items() if value is not None})
+    sequences = {name: poly.to_dict() for name, poly in construction_file.sequences.items()}
+    return json.dumps({'steps': steps, 'sequences': sequences})
+
+
+class CFBuilder:
+    """
+    Collects the steps and sequences of a random CF and writes it as
+    shorthand.
+    """
+    def __init__(self):
+        self.lines = []
+        self.sequences = {}
+
+    def step(self, *elements):
+        self.lines.append(' '.join(str(element) for element in elements))
+
+    def sequence(self, kind, name, sequence):
+        self.sequences[name] = (kind, sequence)
+
+    def shorthand(self):
+        lines = list(self.lines)
+        lines += [f'{kind} {name} {sequence}' for name, (kind, sequence) in self.sequences.items()]
+        return '\n'.join(lines) + '\n'
+
+
+def add_cloning(builder, rng, index, template, amplicon_length):
+    """
+    PCR a piece of the template with primers adding two restriction sites,
+    cut it and a vector with the same enzymes, ligate and transform.
+    """
+    while True:
+        first, second = rng.sample(CLONING_ENZYMES, 2)
+        forward, reverse, amplicon = pick_amplicon(rng, template, amplicon_length)
+        if not sites(amplicon, {first, second}):
+            break
+    forward = 'CCATA' + enzyme_site(first) + forward
+    reverse = 'CTGAT' + enzyme_site(second) + reverse
+    # The backbone runs from the second site round to the first
+    vector = random_dna(rng, 2000, [first, second]) + enzyme_site(first) + 'ACTG' + enzyme_site(second)
+
+    builder.step('PCR', f'clone{index}F', f'clone{index}R', 'template', f'pcr{index}')
+    builder.step('Digest', f'pcr{index}', f'{first},{second}', 1, f'insert{index}')
+    builder.step('Digest', f'vector{index}', f'{first},{second}', 1, f'backbone{index}')
+    builder.step('Ligate', f'insert{index}', f'backbone{index}', f'lig{index}')
+    builder.step('Transform', f'lig{index}', 'Mach1', 'Amp', f'clone{index}')
+    builder.sequence('oligo', f'clone{index}F', forward)
+    builder.sequence('oligo', f'clone{index}R', reverse)
+    builder.sequence('plasmid', f'vector{index}', vector)
+
+
+def add_gibson(builder, rng, index, parts, part_length, overlap=30):
+    # Gibson assembly of `parts` linear fragments of a random plasmid
+    circle = random_dna(rng, parts * part_length)
+    names = [f'gibson{index}_{k}' for k in range(parts)]
+    for k, name in enumerate(names):
+        builder.sequence('dsdna', name, (circle * 2)[k * part_length:(k + 1) * part_length + overlap])
+    builder.step('Gibson', *names, f'gibson{index}')
+    builder.step('Transform', f'gibson{index}', 'Mach1', 'Amp', f'gibsonclone{index}')
+
+
+def add_golden_gate(builder, rng, index, parts, part_length):
+    # MoClo-style assembly of `parts` part plasmids into a destination vector
+    enzyme = rng.choice(GOLDEN_GATE_ENZYMES)
+    site = enzyme_site(enzyme)
+    overhangs = []
+    while len(overhangs) < parts + 1:
+        overhang = ''.join(rng.choices('ACGT', k=4))
+        if overhang != reverse_complement(overhang) and not {overhang, reverse_complement(overhang)} & set(overhangs):
+            overhangs.append(overhang)
+
+    # Enzyme site, spacer to the cut, overhang ... overhang, spacer, site
+    spacer = 'A' * (default_scanner().enzymes[enzyme].fst5 - len(site))
+    def flanked(left, insert, right):
+        return site + spacer + left + insert + right + reverse_complement(spacer) + reverse_complement(site)
+
+    names = [f'gg{index}_vector'] + [f'gg{index}_{k}' for k in range(parts)]
+    builder.sequence('plasmid', names[0], flanked(overhangs[parts], random_dna(rng, 2000, [enzyme]), overhangs[0]) + random_dna(rng, 200, [enzyme]))
+    for k in range(parts):
+        insert = random_dna(rng, part_length, [enzyme])
+        builder.sequence('plasmid', names[k + 1], flanked(overhangs[k], insert, overhangs[k + 1]) + random_dna(rng, 1000, [enzyme]))
+    builder.step('GoldenGate', *names, enzyme, f'gg{index}')
+    builder.step('Transform', f'gg{index}', 'Mach1', 'Amp', f'ggclone{index}')
+
+
+def generate_CF(template_length, cloning_steps=1, gibson_parts=0, golden_gate_parts=0, amplicon_length=1000, seed=0):
+    """
+    Return a CFBuilder holding a random, valid CF with a template of
+    `template_length` bases, `cloning_steps` PCR/Digest/Ligate/Transform
+    routes from it, and optionally a Gibson and a GoldenGate assembly of the
+    given number of parts.
+    """
+    rng = random.Random(seed)
+    builder = CFBuilder()
+    template = ''.join(rng.choices('ACGT', k=template_length))
+    builder.sequence('plasmid', 'template', template)
+    for index in range(cloning_steps):
+        add_cloning(builder, rng, index, template, min(amplicon_length, template_length // 2))
+    if gibson_parts:
+        add_gibson(builder, rng, 0, gibson_parts, 500)
+    if golden_gate_parts:
+        add_golden_gate(builder, rng, 0, golden_gate_parts, 300)
+    return builder
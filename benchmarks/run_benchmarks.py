@@ -0,0 +1,210 @@
+"""
+Time the parsers, simulate_CF and the conversion functions on random CFs of
+increasing size and write the results as JSON, so that runs from different
+releases can be compared.
+
+    python -m benchmarks.run_benchmarks --output results.json
+    python -m benchmarks.run_benchmarks --compare baseline.json results.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from time import perf_counter
+
+from pydna_cf_simulator import instrumentation
+from pydna_cf_simulator.parse_CF_shorthand import parse_CF_shorthand
+from pydna_cf_simulator.parse_CF_JSON import parse_CF_JSON
+from pydna_cf_simulator.simulate_CF import simulate_CF
+from pydna_cf_simulator.polynucleotide_to_dseqrecord import polynucleotide_to_dseqrecord
+from pydna_cf_simulator.dseqrecord_to_polynucleotide import dseqrecord_to_polynucleotide
+from pydna_cf_simulator.amplicon_finder import index_cache
+from pydna_cf_simulator.primer_search import mask_cache
+from pydna_cf_simulator.digest_cache import shared_cache as shared_digest_cache
+
+from .generate_CF import generate_CF, CF_to_JSON
+
+# (name, template_length, cloning_steps, gibson_parts, golden_gate_parts)
+CASES = [
+    ('1kb', 1000, 1, 2, 2),
+    ('10kb', 10000, 2, 4, 4),
+    ('100kb', 100000, 4, 6, 6),
+    ('1Mb', 1000000, 8, 8, 8),
+    ('5Mb', 5000000, 8, 10, 10),
+]
+
+# Times more than this factor slower than the baseline are regressions
+REGRESSION_FACTOR = 1.5
+
+
+def best_of(repeat, function, *args):
+    # Fastest of `repeat` calls, with the last result
+    best = None
+    for _ in range(repeat):
+        start = perf_counter()
+        result = function(*args)
+        seconds = perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def clear_caches():
+    # Empty the process-wide caches of template indexes, template masks and
+    # digests, so that the next simulation builds what it needs again
+    index_cache.clear()
+    mask_cache.clear()
+    shared_digest_cache.clear()
+
+
+def run_case(name, template_length, cloning_steps, gibson_parts, golden_gate_parts, repeat=3, seed=0):
+    """
+    Return the timings of one generated CF: both parsers, the whole
+    simulation, the total per operation over its steps, and both conversion
+    functions on the template.
+
+    The simulation is timed cold, with the process-wide caches cleared
+    before every repeat, and warm, run again straight after on the caches
+    the cold run filled. The per-operation totals are those of the cold run.
+    """
+    builder = generate_CF(template_length, cloning_steps, gibson_parts, golden_gate_parts, seed=seed)
+    shorthand = builder.shorthand()
+    parse_shorthand_seconds, cf = best_of(repeat, parse_CF_shorthand, shorthand)
+    cf_json = CF_to_JSON(cf)
+    parse_json_seconds, _ = best_of(repeat, parse_CF_JSON, cf_json)
+
+    operations = {}
+    records = []
+    simulate_seconds = None
+    warm_seconds = None
+    for _ in range(repeat):
+        clear_caches()
+        records.clear()
+        start = perf_counter()
+        simulate_CF(cf, on_step=records.append)
+        seconds = perf_counter() - start
+        start = perf_counter()
+        simulate_CF(cf)
+        warm = perf_counter() - start
+        warm_seconds = warm if warm_seconds is None else min(warm_seconds, warm)
+        if simulate_seconds is None or seconds < simulate_seconds:
+            simulate_seconds = seconds
+            operations = {}
+            for record in records:
+                totals = operations.setdefault(record.operation, {'count': 0, 'seconds': 0.0})
+                totals['count'] += 1
+                totals['seconds'] += record.seconds
+
+    template = cf.sequences['template']
+    to_dseqrecord_seconds, dseqrecord = best_of(repeat, polynucleotide_to_dseqrecord, template)
+    to_polynucleotide_seconds, _ = best_of(repeat, dseqrecord_to_polynucleotide, dseqrecord, template.mod_ext5, template.mod_ext3)
+
+    return {
+        'name': name,
+        'template_length': template_length,
+        'cloning_steps': cloning_steps,
+        'gibson_parts': gibson_parts,
+        'golden_gate_parts': golden_gate_parts,
+        'steps': len(cf.steps),
+        'shorthand_bytes': len(shorthand),
+        'timings': {
+            'parse_CF_shorthand': parse_shorthand_seconds,
+            'parse_CF_JSON': parse_json_seconds,
+            'simulate_CF': simulate_seconds,
+            'simulate_CF_warm': warm_seconds,
+            'polynucleotide_to_dseqrecord': to_dseqrecord_seconds,
+            'dseqrecord_to_polynucleotide': to_polynucleotide_seconds,
+        },
+        'operations': operations,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(cases=CASES, repeat=3, seed=0):
+    """
+    Run every case and return the results with the environment they were
+    measured in.
+    """
+    # The hooks would add their own cost to the timings
+    saved_hooks = list(instrumentation.hooks)
+    instrumentation.hooks.clear()
+    try:
+        results = [run_case(*case, repeat=repeat, seed=seed) for case in cases]
+    finally:
+        instrumentation.hooks[:] = saved_hooks
+    return {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'commit': git_commit(),
+        'repeat': repeat,
+        'seed': seed,
+        'cases': results,
+    }
+
+
+def compare(baseline, current, factor=REGRESSION_FACTOR):
+    """
+    Return (case, measurement, baseline seconds, current seconds) for every
+    timing in `current` more than `factor` times slower than in `baseline`.
+    """
+    before = {case['name']: case for case in baseline['cases']}
+    regressions = []
+    for case in current['cases']:
+        old = before.get(case['name'])
+        if old is None:
+            continue
+        timings = dict(case['timings'])
+        old_timings = dict(old['timings'])
+        for operation, totals in case['operations'].items():
+            timings[operation] = totals['seconds']
+        for operation, totals in old['operations'].items():
+            old_timings[operation] = totals['seconds']
+        for measurement, seconds in timings.items():
+            old_seconds = old_timings.get(measurement)
+            if old_seconds and seconds > old_seconds * factor:
+                regressions.append((case['name'], measurement, old_seconds, seconds))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the CF parsers, simulator and converters.')
+    parser.add_argument('--output', help='file to write the JSON results to (default: stdout)')
+    parser.add_argument('--cases', help='comma separated case names to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each measurement; the fastest is kept')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help='compare two result files and exit with status 1 on a regression')
+    parser.add_argument('--factor', type=float, default=REGRESSION_FACTOR)
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as baseline_file, open(args.compare[1]) as current_file:
+            regressions = compare(json.load(baseline_file), json.load(current_file), args.factor)
+        for name, measurement, old_seconds, seconds in regressions:
+            print(f'{name} {measurement}: {old_seconds:.4f}s -> {seconds:.4f}s')
+        return 1 if regressions else 0
+
+    cases = CASES
+    if args.cases:
+        names = args.cases.split(',')
+        cases = [case for case in CASES if case[0] in names]
+    results = run_benchmarks(cases, args.repeat, args.seed)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+Time how long the simulator takes to start: importing its modules, a
+one-shot main.py run, warming up, and starting a worker process cold and
+from the warm fork server. Each import and the CLI run in a fresh
+interpreter. The results have the same form as run_benchmarks, so they can
+be compared with its --compare.
+
+    python -m benchmarks.startup --output startup.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from time import perf_counter
+
+from pydna_cf_simulator.parse_CF_shorthand import parse_CF_shorthand
+from pydna_cf_simulator.limits import KillableWorker, SimulationLimits
+from pydna_cf_simulator.warm_start import warm_context
+
+from .generate_CF import generate_CF
+from .run_benchmarks import git_commit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (measurement, Python statement run in a fresh interpreter)
+IMPORTS = [
+    ('import_package', 'import pydna_cf_simulator'),
+    ('import_simulate_CF', 'import pydna_cf_simulator.simulate_CF'),
+    ('import_app', 'import app'),
+    ('import_asgi', 'import asgi'),
+    ('warm_up', 'from pydna_cf_simulator.warm_start import warm_up; warm_up()'),
+]
+
+
+def time_command(command, repeat=3):
+    # Fastest wall-clock time of `repeat` runs of a command from the repository root
+    best = None
+    for _ in range(repeat):
+        start = perf_counter()
+        subprocess.run(command, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+        seconds = perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def time_worker(context, cf, repeat=3):
+    # Fastest time to start a KillableWorker and simulate a CF on it
+    best = None
+    for _ in range(repeat):
+        worker = KillableWorker(context=context)
+        start = perf_counter()
+        for _ in worker.iter_simulate(cf, SimulationLimits()):
+            pass
+        seconds = perf_counter() - start
+        worker.shutdown()
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def run_startup(repeat=3, seed=0, imports=IMPORTS):
+    """
+    Return the startup timings, in the form of run_benchmarks' results with
+    a single 'startup' case.
+    """
+    shorthand = generate_CF(1000, seed=seed).shorthand()
+    timings = {name: time_command([sys.executable, '-c', statement], repeat) for name, statement in imports}
+    timings['main_py'] = time_command([sys.executable, 'main.py', shorthand], repeat)
+
+    cf = parse_CF_shorthand(shorthand)
+    timings['spawned_worker'] = time_worker(multiprocessing.get_context('spawn'), cf, repeat)
+    # The first worker also starts and warms the fork server
+    context = warm_context()
+    timings['fork_server'] = time_worker(context, cf, 1)
+    timings['warm_worker'] = time_worker(context, cf, repeat)
+
+    return {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'commit': git_commit(),
+        'repeat': repeat,
+        'seed': seed,
+        'cases': [{'name': 'startup', 'timings': timings, 'operations': {}}],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the startup time of the CF simulator.')
+    parser.add_argument('--output', help='file to write the JSON results to (default: stdout)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each measurement; the fastest is kept')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    output = json.dumps(run_startup(args.repeat, args.seed), indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
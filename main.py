@@ -1,6 +1,6 @@
 import sys
-from parse_CF_shorthand import parse_CF_shorthand
-from simulate_CF import simulate_CF
+from pydna_cf_simulator.parse_CF_shorthand import parse_CF_shorthand
+from pydna_cf_simulator.simulate_CF import simulate_CF
 
 # Get the CF shorthand string from the command line arguments
 CF_shorthand_string = sys.argv[1]
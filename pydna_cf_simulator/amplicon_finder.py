@@ -0,0 +1,154 @@
+import numpy as np
+
+from .polynucleotide import Polynucleotide
+from .packed_sequence import BASE_CODES
+from .circular_sequence import CircularView
+from .sequence_store import derived
+from .sequence_kernels import reverse_complement
+from .template_cache import TemplateCache
+
+# Length of the 3' part of a primer that must anneal exactly, as in pydna's pcr
+SEED_LENGTH = 13
+
+# Memory budget of the template indexes kept for reuse by later PCRs; an
+# index takes about 12 bytes per template base
+INDEX_CACHE_BYTES = 256 * 1024 * 1024
+
+def encode_kmer(kmer):
+    # 2-bit integer of an ACGT k-mer, or None if it has any other character
+    value = 0
+    for base in kmer:
+        code = BASE_CODES[ord(base)] if ord(base) < 256 else 255
+        if code == 255:
+            return None
+        value = (value << 2) | int(code)
+    return value
+
+
+def encode_windows(text, k, windows):
+    """
+    Return the 2-bit k-mers of the first `windows` windows of k bases of
+    `text` and their start positions, leaving out windows with anything
+    other than ACGT.
+    """
+    dtype = np.uint32 if k <= 16 else np.uint64
+    windows = min(windows, len(text) - k + 1)
+    if windows <= 0:
+        return np.zeros(0, dtype=dtype), np.zeros(0, dtype=np.int64)
+
+    codes = BASE_CODES[np.frombuffer(text.encode('ascii', 'replace'), dtype=np.uint8)]
+    kmers = np.zeros(windows, dtype=dtype)
+    invalid = np.zeros(windows, dtype=bool)
+    for offset in range(k):
+        window_codes = codes[offset:offset + windows]
+        invalid |= window_codes == 255
+        kmers = (kmers << 2) | (window_codes & 3).astype(dtype)
+
+    positions = np.flatnonzero(~invalid)
+    return kmers[positions], positions
+
+
+class TemplateIndex:
+    """
+    Seed index of every k-mer of a template, for finding primer binding sites.
+
+    The k-mers are packed as 2-bit integers and sorted once, so each lookup is
+    a binary search. Windows containing anything other than ACGT are left out.
+    On circular templates the k-mers spanning the origin are included,
+    read from the template's CircularView.
+    """
+    def __init__(self, sequence, circular, k=SEED_LENGTH):
+        self.sequence = sequence
+        self.circular = circular
+        self.k = k
+
+        kmers, positions = encode_windows(sequence, k, len(sequence) - k + 1)
+        if circular and sequence:
+            # The k-mers spanning the origin, from the few bases around it
+            start, junction = CircularView(sequence).junction(k)
+            junction_kmers, junction_positions = encode_windows(junction, k, len(sequence) - start)
+            kmers = np.concatenate([kmers, junction_kmers])
+            positions = np.concatenate([positions, junction_positions + start])
+
+        order = np.argsort(kmers, kind='stable')
+        self._kmers = kmers[order]
+        self._positions = positions[order]
+
+    def find(self, kmer):
+        # Sorted start positions of an ACGT k-mer, or None if it cannot be looked up
+        if len(kmer) != self.k:
+            return None
+        value = encode_kmer(kmer)
+        if value is None:
+            return None
+        left = np.searchsorted(self._kmers, value, side='left')
+        right = np.searchsorted(self._kmers, value, side='right')
+        return sorted(self._positions[left:right].tolist())
+
+    def nbytes(self):
+        return self._kmers.nbytes + self._positions.nbytes
+
+
+# Template indexes shared by every simulation in the process
+index_cache = TemplateCache(INDEX_CACHE_BYTES)
+
+
+def template_index(sequence, circular):
+    """
+    Return the TemplateIndex of a template, reusing the one built by an
+    earlier PCR on the same sequence.
+    """
+    return index_cache.get(sequence, circular, TemplateIndex)
+
+
+def find_amplicon(forward, reverse, template):
+    """
+    Find the PCR product of two primer Polynucleotides on a template using a
+    seed index of the template.
+
+    Like pydna's pcr, a primer anneals where its 3' SEED_LENGTH bases match the
+    template exactly, and either primer may anneal in either direction. The
+    product is returned as a Polynucleotide when there is exactly one forward
+    and one reverse site. Otherwise, or for templates with sticky ends and
+    primers with degenerate 3' bases, None is returned so that the caller can
+    fall back to pydna, which also reports missing or unspecific products.
+    """
+    k = SEED_LENGTH
+    if not template.is_double_stranded or template.ext5 or template.ext3:
+        return None
+    sequence = template.sequence
+    if len(forward.sequence) < k or len(reverse.sequence) < k or len(sequence) < k:
+        return None
+
+    index = derived(template, 'template_index', lambda: template_index(sequence, template.is_circular))
+    n = len(sequence)
+
+    # 3' end positions of the primers annealing in each direction
+    forward_sites = []
+    reverse_sites = []
+    for primer in (forward.sequence, reverse.sequence):
+        forward_starts = index.find(primer[-k:])
+        reverse_starts = index.find(reverse_complement(primer[-k:]))
+        if forward_starts is None or reverse_starts is None:
+            return None
+        forward_sites += [(start + k, primer) for start in forward_starts]
+        reverse_sites += [(start, primer) for start in reverse_starts]
+
+    if len(forward_sites) != 1 or len(reverse_sites) != 1:
+        return None
+    forward_end, forward_primer = forward_sites[0]
+    reverse_start, reverse_primer = reverse_sites[0]
+
+    # Template between the primers' 3' ends
+    if not template.is_circular:
+        if forward_end > reverse_start:
+            return None
+        between = sequence[forward_end:reverse_start]
+    else:
+        forward_end %= n
+        if reverse_start < forward_end:
+            reverse_start += n
+        between = CircularView(sequence).slice(forward_end, reverse_start)
+
+    product = forward_primer + between + reverse_complement(reverse_primer)
+    return Polynucleotide(product, '', '', True, False, forward.mod_ext5, reverse.mod_ext5)
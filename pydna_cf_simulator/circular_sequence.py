@@ -0,0 +1,50 @@
+def circular_slice(sequence, start, end):
+    # Bases from start to end of a circular sequence; both may lie outside [0, n)
+    n = len(sequence)
+    length = end - start
+    start %= n
+    chunks = []
+    while length > 0:
+        chunk = sequence[start:start + length]
+        chunks.append(chunk)
+        length -= len(chunk)
+        start = 0
+    return ''.join(chunks)
+
+
+class CircularView:
+    """
+    A sequence read as a circle, without copying it.
+
+    Searches for windows of up to `length` bases run on the sequence as it is,
+    for the windows inside it, and on junction(length), a short stretch of at
+    most 2 * length - 2 bases around the origin, for the windows spanning it.
+    Nothing the size of the sequence is built, where searching the sequence
+    with its start appended copies all of it.
+    """
+    def __init__(self, sequence):
+        self.sequence = sequence
+
+    def __len__(self):
+        return len(self.sequence)
+
+    def slice(self, start, end):
+        # Bases from start to end, wrapping around the origin as often as needed
+        return circular_slice(self.sequence, start, end)
+
+    def junction(self, length):
+        """
+        Return (start, text) where text holds every window of `length` bases
+        starting at or after `start` and spanning the origin, so the window
+        at position i of text starts at start + i. Windows start before the
+        end of the sequence: there are len(self) - start of them.
+        """
+        n = len(self.sequence)
+        if n == 0:
+            return 0, ''
+        start = max(n - length + 1, 0)
+        return start, self.slice(start, n + length - 1)
+
+    def spans_origin(self, start, length):
+        # Whether the window of `length` bases at `start` runs past the end of the sequence
+        return start + length > len(self.sequence)
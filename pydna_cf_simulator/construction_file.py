@@ -5,12 +5,13 @@ class Step:
 
 
 class PCR(Step):
-    def __init__(self, forward_oligo, reverse_oligo, template, output, product_size=None):
+    def __init__(self, forward_oligo, reverse_oligo, template, output, product_size=None, max_mismatches=None):
         super().__init__('PCR', output)
         self.forward_oligo = forward_oligo
         self.reverse_oligo = reverse_oligo
         self.template = template
         self.product_size = product_size
+        self.max_mismatches = max_mismatches
 
 
 class Digest(Step):
@@ -36,9 +37,10 @@ class GoldenGate(Step):
 
 
 class Gibson(Step):
-    def __init__(self, dnas, output):
+    def __init__(self, dnas, output, min_overlap=None):
         super().__init__('Gibson', output)
         self.dnas = dnas
+        self.min_overlap = min_overlap
 
 
 class Transform(Step):
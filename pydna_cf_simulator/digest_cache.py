@@ -0,0 +1,97 @@
+import threading
+from collections import OrderedDict
+
+from .step_cache import polynucleotide_digest, polynucleotide_size, ENTRY_OVERHEAD
+from .restriction_scanner import default_scanner
+
+# Rough size of one site of a restriction map
+SITE_SIZE = 120
+
+
+class DigestCache:
+    """
+    In-memory LRU cache of digests, keyed by the content of the sequence.
+
+    Each sequence keeps its restriction map, the sites of every enzyme the
+    restriction scanner knows, and the fragment list of every set of enzymes
+    it was cut with, keyed by the sorted enzyme names. Digesting the same
+    sequence with the same enzymes again, to pick another fragment or in
+    another simulation, reuses the fragments; other enzymes reuse the map.
+
+    Entries are evicted least recently used first once their total estimated
+    size exceeds max_bytes. Cached fragment lists and Polynucleotides are
+    shared and must not be modified.
+    """
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def fragments(self, poly, enzymes, cut):
+        """
+        Return the fragments of `poly` digested with `enzymes`, calling
+        cut(poly, enzymes, restriction_map) on a miss. `enzymes` is passed
+        sorted and without repeats, and restriction_map() returns the
+        sequence's cached map.
+        """
+        content = polynucleotide_digest(poly)
+        enzymes = tuple(sorted(set(enzymes)))
+        fragments = self._get((content, enzymes))
+        if fragments is not None:
+            return fragments
+        fragments = cut(poly, enzymes, lambda: self.restriction_map(poly, content))
+        self._store((content, enzymes), fragments, sum(polynucleotide_size(fragment) for fragment in fragments) + ENTRY_OVERHEAD)
+        return fragments
+
+    def restriction_map(self, poly, content=None):
+        # The sites of every enzyme of the default scanner on poly, as find_sites returns them
+        content = content or polynucleotide_digest(poly)
+        sites = self._get((content, None))
+        if sites is None:
+            sites = default_scanner().find_sites(poly.sequence, poly.is_circular)
+            self._store((content, None), sites, len(sites) * SITE_SIZE + ENTRY_OVERHEAD)
+        return sites
+
+    def _get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value[0]
+
+    def _store(self, key, value, size):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries),
+                'bytes': self.current_bytes, 'max_bytes': self.max_bytes}
+
+
+# Digests shared by every simulation in the process
+shared_cache = DigestCache()
@@ -0,0 +1,104 @@
+from .sequence_kernels import reverse_complements
+
+# Shortest terminal homology accepted between neighbouring fragments, as in
+# pydna's Assembly
+GIBSON_MIN_OVERLAP = 25
+
+HASH_BASE = 257
+HASH_MODULUS = (1 << 61) - 1
+
+
+def window_hashes(sequence, length):
+    # Rolling hash of every window of `length` bases, by start position
+    if len(sequence) < length:
+        return
+    top = pow(HASH_BASE, length - 1, HASH_MODULUS)
+    value = 0
+    for base in sequence[:length]:
+        value = (value * HASH_BASE + ord(base)) % HASH_MODULUS
+    yield 0, value
+    for start in range(1, len(sequence) - length + 1):
+        value = ((value - ord(sequence[start - 1]) * top) * HASH_BASE + ord(sequence[start + length - 1])) % HASH_MODULUS
+        yield start, value
+
+
+def find_overlaps(sequences, min_overlap):
+    """
+    Return {(i, j): length} of the longest overlap of at least min_overlap
+    bases between the end of sequences[i] and the start of sequences[j].
+
+    The first min_overlap bases of every sequence are hashed into one table.
+    A rolling hash over each sequence finds the windows that may start an
+    overlap, and the suffix from there is checked against the matching
+    prefix. An overlap never covers a whole sequence.
+    """
+    table = {}
+    for j, sequence in enumerate(sequences):
+        for _, value in window_hashes(sequence[:min_overlap], min_overlap):
+            table.setdefault(value, []).append(j)
+
+    overlaps = {}
+    for i, sequence in enumerate(sequences):
+        n = len(sequence)
+        for start, value in window_hashes(sequence, min_overlap):
+            if start == 0:
+                continue
+            for j in table.get(value, ()):
+                length = n - start
+                if (i, j) in overlaps or length >= len(sequences[j]):
+                    continue
+                if sequence[start:] == sequences[j][:length]:
+                    overlaps[i, j] = length
+    return overlaps
+
+
+def assemble_gibson(sequences, names, min_overlap=GIBSON_MIN_OVERLAP):
+    """
+    Return the circular product of a Gibson assembly of all `sequences`.
+
+    Each fragment is joined to the next by the terminal overlap between its
+    end and the next fragment's start. The first fragment keeps its
+    orientation and starts the product; the others may be used in either
+    orientation. As in pydna, the overlaps at the two ends of a short
+    fragment may cross each other. Unlike pydna, a fragment lying wholly
+    inside a neighbour, without an overlap at its own ends, is not used. The
+    search over the overlap graph stops as soon as a second distinct product
+    is found, and a ValueError is raised unless there is exactly one.
+    """
+    # Nodes 2k and 2k + 1 are fragment k as given and reverse complemented
+    nodes = []
+    for sequence, complement in zip(sequences, reverse_complements(sequences)):
+        nodes += [sequence, complement]
+    overlaps = find_overlaps(nodes, min_overlap)
+
+    successors = {}
+    for (i, j), length in overlaps.items():
+        if i // 2 != j // 2 or len(sequences) == 1:
+            successors.setdefault(i, []).append((j, length))
+
+    products = []
+    path = [(0, 0)]
+    used = {0}
+
+    def extend():
+        node = path[-1][0]
+        for successor, length in successors.get(node, ()):
+            if len(products) > 1:
+                return
+            if successor == 0 and len(path) == len(sequences):
+                product = ''.join(nodes[n][overlap:] for n, overlap in path)[:-length]
+                if product not in products:
+                    products.append(product)
+            elif successor // 2 not in used:
+                used.add(successor // 2)
+                path.append((successor, length))
+                extend()
+                path.pop()
+                used.discard(successor // 2)
+
+    extend()
+    if not products:
+        raise ValueError(f"No Gibson assembly of {', '.join(names)} with overlaps of at least {min_overlap} bp is possible.")
+    if len(products) > 1:
+        raise ValueError(f"More than one Gibson assembly of {', '.join(names)} is possible.")
+    return products[0]
@@ -0,0 +1,75 @@
+from .sequence_kernels import reverse_complement
+from .polynucleotide import Polynucleotide
+from .restriction_scanner import default_scanner
+
+
+def flip_overhang(ext):
+    # The same overhang seen from the other strand, keeping its 5'/3' sign
+    if ext.startswith('-'):
+        return '-' + reverse_complement(ext[1:])
+    return reverse_complement(ext)
+
+
+def flip_fragment(fragment):
+    # Reverse complement of a linear, double-stranded fragment
+    return Polynucleotide(reverse_complement(fragment.sequence), flip_overhang(fragment.ext3), flip_overhang(fragment.ext5),
+                          True, False, fragment.mod_ext3, fragment.mod_ext5)
+
+
+def has_site(fragment, enzyme, scanner):
+    # Whether the fragment, overhangs included, still has a recognition site of the enzyme
+    strand = fragment.ext5.lstrip('-') + fragment.sequence + fragment.ext3.lstrip('-')
+    return any(name == enzyme for _, name, _, _ in scanner.find_sites(strand, False))
+
+
+def assemble_golden_gate(parts, names, enzyme, scanner=None):
+    """
+    Return the circular product of a Golden Gate assembly.
+
+    `parts` holds the digest fragments of each part named in `names`. The
+    fragments that keep a recognition site of the enzyme are cut again in the
+    reaction and so are left out, as are fragments with a blunt end. The rest
+    are indexed by their left overhang, in both orientations, and the product
+    is built by following each fragment's right overhang to the one fragment
+    starting with it, from the first part's fragment until the circle closes.
+    A ValueError is raised when an overhang has no match or more than one, or
+    when fragments are left over.
+    """
+    scanner = scanner or default_scanner()
+
+    pieces = []
+    for part, fragments in enumerate(parts):
+        for fragment in fragments:
+            if fragment.ext5 and fragment.ext3 and not has_site(fragment, enzyme, scanner):
+                pieces.append((part, fragment))
+    if not pieces:
+        raise ValueError(f"Digesting {', '.join(names)} with {enzyme} gives no fragments to assemble.")
+
+    by_overhang = {}
+    for index, (_, fragment) in enumerate(pieces):
+        for oriented in (fragment, flip_fragment(fragment)):
+            by_overhang.setdefault(oriented.ext5, []).append((index, oriented))
+
+    start = pieces[0][1]
+    current_index, current = 0, start
+    used = {0}
+    chunks = [start.ext5.lstrip('-'), start.sequence]
+    while current.ext3 != start.ext5:
+        overhang = current.ext3.lstrip('-')
+        after = names[pieces[current_index][0]]
+        candidates = [(index, fragment) for index, fragment in by_overhang.get(current.ext3, ()) if index not in used]
+        if not candidates:
+            raise ValueError(f"No fragment has the overhang {overhang} that follows {after} in the Golden Gate assembly with {enzyme}.")
+        if len(candidates) > 1:
+            matches = ', '.join(names[pieces[index][0]] for index, _ in candidates)
+            raise ValueError(f"More than one fragment ({matches}) has the overhang {overhang} that follows {after} in the Golden Gate assembly with {enzyme}.")
+        current_index, current = candidates[0]
+        used.add(current_index)
+        chunks += [current.ext5.lstrip('-'), current.sequence]
+
+    if len(used) < len(pieces):
+        left_over = sorted({names[pieces[index][0]] for index in range(len(pieces)) if index not in used})
+        raise ValueError(f"Fragments of {', '.join(left_over)} are not part of the Golden Gate assembly with {enzyme}.")
+
+    # The closing overhang was added at the start
+    return Polynucleotide(''.join(chunks), '', '', True, True, '', '')
@@ -0,0 +1,51 @@
+import functools
+from collections import namedtuple
+from time import perf_counter
+
+# Timing of one simulated step. input_lengths follows step_inputs, and
+# cache_hit is None when no cache was used for the step
+StepRecord = namedtuple('StepRecord', ['index', 'operation', 'output', 'seconds', 'input_lengths', 'output_length', 'cache_hit'])
+
+# Timing of one call to a conversion function
+ConversionRecord = namedtuple('ConversionRecord', ['function', 'seconds', 'input_length', 'output_length'])
+
+# Callables receiving every StepRecord and ConversionRecord
+hooks = []
+
+
+def add_hook(hook):
+    hooks.append(hook)
+
+
+def remove_hook(hook):
+    hooks.remove(hook)
+
+
+def emit(record):
+    for hook in list(hooks):
+        hook(record)
+
+
+def sequence_length(value):
+    # Length of a Polynucleotide's sequence, or of a Dseqrecord
+    if hasattr(value, 'sequence'):
+        return len(value.sequence)
+    return len(value)
+
+
+def instrumented(function):
+    """
+    Decorate a conversion function so that each call emits a
+    ConversionRecord to the hooks. With no hooks registered the call goes
+    straight through.
+    """
+    @functools.wraps(function)
+    def wrapper(value, *args, **kwargs):
+        if not hooks:
+            return function(value, *args, **kwargs)
+        start = perf_counter()
+        result = function(value, *args, **kwargs)
+        seconds = perf_counter() - start
+        emit(ConversionRecord(function.__name__, seconds, sequence_length(value), sequence_length(result)))
+        return result
+    return wrapper
@@ -0,0 +1,215 @@
+import queue
+from collections import namedtuple
+from time import perf_counter
+
+from .plan_CF import contributing_steps
+from .simulate_CF import iter_simulate_CF
+from .step_cache import StepCache
+from .instrumentation import sequence_length
+from .warm_start import warm_context
+
+# Limits of one simulation; None leaves a limit off
+SimulationLimits = namedtuple('SimulationLimits', ['max_total_length', 'max_steps', 'max_seconds'], defaults=(None, None, None))
+
+
+class LimitExceeded(ValueError):
+    """
+    Raised when a simulation goes over one of its SimulationLimits.
+
+    `limit` is the field of SimulationLimits that was exceeded, `value` the
+    amount reached and `maximum` the limit. `step` is the (index, operation,
+    output) of the step that went over, or None when the CF is over the
+    limit before any step runs.
+    """
+    def __init__(self, limit, value, maximum, step=None):
+        self.limit = limit
+        self.value = value
+        self.maximum = maximum
+        self.step = step
+        super().__init__(limit_message(limit, value, maximum, step))
+
+    def __reduce__(self):
+        return LimitExceeded, (self.limit, self.value, self.maximum, self.step)
+
+    def to_dict(self):
+        step = None
+        if self.step is not None:
+            index, operation, output = self.step
+            step = {'index': index, 'operation': operation, 'output': output}
+        return {'error': str(self), 'limit': self.limit, 'value': self.value, 'maximum': self.maximum, 'step': step}
+
+
+def limit_message(limit, value, maximum, step):
+    where = f"Step {step[0] + 1} ({step[1]} {step[2]})" if step is not None else None
+    if limit == 'max_steps':
+        return f"The CF has {value} steps to simulate, more than the limit of {maximum}."
+    if limit == 'max_total_length':
+        if where is None:
+            return f"The sequences of the CF total {value} bases, more than the limit of {maximum}."
+        return f"{where} brings the total sequence length to {value} bases, more than the limit of {maximum}."
+    if where is None:
+        return f"The simulation ran for more than the limit of {maximum} seconds."
+    return f"{where} was still running when the simulation reached its limit of {maximum} seconds."
+
+
+def describe_step(construction_file, index):
+    step = construction_file.steps[index]
+    return (index, step.operation, step.output)
+
+
+def step_indices(construction_file, targets=None):
+    # The steps iter_simulate_CF runs, in the order it runs them
+    if targets is None:
+        return list(range(len(construction_file.steps)))
+    return contributing_steps(construction_file, targets)
+
+
+def check_limits(construction_file, limits, targets=None):
+    """
+    Raise LimitExceeded if a CF has more steps to run, or longer sequences,
+    than `limits` allow, before anything is simulated. Return the indices of
+    the steps to run and the total length of the CF's sequences.
+    """
+    indices = step_indices(construction_file, targets)
+    if limits.max_steps is not None and len(indices) > limits.max_steps:
+        raise LimitExceeded('max_steps', len(indices), limits.max_steps)
+    total = sum(sequence_length(poly) for poly in construction_file.sequences.values())
+    if limits.max_total_length is not None and total > limits.max_total_length:
+        raise LimitExceeded('max_total_length', total, limits.max_total_length)
+    return indices, total
+
+
+def iter_simulate_limited(construction_file, limits, cache=None, targets=None, on_step=None):
+    """
+    Like iter_simulate_CF, but raise LimitExceeded when the CF has too many
+    steps or when the sequences and the products made so far are longer in
+    total than `limits` allow. The time limit is not checked here; see
+    KillableWorker.
+    """
+    indices, total = check_limits(construction_file, limits, targets)
+    for position, (name, product) in enumerate(iter_simulate_CF(construction_file, cache, targets, on_step)):
+        total += sequence_length(product)
+        if limits.max_total_length is not None and total > limits.max_total_length:
+            raise LimitExceeded('max_total_length', total, limits.max_total_length,
+                                describe_step(construction_file, indices[position]))
+        yield name, product
+
+
+def worker_main(connection, cache_bytes):
+    # Loop of a worker process, running each job sent down the connection
+    cache = StepCache(cache_bytes)
+    connection.send(('ready',))
+    while True:
+        job = connection.recv()
+        if job is None:
+            return
+        construction_file, limits, targets, instrument = job
+        on_step = (lambda record: connection.send(('record', record))) if instrument else None
+        try:
+            for name, product in iter_simulate_limited(construction_file, limits, cache, targets, on_step):
+                connection.send(('product', name, product))
+            connection.send(('done',))
+        except Exception as e:
+            connection.send(('error', e))
+
+
+class KillableWorker:
+    """
+    A process that runs simulations under SimulationLimits, including the
+    time limit: when a simulation runs over, the process is killed, which
+    stops the step wherever it is, and a new one is started for the next
+    simulation. The products come back as the steps finish, and the time
+    taken to start the process does not count against the limit.
+    """
+    def __init__(self, cache_bytes=16 * 1024 * 1024, context=None):
+        self.cache_bytes = cache_bytes
+        self.context = context or warm_context()
+        self.process = None
+        self.connection = None
+
+    def start(self):
+        if self.process is not None and self.process.is_alive():
+            return
+        connection, child = self.context.Pipe()
+        self.process = self.context.Process(target=worker_main, args=(child, self.cache_bytes), daemon=True)
+        self.process.start()
+        child.close()
+        self.connection = connection
+        try:
+            self.connection.recv()
+        except EOFError:
+            self.kill()
+            raise RuntimeError("The simulation worker process could not start.") from None
+
+    def kill(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.join()
+            self.connection.close()
+            self.process = None
+            self.connection = None
+
+    def shutdown(self):
+        if self.process is not None and self.process.is_alive():
+            self.connection.send(None)
+            self.process.join()
+        self.kill()
+
+    def iter_simulate(self, construction_file, limits, targets=None, on_step=None):
+        """
+        Like iter_simulate_limited, run in the worker process. A generator
+        closed before the simulation is done kills the process too, so that
+        no stale products are left for the next simulation.
+        """
+        self.start()
+        indices = step_indices(construction_file, targets)
+        self.connection.send((construction_file, limits, targets, on_step is not None))
+        deadline = perf_counter() + limits.max_seconds if limits.max_seconds is not None else None
+        finished = 0
+        done = False
+        try:
+            while True:
+                timeout = None if deadline is None else max(deadline - perf_counter(), 0)
+                if not self.connection.poll(timeout):
+                    step = describe_step(construction_file, indices[finished]) if finished < len(indices) else None
+                    raise LimitExceeded('max_seconds', limits.max_seconds, limits.max_seconds, step)
+                try:
+                    message = self.connection.recv()
+                except EOFError:
+                    raise RuntimeError("The simulation worker process stopped unexpectedly.") from None
+                if message[0] == 'product':
+                    finished += 1
+                    yield message[1], message[2]
+                elif message[0] == 'record':
+                    on_step(message[1])
+                elif message[0] == 'error':
+                    done = True
+                    raise message[1]
+                else:
+                    done = True
+                    return
+        finally:
+            if not done:
+                self.kill()
+
+
+class KillableWorkerPool:
+    """
+    A fixed number of KillableWorkers, each running one simulation at a
+    time; callers wait for a free one.
+    """
+    def __init__(self, size, cache_bytes=16 * 1024 * 1024, context=None):
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(KillableWorker(cache_bytes, context))
+
+    def iter_simulate(self, construction_file, limits, targets=None, on_step=None):
+        worker = self._idle.get()
+        try:
+            yield from worker.iter_simulate(construction_file, limits, targets, on_step)
+        finally:
+            self._idle.put(worker)
+
+    def shutdown(self):
+        while not self._idle.empty():
+            self._idle.get().shutdown()
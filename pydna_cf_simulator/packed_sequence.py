@@ -0,0 +1,73 @@
+import numpy as np
+
+# 2-bit codes of the unambiguous bases; every other byte maps to 255
+BASE_CODES = np.full(256, 255, dtype=np.uint8)
+for code, base in enumerate('ACGT'):
+    BASE_CODES[ord(base)] = code
+
+BASES = np.frombuffer(b'ACGT', dtype=np.uint8)
+
+
+class PackedSequence:
+    """
+    A DNA sequence stored at 2 bits per base, four bases to a byte.
+
+    Bases other than A, C, G and T (such as IUPAC codes) are stored as escapes:
+    their positions and characters are kept next to the packed bytes, and the
+    packed code at those positions is ignored. str() decodes the sequence.
+    """
+    __slots__ = ('_packed', '_length', '_escape_positions', '_escape_bases')
+
+    def __init__(self, sequence):
+        data = np.frombuffer(sequence.encode('ascii'), dtype=np.uint8)
+        codes = BASE_CODES[data]
+
+        escaped = codes == 255
+        positions = np.flatnonzero(escaped)
+        self._escape_positions = positions.astype(np.uint32).tobytes()
+        self._escape_bases = data[positions].tobytes()
+        codes[escaped] = 0
+
+        self._length = len(codes)
+        padded = np.zeros(-(-self._length // 4) * 4, dtype=np.uint8)
+        padded[:self._length] = codes
+        quads = padded.reshape(-1, 4)
+        self._packed = ((quads[:, 0] << 6) | (quads[:, 1] << 4) | (quads[:, 2] << 2) | quads[:, 3]).tobytes()
+
+    def __len__(self):
+        return self._length
+
+    def __str__(self):
+        packed = np.frombuffer(self._packed, dtype=np.uint8)
+        codes = np.empty((len(packed), 4), dtype=np.uint8)
+        codes[:, 0] = packed >> 6
+        codes[:, 1] = (packed >> 4) & 3
+        codes[:, 2] = (packed >> 2) & 3
+        codes[:, 3] = packed & 3
+        data = BASES[codes.reshape(-1)[:self._length]]
+        if self._escape_bases:
+            data[np.frombuffer(self._escape_positions, dtype=np.uint32)] = np.frombuffer(self._escape_bases, dtype=np.uint8)
+        return data.tobytes().decode('ascii')
+
+    def __repr__(self):
+        return f'PackedSequence({str(self)!r})'
+
+    def __eq__(self, other):
+        if isinstance(other, PackedSequence):
+            return (self._length == other._length and
+                    self._packed == other._packed and
+                    self._escape_positions == other._escape_positions and
+                    self._escape_bases == other._escape_bases)
+        if isinstance(other, str):
+            return len(other) == self._length and str(self) == other
+        return NotImplemented
+
+    def __getstate__(self):
+        return (self._packed, self._length, self._escape_positions, self._escape_bases)
+
+    def __setstate__(self, state):
+        self._packed, self._length, self._escape_positions, self._escape_bases = state
+
+    def nbytes(self):
+        # Bytes used by the packed bases and the escapes
+        return len(self._packed) + len(self._escape_positions) + len(self._escape_bases)
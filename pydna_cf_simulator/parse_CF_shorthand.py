@@ -1,171 +1,297 @@
+import codecs
 import re
+from collections import namedtuple
 
 from .construction_file import ConstructionFile, PCR, Digest, Ligate, GoldenGate, Gibson, Transform
 from .polynucleotide import Polynucleotide, oligo, plasmid, dsDNA
+from .sequence_kernels import normalize_sequence
 
 ALL_ENZYMES = ['AarI', 'BbsI', 'BsaI', 'BsmBI', 'SapI', 'BseRI', 'BamHI', 'BglII', 'EcoRI', 'XhoI', 'SpeI', 'XbaI', 'PstI', 'HindIII', 'NotI', 'XmaI', 'SmaI', 'KpnI', 'SacI', 'SalI']
 TYPE_IIS_ENZYMES = ['AarI', 'BbsI', 'BsaI', 'BsmBI', 'SapI', 'BseRI']
 VALID_ANTIBIOTICS = {'Amp', 'Carb', 'Cam', 'Kan', 'Gen', 'Spec', 'Trim'}
 
-def parse_CF_shorthand(cf_shorthand):
-    # Remove /*comment*/ style comments
-    cf_shorthand = re.sub(r'/\*.*?\*/', '', cf_shorthand, flags=re.DOTALL)
+# A sequence defined in a CF, as yielded by iter_CF_shorthand
+SequenceDefinition = namedtuple('SequenceDefinition', ['name', 'polynucleotide'])
 
-    lines = cf_shorthand.split('\n')
+# Characters read at a time from file handles
+CHUNK_SIZE = 1 << 16
+
+# Constructors of the typed sequence lines
+SEQUENCE_TYPES = {'oligo': oligo, 'plasmid': plasmid, 'dsdna': dsDNA}
+
+
+def parse_CF_shorthand(cf_shorthand, store=None):
     steps = []
     sequences = {}
+    for item in iter_CF_shorthand([cf_shorthand], store):
+        if isinstance(item, SequenceDefinition):
+            sequences[item.name] = item.polynucleotide
+        else:
+            steps.append(item)
+    return ConstructionFile(steps, sequences)
+
+
+def iter_CF_shorthand(source, store=None):
+    """
+    Parse CF shorthand from a file handle or an iterable of text chunks, and
+    yield a SequenceDefinition or Step for each line as soon as it is read.
+
+    /* */ comments may span chunks and lines; as in parse_CF_shorthand, a
+    comment is removed before the text is split into lines, so line numbers
+    in errors count the lines left after removing comments. Chunks may be
+    str or UTF-8 bytes. Sequences written as '@ID' are looked up in `store`,
+    a SequenceStore.
+    """
+    line_num = 0
+    for line in iter_lines(strip_block_comments(iter_chunks(source))):
+        line_num += 1
+        item = parse_CF_shorthand_line(line, line_num, store)
+        if item is not None:
+            yield item
+
 
-    for line_num, line in enumerate(lines, start=1):
-        # Remove # and // style comments
-        line = re.split(r'#|//', line)[0]
+def iter_chunks(source):
+    # Text chunks of a file handle or an iterable of str or bytes chunks
+    if isinstance(source, (str, bytes)):
+        source = [source]
+    elif hasattr(source, 'read'):
+        handle = source
+        source = iter(lambda: handle.read(CHUNK_SIZE), handle.read(0))
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    for chunk in source:
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk)
+        if chunk:
+            yield chunk
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
 
-        # Skip empty or whitespace-only lines
-        if not line.strip():
+
+def strip_block_comments(chunks):
+    r"""
+    Remove /* */ comments from a stream of text chunks, matching
+    re.sub(r'/\*.*?\*/', '', text, flags=re.DOTALL) on the joined text. A
+    comment still open at the end is kept, since the regex does not match it.
+    """
+    carry = ''
+    comment = None
+    for chunk in chunks:
+        text = carry + chunk
+        position = 0
+        while True:
+            if comment is None:
+                start = text.find('/*', position)
+                if start < 0:
+                    # Hold back a '/' that may open a comment with the next chunk
+                    end = max(len(text) - 1 if text.endswith('/') else len(text), position)
+                    if end > position:
+                        yield text[position:end]
+                    carry = text[end:]
+                    break
+                if start > position:
+                    yield text[position:start]
+                comment = ['/*']
+                position = start + 2
+            else:
+                end = text.find('*/', position)
+                if end < 0:
+                    # Hold back a '*' that may close the comment with the next chunk
+                    end = max(len(text) - 1 if text.endswith('*') else len(text), position)
+                    comment.append(text[position:end])
+                    carry = text[end:]
+                    break
+                comment = None
+                position = end + 2
+    if comment is not None:
+        yield ''.join(comment)
+    if carry:
+        yield carry
+
+
+def iter_lines(chunks):
+    # Lines of a stream of text chunks, like str.split('\n') of the joined text
+    pending = []
+    for chunk in chunks:
+        lines = chunk.split('\n')
+        if len(lines) == 1:
+            pending.append(chunk)
             continue
-        
-        elements = line.split()
-
-        try:
-            # Check if the line is a sequence or a step
-            if len(elements) == 2:
-                # It's a sequence, store it
-                name, sequence = elements
-                sequence = sequence.upper()
-                if re.match("^[ATCGNRKYSWBVHDM]+$", sequence):
-                    if len(sequence) < 100:
-                        sequences[name] = oligo(sequence)
-                    else:
-                        sequences[name] = plasmid(sequence)
-                else:
-                    raise ValueError(f"Error in line {line_num}: Invalid sequence format. Sequences must only contain characters 'A', 'T', 'C', 'G', 'N', 'R', 'K', 'Y', 'S', 'W', 'B', 'V', 'H', 'D', and be at least one character long.")
+        pending.append(lines[0])
+        yield ''.join(pending)
+        yield from lines[1:-1]
+        pending = [lines[-1]]
+    yield ''.join(pending)
+
+
+def parse_CF_shorthand_line(line, line_num, store=None):
+    """
+    Parse one line of CF shorthand into a SequenceDefinition or Step, or
+    None for blank and comment-only lines.
+    """
+    # Remove # and // style comments
+    line = re.split(r'#|//', line)[0]
+
+    # Skip empty or whitespace-only lines
+    if not line.strip():
+        return None
+
+    elements = line.split()
+
+    try:
+        # Check if the line is a sequence or a step
+        if len(elements) == 2:
+            # It's a sequence, store it
+            name, sequence = elements
+            if sequence.startswith('@'):
+                return SequenceDefinition(name, stored_sequence(sequence, store))
+            sequence = normalize_sequence(sequence)
+            if len(sequence) < 100:
+                return SequenceDefinition(name, oligo(sequence))
             else:
-                # It's a step, parse it
-                operation = elements[0].lower()
-
-                if operation == 'pcr':
-                    try:
-                        if len(elements) == 6:
-                            forward_primer, reverse_primer, template, product_size, product_name = elements[1:]
-                            validate_int(product_size, line_num)
-                            steps.append(PCR(forward_primer, reverse_primer, template, product_name, int(product_size)))
-                        else:
-                            forward_primer, reverse_primer, template, product_name = elements[1:]
-                            steps.append(PCR(forward_primer, reverse_primer, template, product_name))
-                    except ValueError:
-                        raise ValueError(f"Error in line {line_num}: Invalid argument type for PCR operation.")
-                    except IndexError:
-                        raise ValueError(f"Error in line {line_num}: Invalid number of arguments for PCR operation.")
-                elif operation == 'digest':
-                    try:
-                        if len(elements) == 5:
-                            dna, enzymes, frag_select, product_name = elements[1:]
-                            validate_int(frag_select, line_num)
-                            frag_select = int(frag_select)
-                            if frag_select < 0:
-                                raise ValueError(f"Error in line {line_num}: Invalid sequence number '{frag_select}'. Must be a non-negative integer.")
-                            enzymes = enzymes.split(',')
-                            unrecognized_enzymes = [enzyme for enzyme in enzymes if enzyme not in ALL_ENZYMES]
-                            if unrecognized_enzymes:
-                                raise ValueError(f"Error in line {line_num}: Unrecognized enzyme(s): {', '.join(unrecognized_enzymes)}")
-                            steps.append(Digest(dna, enzymes, frag_select, product_name))
-                        else:
-                            raise ValueError(f"Error in line {line_num}: Invalid number of arguments for Digest operation.")
-                    except ValueError:
-                        raise ValueError(f"Error in line {line_num}: Invalid argument type for Digest operation.")
-                elif operation == 'ligate':
-                    try:
-                        if len(elements) >= 3:
-                            dnas, product_name = elements[1:-1], elements[-1]
-                            if len(dnas) < 1:
-                                raise ValueError(f"Error in line {line_num}: Ligate operation requires at least 1 DNA inputs.")
-                            steps.append(Ligate(dnas, product_name))
-                        else:
-                            raise ValueError(f"Error in line {line_num}: Invalid number of arguments for Ligate operation.")
-                    except ValueError:
-                        raise ValueError(f"Error in line {line_num}: Invalid argument type for Ligate operation.")
-                elif operation == 'goldengate':
-                    try:
-                        if len(elements) >= 5:
-                            inputs, enzyme, product_name = elements[1:-1], elements[-2], elements[-1]
-                            if len(inputs) < 1:
-                                raise ValueError(f"Error in line {line_num}: GoldenGate operation requires at least 1 inputs.")
-                            if enzyme not in TYPE_IIS_ENZYMES:
-                                raise ValueError(f"Invalid enzyme {enzyme} for GoldenGate. Must be one of {TYPE_IIS_ENZYMES}.")
-                            steps.append(GoldenGate(inputs, enzyme, product_name))
-                        else:
-                            raise ValueError(f"Error in line {line_num}: Invalid number of arguments for GoldenGate operation.")
-                    except ValueError:
-                        raise ValueError(f"Error in line {line_num}: Invalid argument type for GoldenGate operation.")
-                elif operation == 'gibson':
-                    try:
-                        if len(elements) >= 4:
-                            inputs, product_name = elements[1:-1], elements[-1]
-                            if len(inputs) < 1:
-                                raise ValueError(f"Error in line {line_num}: Gibson operation requires at least 1 inputs.")
-                            steps.append(Gibson(inputs, product_name))
-                        else:
-                            raise ValueError(f"Error in line {line_num}: Invalid number of arguments for Gibson operation.")
-                    except ValueError:
-                        raise ValueError(f"Error in line {line_num}: Invalid argument type for Gibson operation.")
-                elif operation == 'transform':
-                    try:
-                        if len(elements) == 6:
-                            dna, strain, antibiotics, temperature, output = elements[1:]
-                            antibiotics = antibiotics.split(',')
-                            validate_antibiotics(antibiotics, line_num)
-                            validate_int(temperature, line_num)
-                            steps.append(Transform(dna, strain, antibiotics, output, int(temperature)))
-                        else:
-                            dna, strain, antibiotics, output = elements[1:]
-                            antibiotics = antibiotics.split(',')
-                            validate_antibiotics(antibiotics, line_num)
-                            steps.append(Transform(dna, strain, antibiotics, output))
-                    except ValueError:
-                        raise ValueError(f"Error in line {line_num}: Invalid argument type for Transform operation.")
-                    except IndexError:
-                        raise ValueError(f"Error in line {line_num}: Invalid number of arguments for Transform operation.")
-
-                # Or it's a sequence with a biological type
-                elif operation == 'oligo':
-                    if len(elements) == 3:
-                        # It's a sequence, store it
-                        seqname, sequence = elements[1:]
-                        sequence = sequence.upper()
-                        if re.match("^[ATCGNRKYSWBVHDM]+$", sequence):
-                            sequences[seqname] = oligo(sequence)
-                        else:
-                            raise ValueError(f"Error in line {line_num}: Invalid sequence format. Sequences must only contain characters 'A', 'T', 'C', 'G', 'N', 'R', 'K', 'Y', 'S', 'W', 'B', 'V', 'H', 'D', and be at least one character long.")
+                return SequenceDefinition(name, plasmid(sequence))
+        else:
+            # It's a step, parse it
+            operation = elements[0].lower()
+
+            if operation == 'pcr':
+                try:
+                    if len(elements) == 6:
+                        forward_primer, reverse_primer, template, product_size, product_name = elements[1:]
+                        validate_int(product_size, line_num)
+                        return PCR(forward_primer, reverse_primer, template, product_name, int(product_size))
+                    else:
+                        forward_primer, reverse_primer, template, product_name = elements[1:]
+                        return PCR(forward_primer, reverse_primer, template, product_name)
+                except ValueError:
+                    raise ValueError(f"Error in line {line_num}: Invalid argument type for PCR operation.")
+                except IndexError:
+                    raise ValueError(f"Error in line {line_num}: Invalid number of arguments for PCR operation.")
+            elif operation == 'digest':
+                try:
+                    if len(elements) == 5:
+                        dna, enzymes, frag_select, product_name = elements[1:]
+                        validate_int(frag_select, line_num)
+                        frag_select = int(frag_select)
+                        if frag_select < 0:
+                            raise ValueError(f"Error in line {line_num}: Invalid sequence number '{frag_select}'. Must be a non-negative integer.")
+                        enzymes = enzymes.split(',')
+                        unrecognized_enzymes = [enzyme for enzyme in enzymes if enzyme not in ALL_ENZYMES]
+                        if unrecognized_enzymes:
+                            raise ValueError(f"Error in line {line_num}: Unrecognized enzyme(s): {', '.join(unrecognized_enzymes)}")
+                        return Digest(dna, enzymes, frag_select, product_name)
+                    else:
+                        raise ValueError(f"Error in line {line_num}: Invalid number of arguments for Digest operation.")
+                except ValueError:
+                    raise ValueError(f"Error in line {line_num}: Invalid argument type for Digest operation.")
+            elif operation == 'ligate':
+                try:
+                    if len(elements) >= 3:
+                        dnas, product_name = elements[1:-1], elements[-1]
+                        if len(dnas) < 1:
+                            raise ValueError(f"Error in line {line_num}: Ligate operation requires at least 1 DNA inputs.")
+                        return Ligate(dnas, product_name)
                     else:
-                        raise ValueError(f"Error in line {line_num}: Invalid number of arguments for oligo operation.")
-                elif operation == 'plasmid':
-                    if len(elements) == 3:
-                        # It's a sequence, store it
-                        seqname, sequence = elements[1:]
-                        sequence = sequence.upper()
-                        if re.match("^[ATCGNRKYSWBVHDM]+$", sequence):
-                            sequences[seqname] = plasmid(sequence)
-                        else:
-                            raise ValueError(f"Error in line {line_num}: Invalid sequence format. Sequences must only contain characters 'A', 'T', 'C', 'G', 'N', 'R', 'K', 'Y', 'S', 'W', 'B', 'V', 'H', 'D', and be at least one character long.")
+                        raise ValueError(f"Error in line {line_num}: Invalid number of arguments for Ligate operation.")
+                except ValueError:
+                    raise ValueError(f"Error in line {line_num}: Invalid argument type for Ligate operation.")
+            elif operation == 'goldengate':
+                try:
+                    if len(elements) >= 5:
+                        inputs, enzyme, product_name = elements[1:-2], elements[-2], elements[-1]
+                        if len(inputs) < 1:
+                            raise ValueError(f"Error in line {line_num}: GoldenGate operation requires at least 1 inputs.")
+                        if enzyme not in TYPE_IIS_ENZYMES:
+                            raise ValueError(f"Invalid enzyme {enzyme} for GoldenGate. Must be one of {TYPE_IIS_ENZYMES}.")
+                        return GoldenGate(inputs, enzyme, product_name)
                     else:
-                        raise ValueError(f"Error in line {line_num}: Invalid number of arguments for plasmid operation.")
-                elif operation == 'dsdna':
-                    if len(elements) == 3:
-                        # It's a sequence, store it
-                        seqname, sequence = elements[1:]
-                        sequence = sequence.upper()
-                        if re.match("^[ATCGNRKYSWBVHDM]+$", sequence):
-                            sequences[seqname] = dsDNA(sequence)
-                        else:
-                            raise ValueError(f"Error in line {line_num}: Invalid sequence format. Sequences must only contain characters 'A', 'T', 'C', 'G', 'N', 'R', 'K', 'Y', 'S', 'W', 'B', 'V', 'H', 'D', and be at least one character long.")
+                        raise ValueError(f"Error in line {line_num}: Invalid number of arguments for GoldenGate operation.")
+                except ValueError:
+                    raise ValueError(f"Error in line {line_num}: Invalid argument type for GoldenGate operation.")
+            elif operation == 'gibson':
+                try:
+                    if len(elements) >= 4:
+                        inputs, product_name = elements[1:-1], elements[-1]
+                        if len(inputs) < 1:
+                            raise ValueError(f"Error in line {line_num}: Gibson operation requires at least 1 inputs.")
+                        return Gibson(inputs, product_name)
                     else:
-                        raise ValueError(f"Error in line {line_num}: Invalid number of arguments for dsdna operation.")
+                        raise ValueError(f"Error in line {line_num}: Invalid number of arguments for Gibson operation.")
+                except ValueError:
+                    raise ValueError(f"Error in line {line_num}: Invalid argument type for Gibson operation.")
+            elif operation == 'transform':
+                try:
+                    if len(elements) == 6:
+                        dna, strain, antibiotics, temperature, output = elements[1:]
+                        antibiotics = antibiotics.split(',')
+                        validate_antibiotics(antibiotics, line_num)
+                        validate_int(temperature, line_num)
+                        return Transform(dna, strain, antibiotics, output, int(temperature))
+                    else:
+                        dna, strain, antibiotics, output = elements[1:]
+                        antibiotics = antibiotics.split(',')
+                        validate_antibiotics(antibiotics, line_num)
+                        return Transform(dna, strain, antibiotics, output)
+                except ValueError:
+                    raise ValueError(f"Error in line {line_num}: Invalid argument type for Transform operation.")
+                except IndexError:
+                    raise ValueError(f"Error in line {line_num}: Invalid number of arguments for Transform operation.")
 
+            # Or it's a sequence with a biological type
+            elif operation == 'oligo':
+                if len(elements) == 3:
+                    # It's a sequence, store it
+                    seqname, sequence = elements[1:]
+                    if sequence.startswith('@'):
+                        return SequenceDefinition(seqname, stored_sequence(sequence, store, 'oligo'))
+                    return SequenceDefinition(seqname, oligo(normalize_sequence(sequence)))
+                else:
+                    raise ValueError(f"Error in line {line_num}: Invalid number of arguments for oligo operation.")
+            elif operation == 'plasmid':
+                if len(elements) == 3:
+                    # It's a sequence, store it
+                    seqname, sequence = elements[1:]
+                    if sequence.startswith('@'):
+                        return SequenceDefinition(seqname, stored_sequence(sequence, store, 'plasmid'))
+                    return SequenceDefinition(seqname, plasmid(normalize_sequence(sequence)))
                 else:
-                    raise ValueError(f"Error in line {line_num}: Invalid operation {operation}")
-        except (ValueError, IndexError) as e:
-            raise ValueError(f"Error in line {line_num}: {str(e)}")
+                    raise ValueError(f"Error in line {line_num}: Invalid number of arguments for plasmid operation.")
+            elif operation == 'dsdna':
+                if len(elements) == 3:
+                    # It's a sequence, store it
+                    seqname, sequence = elements[1:]
+                    if sequence.startswith('@'):
+                        return SequenceDefinition(seqname, stored_sequence(sequence, store, 'dsdna'))
+                    return SequenceDefinition(seqname, dsDNA(normalize_sequence(sequence)))
+                else:
+                    raise ValueError(f"Error in line {line_num}: Invalid number of arguments for dsdna operation.")
 
-    return ConstructionFile(steps, sequences)
+            else:
+                raise ValueError(f"Error in line {line_num}: Invalid operation {operation}")
+    except (ValueError, IndexError) as e:
+        raise ValueError(f"Error in line {line_num}: {str(e)}")
+
+def make_sequence(sequence, kind=None):
+    """
+    Return the Polynucleotide of a sequence as a sequence line would: of
+    the given kind (oligo, plasmid or dsdna), or without one an oligo if
+    shorter than 100 bases and a plasmid otherwise.
+    """
+    sequence = normalize_sequence(sequence)
+    if kind is None:
+        kind = 'oligo' if len(sequence) < 100 else 'plasmid'
+    if kind not in SEQUENCE_TYPES:
+        raise ValueError(f"Unknown sequence type '{kind}'. Must be one of {', '.join(SEQUENCE_TYPES)}.")
+    return SEQUENCE_TYPES[kind](sequence)
+
+def stored_sequence(reference, store, kind=None):
+    # The registered Polynucleotide that an '@ID' refers to
+    poly = store.get(reference[1:]) if store is not None else None
+    if poly is None:
+        raise ValueError(f"Unknown sequence ID '{reference}'. Sequences must be registered before a CF refers to them.")
+    if kind is not None and SEQUENCE_TYPES[kind](poly.sequence) != poly:
+        raise ValueError(f"Sequence '{reference}' was not registered as {kind}.")
+    return poly
 
 def validate_int(value, line_num):
     try:
@@ -0,0 +1,175 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from .polynucleotide import Polynucleotide
+from .step_cache import ENTRY_OVERHEAD
+
+# Access times recorded by get() are written in batches of this many, or with the next put()
+TOUCH_BATCH = 256
+
+# Least recently used products deleted per query while evicting
+EVICT_BATCH = 64
+
+
+class SQLiteStepCache:
+    """
+    On-disk cache of step products in a local SQLite file, keyed by step_key.
+
+    The file survives restarts and can be shared by several worker processes:
+    each process and thread opens its own connection, the database runs in
+    WAL mode so readers do not block the writer, and writers wait up to
+    `timeout` seconds for each other. Once the stored products exceed
+    max_bytes, the least recently used ones are deleted.
+
+    The total size is kept in a metadata row updated with every write, so a
+    put does not sum the table. Hits do not write to the file: their access
+    times are held by each connection and written with its next put, or once
+    TOUCH_BATCH of them have accumulated.
+    """
+    def __init__(self, path, max_bytes=1024 * 1024 * 1024, timeout=30.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connect()
+
+    def _connect(self):
+        # Connections cannot be shared across processes or threads
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+
+        connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS products (
+                key TEXT PRIMARY KEY,
+                sequence TEXT,
+                ext5 TEXT,
+                ext3 TEXT,
+                is_double_stranded INTEGER,
+                is_circular INTEGER,
+                mod_ext5 TEXT,
+                mod_ext3 TEXT,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )""")
+        connection.execute('CREATE INDEX IF NOT EXISTS products_last_used ON products (last_used)')
+        connection.execute('CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+        # Files written before the metadata table existed start from the sum of their products
+        connection.execute("INSERT OR IGNORE INTO metadata SELECT 'total_size', COALESCE(SUM(size), 0) FROM products")
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        self._local.touched = {}
+        return connection
+
+    def get(self, key):
+        connection = self._connect()
+        row = connection.execute(
+            'SELECT sequence, ext5, ext3, is_double_stranded, is_circular, mod_ext5, mod_ext3 '
+            'FROM products WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        touched = self._local.touched
+        touched[key] = time.time()
+        if len(touched) >= TOUCH_BATCH:
+            with self._transaction(connection):
+                self._write_touches(connection)
+        sequence, ext5, ext3, is_double_stranded, is_circular, mod_ext5, mod_ext3 = row
+        return Polynucleotide(sequence, ext5, ext3, bool(is_double_stranded), bool(is_circular), mod_ext5, mod_ext3)
+
+    def put(self, key, poly):
+        # Products are stored decoded, so packed ones take their full length on disk
+        sequence = poly.sequence
+        size = len(sequence) + len(poly.ext5 or '') + len(poly.ext3 or '') + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        connection = self._connect()
+        with self._transaction(connection):
+            # Recent hits count before choosing what to evict
+            self._write_touches(connection)
+            replaced = connection.execute('SELECT size FROM products WHERE key = ?', (key,)).fetchone()
+            connection.execute(
+                'INSERT OR REPLACE INTO products VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, sequence, poly.ext5, poly.ext3, int(poly.is_double_stranded),
+                 int(poly.is_circular), poly.mod_ext5, poly.mod_ext3, size, time.time()))
+            total = self._add_size(connection, size - (replaced[0] if replaced else 0))
+            if total > self.max_bytes:
+                self._evict(connection, total)
+
+    @staticmethod
+    @contextmanager
+    def _transaction(connection):
+        # Take the write lock up front, so concurrent writers wait rather than fail midway
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _write_touches(self, connection):
+        # Write the access times of the hits since the last write
+        touched = self._local.touched
+        if touched:
+            connection.executemany('UPDATE products SET last_used = ? WHERE key = ?',
+                                   [(used, key) for key, used in touched.items()])
+            touched.clear()
+
+    def _add_size(self, connection, change):
+        connection.execute("UPDATE metadata SET value = value + ? WHERE name = 'total_size'", (change,))
+        return connection.execute("SELECT value FROM metadata WHERE name = 'total_size'").fetchone()[0]
+
+    def _evict(self, connection, total):
+        # Delete least recently used products, a batch at a time, until the total fits max_bytes
+        freed = 0
+        while total - freed > self.max_bytes:
+            rows = connection.execute('SELECT key, size FROM products ORDER BY last_used LIMIT ?',
+                                      (EVICT_BATCH,)).fetchall()
+            if not rows:
+                break
+            victims = []
+            for key, size in rows:
+                victims.append((key,))
+                freed += size
+                if total - freed <= self.max_bytes:
+                    break
+            connection.executemany('DELETE FROM products WHERE key = ?', victims)
+        self._add_size(connection, -freed)
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM products').fetchone()[0]
+
+    def current_bytes(self):
+        return self._connect().execute("SELECT value FROM metadata WHERE name = 'total_size'").fetchone()[0]
+
+    def clear(self):
+        connection = self._connect()
+        with self._transaction(connection):
+            connection.execute('DELETE FROM products')
+            connection.execute("UPDATE metadata SET value = 0 WHERE name = 'total_size'")
+        self._local.touched.clear()
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            try:
+                if self._local.touched:
+                    with self._transaction(connection):
+                        self._write_touches(connection)
+            finally:
+                connection.close()
+        self._local.connection = None
+
+    def __getstate__(self):
+        # Only the settings are pickled; each process opens its own connection
+        return {'path': self.path, 'max_bytes': self.max_bytes, 'timeout': self.timeout}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
@@ -0,0 +1,154 @@
+class ExecutionPlan:
+    """
+    The dependency graph of the steps of a ConstructionFile.
+
+    dependencies[i] holds the indices of the steps whose products step i uses,
+    and dependents[i] the indices of the steps that use the product of step i.
+    """
+    def __init__(self, steps, dependencies):
+        self.steps = steps
+        self.dependencies = dependencies
+        self.dependents = [set() for _ in steps]
+        for index, step_dependencies in enumerate(dependencies):
+            for dependency in step_dependencies:
+                self.dependents[dependency].add(index)
+
+    def ready(self):
+        # Indices of the steps that only use input sequences
+        return [index for index, dependencies in enumerate(self.dependencies) if not dependencies]
+
+    def order(self):
+        # A topological order of the step indices, or None if there is a cycle
+        order = self._reachable_order()
+        if len(order) < len(self.steps):
+            return None
+        return order
+
+    def _reachable_order(self):
+        # Kahn's algorithm; steps in or downstream of a cycle are never reached
+        waiting = [len(dependencies) for dependencies in self.dependencies]
+        order = self.ready()
+        for index in order:
+            for dependent in sorted(self.dependents[index]):
+                waiting[dependent] -= 1
+                if waiting[dependent] == 0:
+                    order.append(dependent)
+        return order
+
+
+def step_inputs(step):
+    # Names of the sequences a step uses, in the order it uses them
+    if step.operation == 'PCR':
+        return [step.forward_oligo, step.reverse_oligo, step.template]
+    elif step.operation in ('Digest', 'Transform'):
+        return [step.dna]
+    return list(step.dnas)
+
+
+def step_producers(steps, sequences):
+    """
+    Map each product name to the index of the step that makes it. Raises
+    ValueError if a name is defined more than once.
+    """
+    producers = {}
+    for index, step in enumerate(steps):
+        if step.output in sequences or step.output in producers:
+            raise ValueError(f"Product name '{step.output}' of step {index + 1} ({step.operation}) is defined more than once.")
+        producers[step.output] = index
+    return producers
+
+
+def plan_CF(construction_file):
+    """
+    Build the ExecutionPlan of a ConstructionFile.
+
+    Raises ValueError if a name is defined more than once, if a step uses a
+    name that is neither a sequence nor the product of a step, or if the
+    steps depend on each other in a cycle.
+    """
+    steps = construction_file.steps
+    sequences = construction_file.sequences
+
+    producers = step_producers(steps, sequences)
+
+    # Link each step to the steps making its inputs
+    dependencies = []
+    for index, step in enumerate(steps):
+        step_dependencies = set()
+        for name in step_inputs(step):
+            if name in producers:
+                step_dependencies.add(producers[name])
+            elif name not in sequences:
+                raise ValueError(f"Step {index + 1} ({step.operation} {step.output}) uses undefined input '{name}'.")
+        dependencies.append(step_dependencies)
+
+    plan = ExecutionPlan(steps, dependencies)
+
+    if plan.order() is None:
+        reached = set(plan._reachable_order())
+        cyclic = [step.output for index, step in enumerate(steps) if index not in reached]
+        raise ValueError(f"Steps making {', '.join(cyclic)} depend on each other in a cycle.")
+
+    return plan
+
+
+def contributing_steps(construction_file, targets):
+    """
+    Return the indices of the steps needed to make `targets`, ordered so that
+    every step comes after the steps making its inputs.
+
+    Only the steps walked back from the targets are checked: a step that
+    does not contribute may use undefined names. Raises ValueError for a
+    target or input that is neither a sequence nor a product, and for
+    contributing steps that depend on each other in a cycle.
+    """
+    steps = construction_file.steps
+    sequences = construction_file.sequences
+
+    producers = step_producers(steps, sequences)
+
+    for target in targets:
+        if target not in producers and target not in sequences:
+            raise ValueError(f"Target '{target}' is neither a sequence nor the product of a step.")
+
+    # Depth-first walk from the targets; post-order puts inputs first. The
+    # walk keeps its own stack, as a chain of steps can be longer than the
+    # recursion limit
+    order = []
+    state = {}
+    for target in targets:
+        if target not in producers or state.get(producers[target]) == 'done':
+            continue
+        state[producers[target]] = 'visiting'
+        stack = [(producers[target], iter(step_inputs(steps[producers[target]])))]
+        while stack:
+            index, inputs = stack[-1]
+            for name in inputs:
+                if name in producers:
+                    producer = producers[name]
+                    if state.get(producer) == 'done':
+                        continue
+                    if state.get(producer) == 'visiting':
+                        raise ValueError(f"Steps making {', '.join(steps[i].output for i in state if state[i] == 'visiting')} depend on each other in a cycle.")
+                    state[producer] = 'visiting'
+                    stack.append((producer, iter(step_inputs(steps[producer]))))
+                    break
+                elif name not in sequences:
+                    step = steps[index]
+                    raise ValueError(f"Step {index + 1} ({step.operation} {step.output}) uses undefined input '{name}'.")
+            else:
+                # Every input is made; the step can follow them
+                stack.pop()
+                state[index] = 'done'
+                order.append(index)
+    return order
+
+
+def final_products(construction_file):
+    """
+    Return the names of the products that no other step uses, in step order.
+    """
+    used = set()
+    for step in construction_file.steps:
+        used.update(step_inputs(step))
+    return [step.output for step in construction_file.steps if step.output not in used]
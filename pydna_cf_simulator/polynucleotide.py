@@ -1,9 +1,14 @@
+from .packed_sequence import PackedSequence
+from .sequence_kernels import uppercase
+
+
 class Polynucleotide:
+    __slots__ = ('_sequence', 'ext5', 'ext3', 'is_double_stranded', 'is_circular', 'mod_ext5', 'mod_ext3', '__weakref__')
 
     def __eq__(self, other):
         if not isinstance(other, Polynucleotide):
             return NotImplemented
-        return (self.sequence == other.sequence and
+        return (self._sequence == other._sequence and
                 self.ext5 == other.ext5 and
                 self.ext3 == other.ext3 and
                 self.is_double_stranded == other.is_double_stranded and
@@ -11,7 +16,7 @@ class Polynucleotide:
                 self.mod_ext5 == other.mod_ext5 and
                 self.mod_ext3 == other.mod_ext3)
     def __init__(self, sequence, ext5, ext3, is_double_stranded, is_circular, mod_ext5, mod_ext3):
-        self.sequence = sequence.upper() if sequence else sequence
+        self.sequence = sequence
         self.ext5 = ext5.upper() if ext5 else ext5
         self.ext3 = ext3.upper() if ext3 else ext3
         self.is_double_stranded = is_double_stranded
@@ -19,6 +24,53 @@ class Polynucleotide:
         self.mod_ext5 = mod_ext5
         self.mod_ext3 = mod_ext3
 
+    @property
+    def sequence(self):
+        # Packed sequences are decoded on every access, not kept as str
+        if isinstance(self._sequence, PackedSequence):
+            return str(self._sequence)
+        return self._sequence
+
+    @sequence.setter
+    def sequence(self, sequence):
+        if isinstance(sequence, PackedSequence):
+            self._sequence = sequence
+        else:
+            self._sequence = uppercase(sequence) if sequence else sequence
+
+    @property
+    def is_compact(self):
+        return isinstance(self._sequence, PackedSequence)
+
+    def sequence_nbytes(self):
+        # Memory held by the sequence, read from the packed buffer without decoding it
+        if isinstance(self._sequence, PackedSequence):
+            return self._sequence.nbytes()
+        return len(self._sequence)
+
+    def compact(self):
+        """
+        Return an equal Polynucleotide whose sequence is stored 2-bit packed.
+
+        The sequence is decoded to str when it is read. Sequences that are
+        empty or not ASCII are kept as they are.
+        """
+        sequence = self._sequence
+        if sequence and isinstance(sequence, str) and sequence.isascii():
+            sequence = PackedSequence(sequence)
+        return Polynucleotide(sequence, self.ext5, self.ext3, self.is_double_stranded, self.is_circular, self.mod_ext5, self.mod_ext3)
+
+    def to_dict(self):
+        return {
+            'sequence': self.sequence,
+            'ext5': self.ext5,
+            'ext3': self.ext3,
+            'is_double_stranded': self.is_double_stranded,
+            'is_circular': self.is_circular,
+            'mod_ext5': self.mod_ext5,
+            'mod_ext3': self.mod_ext3,
+        }
+
     def __str__(self):
         return f'Polynucleotide(sequence={self.sequence}, ext5={self.ext5}, ext3={self.ext3}, is_double_stranded={self.is_double_stranded}, is_circular={self.is_circular}, mod_ext5={self.mod_ext5}, mod_ext3={self.mod_ext3})'
 
@@ -34,4 +86,4 @@ def oligo(sequence):
 
 
 def plasmid(sequence):
-    return Polynucleotide(sequence, '', '', True, True, None, None)
\ No newline at end of file
+    return Polynucleotide(sequence, '', '', True, True, None, None)
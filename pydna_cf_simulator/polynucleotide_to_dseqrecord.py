@@ -1,17 +1,37 @@
+import functools
 import re
-from pydna.dseq import Dseq
-from pydna.dseqrecord import Dseqrecord
-from pydna.utils import rc
+from .instrumentation import instrumented
+from .sequence_kernels import invalid_position, reverse_complement
 
 
+@functools.lru_cache(maxsize=None)
+def single_strand_tables():
+    """
+    Return translation tables from the watson letters of single stranded
+    bases to pydna's one-letter base pair codes: one for bases only on the
+    watson strand, one for bases only on the crick strand. None if this
+    pydna has no base pair codes, and Dseq is built from its strands.
+    """
+    try:
+        from pydna.alphabet import basepair_dict
+        from pydna.dseq import Dseq
+    except ImportError:
+        return None
+    if not hasattr(Dseq, 'quick'):
+        return None
+    watson_only = {base: basepair_dict[base, ' '] for base in 'ATCG'}
+    crick_only = {base: basepair_dict[' ', reverse_complement(base)] for base in 'ATCG'}
+    return str.maketrans(watson_only), str.maketrans(crick_only)
+
+
+@instrumented
 def polynucleotide_to_dseqrecord(poly):
-    # Convert the sequence and extensions to uppercase
-    sequence = poly.sequence.upper()
-    ext5 = poly.ext5.upper() if poly.ext5 else ''
-    ext3 = poly.ext3.upper() if poly.ext3 else ''
-    
+    # pydna takes a second or more to import, so only on the first conversion
+    from pydna.dseq import Dseq
+    from pydna.dseqrecord import Dseqrecord
+
     # Check the sequence data
-    if not re.match(r'^[ATCGNRKYSWBVHDM]+$', poly.sequence):
+    if not poly.sequence or invalid_position(poly.sequence) is not None:
         raise ValueError("Invalid characters in sequence. Sequence must only contain the characters ATCGNRKYSWBVHDM.")
 
     if poly.ext5 and not re.match(r'^(-)?[ATCG]+$', poly.ext5):
@@ -24,11 +44,30 @@ def polynucleotide_to_dseqrecord(poly):
     if poly.is_circular and (poly.ext5 or poly.ext3):
         raise Exception("Circular Polynucleotide cannot have overhangs")
 
+    tables = single_strand_tables()
+    if tables is None:
+        return Dseqrecord(strands_to_dseq(poly, Dseq))
+
+    # pydna keeps one letter per base pair, the base itself where both strands
+    # are present, so only the extensions need translating. Building it
+    # directly skips Dseq's per-base loop, which dominates on long sequences
+    watson_only, crick_only = tables
+    ext5 = poly.ext5
+    left = ext5[1:].translate(crick_only) if ext5.startswith('-') else ext5.translate(watson_only)
+    ext3 = poly.ext3
+    right = ext3[1:].translate(watson_only) if ext3.startswith('-') else ext3.translate(crick_only)
+    data = (left + poly.sequence + right).encode('ascii')
+    return Dseqrecord(Dseq.quick(data, circular=poly.is_circular))
+
+
+def strands_to_dseq(poly, Dseq):
+    # A Dseq from the two strands of a Polynucleotide, for pydna without base pair codes
+
     # Grab the 'sequences' portion of the Polynucleotide
     coding_strand = poly.sequence
     
     # Calculate the reverse complement
-    complementary_strand = rc(coding_strand)
+    complementary_strand = reverse_complement(coding_strand)
 
     # Handle 5' extension
     ext_5 = poly.ext5
@@ -37,23 +76,23 @@ def polynucleotide_to_dseqrecord(poly):
         overhang = -len(ext_5)
     else:
         ext_5 = ext_5[1:]
-        complementary_strand = complementary_strand + rc(ext_5)
+        complementary_strand = complementary_strand + reverse_complement(ext_5)
         overhang = len(ext_5)
 
     # Handle 3' extension
     ext_3 = poly.ext3
     if not ext_3.startswith('-'):
-        ext_3 = rc(ext_3)
+        ext_3 = reverse_complement(ext_3)
         complementary_strand = ext_3 + complementary_strand
     else:
         ext_3 = ext_3[1:]
         coding_strand += ext_3
 
-    # Create Dseqrecord
+    # Create Dseq
     sequence = Dseq(coding_strand, complementary_strand, overhang)
 
     # Loop it if it's circular
     if poly.is_circular:
         sequence = sequence.looped()
 
-    return Dseqrecord(sequence)
+    return sequence
@@ -0,0 +1,6 @@
+# Importing this module warms the simulator up. warm_context gives it to the
+# fork server as a preload, so pydna and the enzyme tables are loaded once
+# there and every worker forked from it starts warm.
+from .warm_start import warm_up
+
+warm_up()
@@ -0,0 +1,217 @@
+import numpy as np
+
+from .sequence_kernels import reverse_complement
+from .circular_sequence import CircularView
+from .polynucleotide import Polynucleotide
+from .sequence_store import derived
+from .template_cache import TemplateCache
+
+# Length of the 3' part of a primer compared with the template when
+# mismatches are allowed; bases further 5' form a tail that need not anneal
+ANNEAL_LENGTH = 18
+
+# Memory budget of the template masks kept for reuse by later PCRs; masks
+# take at most 19 bits per template base
+MASK_CACHE_BYTES = 128 * 1024 * 1024
+
+# Bit of each base, and the bases each IUPAC code stands for; every other byte
+# has no bits and matches nothing
+BASE_BITS = {'A': 1, 'C': 2, 'G': 4, 'T': 8}
+IUPAC_BASES = {
+    'A': 'A', 'C': 'C', 'G': 'G', 'T': 'T',
+    'R': 'AG', 'Y': 'CT', 'K': 'GT', 'M': 'AC', 'S': 'CG', 'W': 'AT',
+    'B': 'CGT', 'D': 'AGT', 'H': 'ACT', 'V': 'ACG', 'N': 'ACGT',
+}
+IUPAC_MASKS = np.zeros(256, dtype=np.uint8)
+for code, bases in IUPAC_BASES.items():
+    for character in (code, code.lower()):
+        IUPAC_MASKS[ord(character)] = sum(BASE_BITS[base] for base in bases)
+
+# The distinct codes a pattern base can have, one per IUPAC code
+CODE_MASKS = {int(IUPAC_MASKS[ord(code)]) for code in IUPAC_BASES}
+
+
+def iupac_mask(base):
+    return int(IUPAC_MASKS[ord(base)]) if ord(base) < 256 else 0
+
+
+class TemplateMasks:
+    """
+    Bit masks of a template for finding primer sites with mismatches.
+
+    For each of A, C, G and T, bit i of a mask is set where the template base
+    at i is, or may be, that base, so a degenerate template base matches each
+    base it stands for. Bits are packed 64 to a word, so a primer base is
+    compared with every template position at once: the mask of the positions
+    it matches is the OR of its bases' masks. On circular templates the sites
+    spanning the origin are included, from the few bases after the origin
+    that they reach rather than a wrapped copy of the template.
+    """
+    def __init__(self, sequence, circular, pattern_length=ANNEAL_LENGTH):
+        self.sequence = sequence
+        self.circular = circular
+        self.pattern_length = pattern_length
+        self.length = len(sequence)
+        self.words = -(-self.length // 64)
+        template = IUPAC_MASKS[np.frombuffer(sequence.encode('ascii', 'replace'), dtype=np.uint8)]
+        wrapped = np.zeros(0, dtype=np.uint8)
+        if circular and sequence:
+            # The bases after the origin that sites spanning it reach, wrapped
+            # around as often as a pattern can, however short the template
+            wrapped_bases = CircularView(sequence).slice(self.length, self.length + pattern_length - 1)
+            wrapped = IUPAC_MASKS[np.frombuffer(wrapped_bases.encode('ascii', 'replace'), dtype=np.uint8)]
+
+        # Room for the largest shift, pattern_length - 1 bits, past the last site
+        bits = (self.words + -(-pattern_length // 64) + 1) * 64
+        self._base_masks = {}
+        for bit in BASE_BITS.values():
+            plane = np.zeros(bits, dtype=bool)
+            plane[:self.length] = (template & bit) != 0
+            plane[self.length:self.length + len(wrapped)] = (wrapped & bit) != 0
+            self._base_masks[bit] = np.packbits(plane, bitorder='little').view('<u8')
+        self._code_masks = {}
+
+    def nbytes(self):
+        # The four base masks and every code mask _mask may go on to build
+        return self._base_masks[1].nbytes * (len(BASE_BITS) + len(CODE_MASKS))
+
+    def _site_mask(self, pattern_length):
+        # Start positions of the sites of a pattern: all positions of a
+        # circular template, and those leaving room for the pattern otherwise
+        sites = self.length if self.circular else self.length - pattern_length + 1
+        mask = np.zeros(self.words * 64, dtype=bool)
+        mask[:max(sites, 0)] = True
+        return np.packbits(mask, bitorder='little').view('<u8')
+
+    def _mask(self, code):
+        # Template positions matching an IUPAC code, given by its bits
+        mask = self._code_masks.get(code)
+        if mask is None:
+            mask = np.zeros_like(self._base_masks[1])
+            for bit, base_mask in self._base_masks.items():
+                if code & bit:
+                    mask |= base_mask
+            self._code_masks[code] = mask
+        return mask
+
+    def _matches(self, code, offset):
+        # Sites where a pattern base with this code, `offset` bases into the
+        # pattern, matches the template
+        mask = self._mask(code)
+        words, bits = divmod(offset, 64)
+        shifted = mask[words:words + self.words] >> np.uint64(bits)
+        if bits:
+            shifted |= mask[words + 1:words + 1 + self.words] << np.uint64(64 - bits)
+        return shifted
+
+    def find(self, pattern, max_mismatches, anchor=None):
+        """
+        Return the sorted start positions where `pattern` matches the template
+        with at most `max_mismatches` mismatched bases. If `anchor` is given,
+        the pattern base at that offset must match.
+
+        Uses the k-mismatch recurrence of Wu and Manber, bit-parallel over the
+        template positions: after each pattern base, bit i of within[d] is set
+        where the site starting at i has at most d mismatches so far.
+        """
+        if len(pattern) > self.pattern_length:
+            raise ValueError(f"Patterns can be at most {self.pattern_length} bases long.")
+        if self.words == 0 or len(pattern) == 0:
+            return []
+        sites = self._site_mask(len(pattern))
+        within = [sites.copy() for _ in range(max_mismatches + 1)]
+        for offset, base in enumerate(pattern):
+            matches = self._matches(iupac_mask(base), offset)
+            for d in range(max_mismatches, 0, -1):
+                within[d] &= matches
+                within[d] |= within[d - 1]
+            within[0] &= matches
+        found = within[max_mismatches]
+        if anchor is not None:
+            found &= self._matches(iupac_mask(pattern[anchor]), anchor)
+        words = np.flatnonzero(found)
+        if len(words) == 0:
+            return []
+        bits = np.unpackbits(found[words].view(np.uint8), bitorder='little').reshape(-1, 64)
+        rows, columns = np.nonzero(bits)
+        return (words[rows] * 64 + columns).tolist()
+
+
+# Template masks shared by every simulation in the process
+mask_cache = TemplateCache(MASK_CACHE_BYTES)
+
+
+def template_masks(sequence, circular):
+    """
+    Return the TemplateMasks of a template, reusing the ones built by an
+    earlier PCR on the same sequence.
+    """
+    return mask_cache.get(sequence, circular, TemplateMasks)
+
+
+def primer_sites(primer, masks, max_mismatches):
+    """
+    Return the 3' end positions of a primer annealing to the top strand of a
+    template, and the 3' end positions of it annealing to the bottom strand,
+    as in find_amplicon: its 3' ANNEAL_LENGTH bases must match with at most
+    `max_mismatches` mismatches, and its 3' base must match.
+    """
+    anneal = primer[-ANNEAL_LENGTH:]
+    forward = [start + len(anneal) for start in masks.find(anneal, max_mismatches, len(anneal) - 1)]
+    reverse = masks.find(reverse_complement(anneal), max_mismatches, 0)
+    return forward, reverse
+
+
+def find_amplicon_mismatched(forward, reverse, template, max_mismatches, names=('forward', 'reverse', 'template')):
+    """
+    Find the PCR product of two primer Polynucleotides on a template, letting
+    each primer anneal with up to `max_mismatches` mismatches in its 3'
+    ANNEAL_LENGTH bases. IUPAC codes in the primers and the template match
+    every base they stand for. Either primer may anneal in either direction,
+    and the product keeps the primers' own bases, tails included.
+
+    Raises a ValueError, naming the inputs by `names`, unless there is
+    exactly one forward and one reverse site with a product between them.
+    """
+    forward_name, reverse_name, template_name = names
+    if not isinstance(max_mismatches, int) or max_mismatches < 0:
+        raise ValueError(f"The number of mismatches must be a non-negative integer, but it is {max_mismatches!r}.")
+    if not template.is_double_stranded or template.ext5 or template.ext3:
+        raise ValueError(f"PCR with mismatches needs a blunt or circular double stranded template, but '{template_name}' is not.")
+    for name, primer in ((forward_name, forward), (reverse_name, reverse)):
+        if len(primer.sequence) <= 2 * max_mismatches:
+            raise ValueError(f"Primer '{name}' is too short to anneal with {max_mismatches} mismatches.")
+
+    sequence = template.sequence
+    n = len(sequence)
+    masks = derived(template, 'template_masks', lambda: template_masks(sequence, template.is_circular))
+
+    forward_sites = []
+    reverse_sites = []
+    for primer in (forward.sequence, reverse.sequence):
+        forward_ends, reverse_starts = primer_sites(primer, masks, max_mismatches)
+        forward_sites += [(end, primer) for end in forward_ends]
+        reverse_sites += [(start, primer) for start in reverse_starts]
+
+    if not forward_sites or not reverse_sites:
+        raise ValueError(f"Primers '{forward_name}' and '{reverse_name}' do not anneal on both strands of '{template_name}' "
+                         f"with at most {max_mismatches} mismatches.")
+    if len(forward_sites) > 1 or len(reverse_sites) > 1:
+        raise ValueError(f"Primers '{forward_name}' and '{reverse_name}' anneal at {len(forward_sites) + len(reverse_sites)} sites "
+                         f"of '{template_name}' with at most {max_mismatches} mismatches; PCR needs exactly two.")
+    forward_end, forward_primer = forward_sites[0]
+    reverse_start, reverse_primer = reverse_sites[0]
+
+    # Template between the primers' 3' ends
+    if not template.is_circular:
+        if forward_end > reverse_start:
+            raise ValueError(f"Primers '{forward_name}' and '{reverse_name}' anneal to '{template_name}' facing away from each other.")
+        between = sequence[forward_end:reverse_start]
+    else:
+        forward_end %= n
+        if reverse_start < forward_end:
+            reverse_start += n
+        between = CircularView(sequence).slice(forward_end, reverse_start)
+
+    product = forward_primer + between + reverse_complement(reverse_primer)
+    return Polynucleotide(product, '', '', True, False, forward.mod_ext5, reverse.mod_ext5)
@@ -0,0 +1,198 @@
+from collections import namedtuple
+
+import numpy as np
+
+from .amplicon_finder import encode_kmer
+from .sequence_kernels import reverse_complement
+from .circular_sequence import CircularView, circular_slice
+from .packed_sequence import BASE_CODES
+from .polynucleotide import Polynucleotide
+from .parse_CF_shorthand import ALL_ENZYMES
+
+# A cut by one enzyme: the cut positions on the watson strand and on the crick
+# strand (both in watson coordinates), the pydna/Biopython overhang (negative
+# for 5' overhangs) and the watson-strand sequence between the two cuts
+CutSite = namedtuple('CutSite', ['enzyme', 'watson', 'crick', 'ovhg', 'overhang'])
+
+
+class RestrictionScanner:
+    """
+    Finds the cut sites of a set of enzymes in a single pass over a sequence.
+
+    The sequence is encoded once as 2-bit k-mers of the longest recognition
+    site; the codes of shorter sites are prefixes of those k-mers. Every
+    enzyme's site and its reverse complement are looked up in one table, so
+    Type IIS enzymes cutting outside their site are found on both strands.
+    """
+    def __init__(self, enzymes=ALL_ENZYMES):
+        # Biopython's enzyme tables take a while to load, so only when needed
+        from Bio import Restriction
+        self.enzymes = {}
+        self.patterns = {}
+        for name in enzymes:
+            enzyme = Restriction.__dict__[name]
+            site = str(enzyme.site)
+            if enzyme.scd5 is not None or encode_kmer(site) is None:
+                raise ValueError(f"Enzyme {name} is not supported by the restriction scanner.")
+            self.enzymes[name] = enzyme
+            # Cut offsets from the start of the site, for each orientation
+            forward_watson = enzyme.fst5
+            reverse_crick = enzyme.size - enzyme.fst5
+            self._add_pattern(site, name, forward_watson, forward_watson - enzyme.ovhg)
+            if not enzyme.is_palindromic():
+                self._add_pattern(reverse_complement(site), name, reverse_crick + enzyme.ovhg, reverse_crick)
+
+        self.max_length = max(length for length, _ in self.patterns)
+
+    def _add_pattern(self, site, name, watson_offset, crick_offset):
+        key = (len(site), encode_kmer(site))
+        self.patterns.setdefault(key, []).append((name, watson_offset, crick_offset))
+
+    def find_sites(self, sequence, circular):
+        """
+        Return (start, enzyme name, watson offset, crick offset) for every
+        recognition site, including sites spanning the origin of circular
+        sequences.
+        """
+        sites = [(start, name, watson_offset, crick_offset)
+                 for start, _, name, watson_offset, crick_offset in self._find_sites(sequence, len(sequence))]
+        if circular and sequence:
+            # Sites spanning the origin, from the few bases around it
+            view = CircularView(sequence)
+            start, junction = view.junction(self.max_length)
+            sites += [(start + offset, name, watson_offset, crick_offset)
+                      for offset, length, name, watson_offset, crick_offset in self._find_sites(junction, len(view) - start)
+                      if view.spans_origin(start + offset, length)]
+        return sites
+
+    def _find_sites(self, text, windows):
+        # (start, length, enzyme name, watson offset, crick offset) of the
+        # sites starting in the first `windows` positions of text
+        k = self.max_length
+        windows = min(windows, len(text))
+        if windows <= 0:
+            return []
+
+        # Encode every window of up to k bases once; windows running off the
+        # end of the text are padded with invalid codes
+        codes = BASE_CODES[np.frombuffer(text.encode('ascii', 'replace'), dtype=np.uint8)]
+        codes = np.concatenate([codes, np.full(k, 255, dtype=np.uint8)])
+        kmers = np.zeros(windows, dtype=np.uint64)
+        valid_length = np.full(windows, k, dtype=np.int64)
+        for offset in range(k - 1, -1, -1):
+            window_codes = codes[offset:offset + windows]
+            valid_length[window_codes == 255] = offset
+        for offset in range(k):
+            kmers = (kmers << np.uint64(2)) | (codes[offset:offset + windows] & 3).astype(np.uint64)
+
+        sites = []
+        for (length, value), targets in self.patterns.items():
+            prefixes = kmers >> np.uint64(2 * (k - length))
+            for start in np.flatnonzero((prefixes == value) & (valid_length >= length)).tolist():
+                for name, watson_offset, crick_offset in targets:
+                    sites.append((start, length, name, watson_offset, crick_offset))
+        return sites
+
+    def scan(self, sequence, circular, enzymes=None, sites=None):
+        """
+        Return the CutSites of `enzymes` (default: all of the scanner's
+        enzymes) sorted by watson cut position, as pydna orders them. The
+        `sites` of the sequence from find_sites are found again unless given.
+
+        On linear sequences, cuts whose overhang falls outside the sequence
+        are dropped. On circular sequences, the watson cut is taken modulo the
+        length and the crick cut is kept next to it.
+        """
+        if enzymes is not None:
+            enzymes = set(enzymes)
+        n = len(sequence)
+        cuts = []
+        if sites is None:
+            sites = self.find_sites(sequence, circular)
+        for start, name, watson_offset, crick_offset in sites:
+            if enzymes is not None and name not in enzymes:
+                continue
+            watson = start + watson_offset
+            crick = start + crick_offset
+            if circular:
+                shift = watson - watson % n
+                watson, crick = watson - shift, crick - shift
+            elif min(watson, crick) < 1 or max(watson, crick) > n - 1:
+                continue
+            left, right = min(watson, crick), max(watson, crick)
+            overhang = circular_slice(sequence, left, right) if circular else sequence[left:right]
+            cuts.append(CutSite(name, watson, crick, self.enzymes[name].ovhg, overhang))
+        return sorted(cuts, key=lambda cut: (cut.watson, cut.ovhg, cut.enzyme))
+
+
+def digest_fragments(poly, enzymes, scanner=None, sites=None):
+    """
+    Digest a double-stranded, blunt or circular Polynucleotide and return its
+    fragments in pydna's order, with the overhangs as ext5/ext3. `sites` is
+    an optional callable returning the scanner's find_sites on the sequence,
+    such as a DigestCache's restriction map.
+
+    Returns None when the digest should be left to pydna: sticky or
+    single-stranded inputs, enzymes unknown to the scanner, and cuts that
+    coincide or overlap.
+    """
+    scanner = scanner or default_scanner()
+    if not poly.is_double_stranded or poly.ext5 or poly.ext3:
+        return None
+    if any(enzyme not in scanner.enzymes for enzyme in enzymes):
+        return None
+
+    sequence = poly.sequence
+    n = len(sequence)
+    cuts = scanner.scan(sequence, poly.is_circular, enzymes, sites() if sites is not None else None)
+    if not cuts:
+        return []
+    if len({cut.watson for cut in cuts}) < len(cuts):
+        return None
+
+    # Pairs of (watson, crick) cut positions bounding each fragment
+    bounds = [(cut.watson, cut.crick) for cut in cuts]
+    if poly.is_circular:
+        first_watson, first_crick = bounds[0]
+        pairs = list(zip(bounds, bounds[1:] + [(first_watson + n, first_crick + n)]))
+        cut_sequence = lambda start, end: circular_slice(sequence, start, end)
+    else:
+        bounds = [(0, 0)] + bounds + [(n, n)]
+        pairs = list(zip(bounds, bounds[1:]))
+        cut_sequence = lambda start, end: sequence[start:end]
+
+    fragments = []
+    for (left_watson, left_crick), (right_watson, right_crick) in pairs:
+        inner_start = max(left_watson, left_crick)
+        inner_end = min(right_watson, right_crick)
+        if inner_start >= inner_end:
+            return None
+
+        if left_watson < left_crick:
+            ext5 = cut_sequence(left_watson, left_crick)
+        elif left_watson > left_crick:
+            ext5 = '-' + cut_sequence(left_crick, left_watson)
+        else:
+            ext5 = ''
+
+        if right_watson > right_crick:
+            ext3 = '-' + cut_sequence(right_crick, right_watson)
+        elif right_watson < right_crick:
+            ext3 = cut_sequence(right_watson, right_crick)
+        else:
+            ext3 = ''
+
+        fragment = cut_sequence(inner_start, inner_end)
+        fragments.append(Polynucleotide(fragment, ext5, ext3, True, False, 'phosphate', 'phosphate'))
+    return fragments
+
+
+_default_scanner = None
+
+
+def default_scanner():
+    # Scanner of every enzyme the parsers accept, built on first use
+    global _default_scanner
+    if _default_scanner is None:
+        _default_scanner = RestrictionScanner()
+    return _default_scanner
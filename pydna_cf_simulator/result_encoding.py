@@ -0,0 +1,164 @@
+import base64
+import hashlib
+
+from .sequence_kernels import reverse_complement, GCProfile
+
+# Ways of writing the sequence of each Polynucleotide in a result
+SEQUENCE_FORMATS = ('full', 'seguid', 'digest')
+
+# More minimal-rotation candidates than this are left to least_rotation
+MAX_ROTATION_CANDIDATES = 64
+
+
+def min_rotation(sequence):
+    # The lexicographically smallest rotation of a sequence
+    start = min_rotation_start(sequence)
+    return sequence[start:] + sequence[:start]
+
+
+def min_rotation_start(sequence):
+    """
+    Return the start of the lexicographically smallest rotation of a
+    sequence, as the seguid package finds it.
+
+    The smallest rotation starts with one of the longest runs of the
+    sequence's smallest character, so only those starts are compared, on
+    prefixes of doubling length until one is left. Sequences with many such
+    runs, like repeats, go to least_rotation.
+    """
+    n = len(sequence)
+    if n < 2:
+        return 0
+    doubled = sequence + sequence
+    smallest = min(sequence)
+
+    # Length of the longest run, by doubling and then halving the run searched for
+    longest = 1
+    while 2 * longest <= n and smallest * (2 * longest) in doubled:
+        longest *= 2
+    step = longest // 2
+    while step:
+        if longest + step <= n and smallest * (longest + step) in doubled:
+            longest += step
+        step //= 2
+
+    run = smallest * longest
+    candidates = []
+    start = doubled.find(run)
+    while 0 <= start < n and len(candidates) <= MAX_ROTATION_CANDIDATES:
+        candidates.append(start)
+        start = doubled.find(run, start + 1)
+    if len(candidates) > MAX_ROTATION_CANDIDATES:
+        return least_rotation(doubled)
+
+    window = longest
+    while len(candidates) > 1 and window < n:
+        window = min(2 * window, n)
+        best = min(doubled[start:start + window] for start in candidates)
+        candidates = [start for start in candidates if doubled[start:start + window] == best]
+    return candidates[0]
+
+
+def least_rotation(doubled):
+    # Booth's algorithm: the start of the smallest rotation of a sequence, given twice over
+    failure = [-1] * len(doubled)
+    start = 0
+    for j in range(1, len(doubled)):
+        base = doubled[j]
+        i = failure[j - start - 1]
+        while i != -1 and base != doubled[start + i + 1]:
+            if base < doubled[start + i + 1]:
+                start = j - i - 1
+            i = failure[i]
+        if base != doubled[start + i + 1]:
+            if base < doubled[start]:
+                start = j
+            failure[j - start] = -1
+        else:
+            failure[j - start] = i + 1
+    return start
+
+
+def urlsafe_sha1(sequence):
+    return base64.urlsafe_b64encode(hashlib.sha1(sequence.encode('ascii')).digest()).decode('ascii').rstrip('=')
+
+
+def strands(poly):
+    """
+    Return the watson and crick strands of a linear double stranded
+    Polynucleotide, each written 5' to 3' and padded with '-' where the
+    other strand overhangs, as the seguid package's ldseguid takes them.
+    """
+    ext5, ext3 = poly.ext5 or '', poly.ext3 or ''
+    # Bases of each strand at each position, written as the watson strand reads
+    if ext5.startswith('-'):
+        watson_left, crick_left = '-' * (len(ext5) - 1), ext5[1:]
+    else:
+        watson_left, crick_left = ext5, '-' * len(ext5)
+    if ext3.startswith('-'):
+        watson_right, crick_right = ext3[1:], '-' * (len(ext3) - 1)
+    else:
+        watson_right, crick_right = '-' * len(ext3), ext3
+    watson = watson_left + poly.sequence + watson_right
+    crick = reverse_complement(crick_left + poly.sequence + crick_right)
+    return watson, crick
+
+
+def double_strand_sha1(watson, crick):
+    # Checksum of a duplex, the same whichever strand is given as watson
+    first, second = sorted((watson, crick))
+    return urlsafe_sha1(first + ';' + second)
+
+
+def seguid(poly):
+    """
+    Return the SEGUID checksum of a Polynucleotide: cdseguid or ldseguid for
+    a double stranded one, covering both strands and their overhangs, and
+    csseguid or lsseguid for a single strand. They equal those of the
+    seguid package but skip its alphabet check, which takes seconds on
+    megabase sequences.
+    """
+    sequence = poly.sequence
+    if not poly.is_double_stranded:
+        if poly.is_circular:
+            return 'csseguid=' + urlsafe_sha1(min_rotation(sequence))
+        return 'lsseguid=' + urlsafe_sha1(sequence)
+
+    if not poly.is_circular:
+        return 'ldseguid=' + double_strand_sha1(*strands(poly))
+
+    # The smaller of the strands' smallest rotations, with the other strand
+    # rotated to stay paired with it
+    watson, crick = sequence, reverse_complement(sequence)
+    watson_start, crick_start = min_rotation_start(watson), min_rotation_start(crick)
+    watson_min = watson[watson_start:] + watson[:watson_start]
+    crick_min = crick[crick_start:] + crick[:crick_start]
+    n = len(sequence)
+    if watson_min < crick_min:
+        rotated = (n - watson_start) % n
+        return 'cdseguid=' + double_strand_sha1(watson_min, crick[rotated:] + crick[:rotated])
+    rotated = (n - crick_start) % n
+    return 'cdseguid=' + double_strand_sha1(crick_min, watson[rotated:] + watson[:rotated])
+
+
+def encode_polynucleotide(poly, sequences='full'):
+    """
+    Return a Polynucleotide as a dict like to_dict, with its sequence
+    written in one of SEQUENCE_FORMATS: in full, as its seguid, or as a
+    {"length": ..., "sha1": ..., "gc": ...} digest, which also gives the
+    melting temperature "tm" of single strands such as primers.
+    """
+    result = poly.to_dict()
+    if sequences == 'seguid':
+        result['sequence'] = seguid(poly)
+    elif sequences == 'digest':
+        sequence = poly.sequence or ''
+        profile = GCProfile(sequence)
+        digest = {'length': len(sequence), 'sha1': hashlib.sha1(sequence.encode('ascii')).hexdigest(),
+                  'gc': profile.gc_fraction()}
+        if not poly.is_double_stranded:
+            digest['tm'] = profile.melting_temperature()
+        result['sequence'] = digest
+    elif sequences != 'full':
+        raise ValueError(f"Unknown sequence format '{sequences}'; use one of {', '.join(SEQUENCE_FORMATS)}.")
+    return result
@@ -0,0 +1,119 @@
+import functools
+import re
+
+import numpy as np
+
+# Sequences at least this long go through the byte kernels; shorter ones are
+# quicker with str methods, which skip the conversion to and from bytes
+KERNEL_THRESHOLD = 4096
+
+# Bases the parsers accept
+IUPAC_ALPHABET = 'ATCGNRKYSWBVHDM'
+
+# Translation tables, applied in one C pass by translate. That is several
+# times faster than indexing a NumPy table with a uint8 array, so NumPy is
+# only used to count and locate bases
+UPPERCASE_TABLE = bytes.maketrans(b'abcdefghijklmnopqrstuvwxyz', b'ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+COMPLEMENT_TABLE = str.maketrans('ATCGNRKYSWBVHDMatcgnrkyswbvhdm', 'TAGCNYMRSWVBDHKtagcnymrswvbdhk')
+
+# Bases that pair with three hydrogen bonds, G, C and S (G or C)
+STRONG = np.zeros(256, dtype=bool)
+STRONG[[ord(base) for base in 'GCS']] = True
+
+
+def to_codes(sequence):
+    # A read-only uint8 view of a sequence's ASCII bytes; other characters become '?'
+    return np.frombuffer(sequence.encode('ascii', 'replace'), dtype=np.uint8)
+
+
+def uppercase(sequence):
+    if len(sequence) < KERNEL_THRESHOLD or not sequence.isascii():
+        return sequence.upper()
+    return sequence.encode('ascii').translate(UPPERCASE_TABLE).decode('ascii')
+
+
+def reverse_complement(sequence):
+    # Reverse complement of a sequence of IUPAC bases in either case
+    return sequence.translate(COMPLEMENT_TABLE)[::-1]
+
+
+def reverse_complements(sequences):
+    """
+    Return the reverse complements of several sequences, translated as one
+    joined buffer so that many short sequences cost a single pass.
+    """
+    joined = '\n'.join(reversed(sequences))
+    return reverse_complement(joined).split('\n') if sequences else []
+
+
+@functools.lru_cache(maxsize=None)
+def invalid_pattern(alphabet):
+    return re.compile(f'[^{re.escape(alphabet)}]')
+
+
+def invalid_position(sequence, alphabet=IUPAC_ALPHABET):
+    """
+    Return the position of the first character of `sequence` outside
+    `alphabet`, or None if there is none.
+    """
+    if len(sequence) < KERNEL_THRESHOLD:
+        invalid = invalid_pattern(alphabet).search(sequence)
+        return invalid.start() if invalid else None
+    # Deleting the allowed bytes leaves nothing in a valid sequence
+    data = sequence.encode('ascii', 'replace')
+    if not data.translate(None, alphabet.encode('ascii')):
+        return None
+    valid = np.zeros(256, dtype=bool)
+    valid[list(alphabet.encode('ascii'))] = True
+    return int(np.argmin(valid[np.frombuffer(data, dtype=np.uint8)]))
+
+
+def normalize_sequence(sequence, alphabet=IUPAC_ALPHABET):
+    """
+    Return a sequence in uppercase, raising a ValueError that names the
+    first character outside `alphabet` or the sequence is empty.
+    """
+    sequence = uppercase(sequence)
+    if not sequence:
+        raise ValueError("Invalid sequence format: sequences must be at least one character long.")
+    position = invalid_position(sequence, alphabet)
+    if position is not None:
+        raise ValueError(f"Invalid sequence format: character '{sequence[position]}' at position {position + 1} "
+                         f"is not one of {alphabet}.")
+    return sequence
+
+
+class GCProfile:
+    """
+    G and C content of every window of a sequence, from a running count of
+    its strong bases computed once, so that the GC fraction and melting
+    temperature of any window, such as a primer's binding site, take
+    constant time.
+    """
+    def __init__(self, sequence):
+        self.length = len(sequence)
+        self._strong = np.zeros(self.length + 1, dtype=np.int64)
+        np.cumsum(STRONG[to_codes(uppercase(sequence))], out=self._strong[1:])
+
+    def gc_count(self, start=0, end=None):
+        end = self.length if end is None else end
+        return int(self._strong[end] - self._strong[start])
+
+    def gc_fraction(self, start=0, end=None):
+        end = self.length if end is None else end
+        return self.gc_count(start, end) / (end - start) if end > start else 0.0
+
+    def melting_temperature(self, start=0, end=None):
+        end = self.length if end is None else end
+        return melting_temperature(end - start, self.gc_count(start, end))
+
+
+def melting_temperature(length, gc_count):
+    """
+    Basic melting temperature in degrees Celsius of a duplex of `length`
+    bases, `gc_count` of them G or C: the Wallace rule below 14 bases and
+    64.9 + 41 (GC - 16.4) / length above.
+    """
+    if length < 14:
+        return 2.0 * (length - gc_count) + 4.0 * gc_count
+    return 64.9 + 41.0 * (gc_count - 16.4) / length
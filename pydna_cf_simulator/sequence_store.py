@@ -0,0 +1,99 @@
+import threading
+from collections import OrderedDict
+
+from .step_cache import polynucleotide_digest
+
+# Registered sequences by the id() of their Polynucleotide, so that derived()
+# can find them from the Polynucleotide alone
+_registered = {}
+_registered_lock = threading.Lock()
+
+
+class StoredSequence:
+    # A registered Polynucleotide and what has been derived from it
+    __slots__ = ('polynucleotide', 'derived', 'lock')
+
+    def __init__(self, polynucleotide):
+        self.polynucleotide = polynucleotide
+        self.derived = {}
+        self.lock = threading.Lock()
+
+
+def sequence_id(poly):
+    # Content ID of a Polynucleotide: a hash of every field, as in step keys
+    return polynucleotide_digest(poly).hex()[:32]
+
+
+class SequenceStore:
+    """
+    Content-addressed store of sequences that are uploaded once and then
+    referred to from CF shorthand as '@ID'.
+
+    The ID is a hash of every field of the Polynucleotide, so registering
+    the same sequence again gives the same ID and keeps the first copy. A
+    registered Polynucleotide is shared by every CF that refers to it, and
+    whatever is built from it through derived(), like its Dseqrecord and
+    PCR template index, is kept with it while it stays registered. At most
+    max_sequences are kept; the least recently used are dropped first.
+    """
+    def __init__(self, max_sequences=1024):
+        self.max_sequences = max_sequences
+        self._sequences = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sequences)
+
+    def __contains__(self, sequence_id):
+        return sequence_id in self._sequences
+
+    def register(self, poly):
+        # Store a Polynucleotide and return its ID
+        key = sequence_id(poly)
+        with self._lock:
+            if key in self._sequences:
+                self._sequences.move_to_end(key)
+                return key
+            entry = StoredSequence(poly)
+            self._sequences[key] = entry
+            with _registered_lock:
+                _registered[id(poly)] = entry
+            while len(self._sequences) > self.max_sequences:
+                _, evicted = self._sequences.popitem(last=False)
+                with _registered_lock:
+                    if _registered.get(id(evicted.polynucleotide)) is evicted:
+                        del _registered[id(evicted.polynucleotide)]
+        return key
+
+    def get(self, sequence_id):
+        # The registered Polynucleotide, or None for an unknown ID
+        with self._lock:
+            entry = self._sequences.get(sequence_id)
+            if entry is None:
+                return None
+            self._sequences.move_to_end(sequence_id)
+            return entry.polynucleotide
+
+    def clear(self):
+        with self._lock:
+            with _registered_lock:
+                for entry in self._sequences.values():
+                    if _registered.get(id(entry.polynucleotide)) is entry:
+                        del _registered[id(entry.polynucleotide)]
+            self._sequences.clear()
+
+
+def derived(poly, key, build):
+    """
+    Return build(), which makes something from `poly`. If `poly` is a
+    registered sequence, the result is kept with it under `key` and later
+    calls return the same object, so it must not be modified.
+    """
+    with _registered_lock:
+        entry = _registered.get(id(poly))
+    if entry is None or entry.polynucleotide is not poly:
+        return build()
+    with entry.lock:
+        if key not in entry.derived:
+            entry.derived[key] = build()
+        return entry.derived[key]
@@ -1,101 +1,374 @@
-from pydna.dseqrecord import Dseqrecord
-from pydna.primer import Primer
-from pydna.dseq import Dseq
-from pydna.assembly import Assembly
-from pydna.amplify import pcr
-from Bio.Restriction import *
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from time import perf_counter
 from .polynucleotide_to_dseqrecord import polynucleotide_to_dseqrecord
 from .dseqrecord_to_polynucleotide import dseqrecord_to_polynucleotide
+from .plan_CF import plan_CF, step_inputs, contributing_steps
+from . import instrumentation
+from .parse_CF_shorthand import SequenceDefinition
+from .step_cache import step_key
+from .amplicon_finder import find_amplicon
+from .primer_search import find_amplicon_mismatched
+from .restriction_scanner import digest_fragments
+from .digest_cache import shared_cache as shared_digest_cache
+from .gibson_assembler import assemble_gibson, GIBSON_MIN_OVERLAP
+from .golden_gate_assembler import assemble_golden_gate
+from .sequence_store import derived
 
-from .polynucleotide import oligo
+from .polynucleotide import Polynucleotide, oligo
 
 
-def simulate_CF(construction_file):
-    # Convert all Polynucleotide sequences in the CF to Dseqrecord or Primer
-    polyDictionary = construction_file.sequences
-    dseqDictionary = {}
-    for name, poly in construction_file.sequences.items():
-        if poly.is_double_stranded:
-            dseqDictionary[name] = polynucleotide_to_dseqrecord(poly)
-        else:
-            dseqDictionary[name] = Primer(poly.sequence)
+def simulate_CF(construction_file, cache=None, compact=False, targets=None, on_step=None):
+    polyDictionary = dict(construction_file.sequences)
+    # Optionally keep every sequence 2-bit packed to save memory
+    if compact:
+        polyDictionary = {name: poly.compact() for name, poly in polyDictionary.items()}
+
+    for name, product in run_steps(construction_file, polyDictionary, cache, compact, targets, on_step):
+        polyDictionary[name] = product
+
+    if targets is not None:
+        return {name: polyDictionary[name] for name in targets}
+    return polyDictionary
+
+
+def iter_simulate_CF(construction_file, cache=None, targets=None, on_step=None):
+    """
+    Simulate a CF one step at a time, yielding each step's output name and
+    product as soon as the step finishes. With `targets`, only the steps
+    leading to them are run, as in simulate_CF.
+    """
+    yield from run_steps(construction_file, dict(construction_file.sequences), cache, False, targets, on_step)
+
+
+def run_steps(construction_file, polyDictionary, cache, compact, targets, on_step):
+    # Run the steps in order, adding each product to polyDictionary and
+    # yielding it. Only run the steps that lead to the targets, if there are any
+    steps = construction_file.steps
+    if targets is None:
+        indices = range(len(steps))
+    else:
+        indices = contributing_steps(construction_file, targets)
+
+    # Time the steps only if someone is listening
+    timed = on_step is not None or bool(instrumentation.hooks)
 
     # Iterate through the steps
+    for index in indices:
+        step = steps[index]
+        if timed:
+            product = timed_step(index, step, polyDictionary, cache, on_step)
+        else:
+            product = simulate_step(step, polyDictionary, cache)
+        if compact:
+            product = product.compact()
+        polyDictionary[step.output] = product
+        yield step.output, product
+
+
+def simulate_CF_parallel(construction_file, executor=None, max_workers=None, cache=None):
+    """
+    Simulate a CF, running steps whose inputs are ready concurrently.
+
+    Steps are scheduled from the dependency graph built by plan_CF, so
+    undefined inputs and cycles are reported before any step runs. A thread
+    pool of `max_workers` is used unless an `executor` is given; pass a
+    ProcessPoolExecutor to spread CPU-bound steps over several cores.
+
+    Cache lookups happen in the calling process, so a StepCache is shared by
+    all workers and only missing products are submitted.
+    """
+    plan = plan_CF(construction_file)
+    polyDictionary = dict(construction_file.sequences)
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    try:
+        waiting = [len(dependencies) for dependencies in plan.dependencies]
+        running = {}
+        keys = {}
+
+        def finish(index, product):
+            polyDictionary[plan.steps[index].output] = product
+            for dependent in plan.dependents[index]:
+                waiting[dependent] -= 1
+                if waiting[dependent] == 0:
+                    submit(dependent)
+
+        def submit(index):
+            step = plan.steps[index]
+            inputs = {name: polyDictionary[name] for name in step_inputs(step)}
+            if cache is not None:
+                keys[index] = step_key(step, inputs)
+                product = cache.get(keys[index]) if keys[index] else None
+                if product is not None:
+                    finish(index, product)
+                    return
+            running[executor.submit(simulate_step, step, inputs)] = index
+
+        for index in plan.ready():
+            submit(index)
+
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                product = future.result()
+                if keys.get(index):
+                    cache.put(keys[index], product)
+                finish(index, product)
+    finally:
+        if own_executor:
+            executor.shutdown(cancel_futures=True)
+
+    # Return the products in the same order as simulate_CF
+    result = dict(construction_file.sequences)
     for step in construction_file.steps:
-        operation = step.operation
-        product_name = step.output
-
-        # Switch based on the operation
-        if operation == 'PCR':
-            # Get inputs
-            forward = dseqDictionary[step.forward_oligo]
-            reverse = dseqDictionary[step.reverse_oligo]
-            template = dseqDictionary[step.template]
-            # Simulate PCR
-            amplicon = pcr(forward, reverse, template)
-            # Store product
-            dseqDictionary[product_name] = amplicon
-            product_poly = dseqrecord_to_polynucleotide(amplicon, polyDictionary[step.forward_oligo].mod_ext5, polyDictionary[step.reverse_oligo].mod_ext5) 
-            polyDictionary[product_name] = product_poly;
-            
-        elif operation == 'Digest':
-            # Get inputs
-            sequence = dseqDictionary[step.dna]
-            enzymes = [Restriction.__dict__[name] for name in step.enzymes]
-
-            fragselect = step.fragSelect
-            # Simulate Digest and select fragment
-            fragments = sequence.cut(enzymes)
-            product = fragments[fragselect]
-            # Store product
-            dseqDictionary[product_name] = product
-            product_poly = dseqrecord_to_polynucleotide(product, 'phosphate', 'phosphate')
-            polyDictionary[product_name] = product_poly;
-            
-        elif operation == 'Ligate':
-            # Get inputs
-            fragments = [dseqDictionary[dna] for dna in step.dnas]
-            # Simulate Ligate
-            product = fragments[0]
-            for fragment in fragments[1:]:
-                product += fragment
-            # Convert to Polynucleotide and check for circularization
-            product_poly = dseqrecord_to_polynucleotide(product, polyDictionary[step.dnas[0]].mod_ext5, polyDictionary[step.dnas[-1]].mod_ext3)
-            if product_poly.ext5 == product_poly.ext3 and product_poly.mod_ext5 == 'phosphate' and product_poly.mod_ext3 == 'phosphate':
-                product_poly.sequence = product_poly.ext5 + product_poly.sequence
-                product_poly.ext5 = ""
-                product_poly.ext3 = ""
-                product_poly.mod_ext5 = ""
-                product_poly.mod_ext3 = ""
-                product_poly.is_circular = True
-            # Convert back to Dseqrecord for storage
-            product = polynucleotide_to_dseqrecord(product_poly)
-            # Store product
-            dseqDictionary[product_name] = product
-            polyDictionary[product_name] = product_poly;
-
-        elif operation == 'Gibson':
-            # Get inputs
-            fragments = [dseqDictionary[dna] for dna in step.dnas]
-            # Simulate Gibson Assembly
-            assembly = Assembly(fragments)
-            assemblies = assembly.assemble_circular()
-            product = assemblies[0]
-            # Store product
-            dseqDictionary[product_name] = product
-            product_poly = dseqrecord_to_polynucleotide(product, polyDictionary[step.dnas[0]].mod_ext5, polyDictionary[step.dnas[-1]].mod_ext3)
-            polyDictionary[product_name] = product_poly;
-
-        elif operation == 'GoldenGate':
-            raise NotImplementedError('GoldenGate operation is not implemented')
- 
-        elif operation == 'Transform':
-            # Get the input DNA
-            transPoly = polyDictionary[step.dna]
-
-            # Check if DNA is circular
-            if not transPoly.is_circular:
-                raise ValueError(f"The DNA in the Transform operation must be circular, but '{step.dna}' is not.")
-            polyDictionary[product_name] = transPoly;
+        result[step.output] = polyDictionary[step.output]
+    return result
 
-    return polyDictionary
+
+def simulate_CF_stream(items, cache=None):
+    """
+    Simulate a CF while it is still being read, from the SequenceDefinitions
+    and Steps yielded by iter_CF_shorthand.
+
+    Each step runs as soon as all of its inputs are defined, and its output
+    name and product are yielded then. Steps whose inputs are never defined
+    raise a ValueError once the items run out.
+    """
+    sequences = {}
+    steps = []
+    missing = {}
+    waiting = {}
+
+    def define(name, poly):
+        # Add a sequence or product, and run the steps it completes. Their
+        # products go on a worklist rather than a recursive call, as a chain
+        # of steps can be longer than the recursion limit
+        pending = deque([(name, poly)])
+        while pending:
+            name, poly = pending.popleft()
+            if name in sequences:
+                raise ValueError(f"Name '{name}' is defined more than once.")
+            sequences[name] = poly
+            for index in waiting.pop(name, ()):
+                missing[index] -= 1
+                if not missing[index]:
+                    step = steps[index]
+                    product = simulate_step(step, sequences, cache)
+                    yield step.output, product
+                    pending.append((step.output, product))
+
+    for item in items:
+        if isinstance(item, SequenceDefinition):
+            yield from define(item.name, item.polynucleotide)
+            continue
+        index = len(steps)
+        steps.append(item)
+        inputs = set(step_inputs(item)) - set(sequences)
+        missing[index] = len(inputs)
+        for name in inputs:
+            waiting.setdefault(name, []).append(index)
+        if not inputs:
+            product = simulate_step(item, sequences, cache)
+            yield item.output, product
+            yield from define(item.output, product)
+
+    if waiting:
+        name, indexes = min(waiting.items(), key=lambda item: item[1][0])
+        step = steps[indexes[0]]
+        raise ValueError(f"Step {indexes[0] + 1} ({step.operation} {step.output}) uses undefined input '{name}'.")
+
+
+def simulate_step(step, sequences, cache=None):
+    """
+    Simulate a single step, looking its inputs up by name in `sequences`,
+    and return the product Polynucleotide.
+
+    If a StepCache is given, a step whose operation, parameters and input
+    sequences match an earlier one reuses its product.
+    """
+    return cached_step(step, sequences, cache)[0]
+
+
+def cached_step(step, sequences, cache=None):
+    # The product of a step, and whether it came from the cache (None if
+    # the cache was not used)
+    if cache is not None:
+        key = step_key(step, sequences)
+        if key is not None:
+            product = cache.get(key)
+            if product is not None:
+                return product, True
+            product = run_operation(step, sequences)
+            cache.put(key, product)
+            return product, False
+    return run_operation(step, sequences), None
+
+
+def timed_step(index, step, sequences, cache, on_step):
+    # Simulate a step and report its StepRecord to on_step and the hooks
+    start = perf_counter()
+    product, cache_hit = cached_step(step, sequences, cache)
+    seconds = perf_counter() - start
+    input_lengths = [instrumentation.sequence_length(sequences[name]) for name in step_inputs(step)]
+    record = instrumentation.StepRecord(index, step.operation, step.output, seconds, input_lengths,
+                                        instrumentation.sequence_length(product), cache_hit)
+    if on_step is not None:
+        on_step(record)
+    instrumentation.emit(record)
+    return product
+
+
+def run_operation(step, sequences):
+    operation = step.operation
+
+    # Switch based on the operation
+    if operation == 'PCR':
+        return simulate_PCR(step, sequences)
+    elif operation == 'Digest':
+        return simulate_Digest(step, sequences)
+    elif operation == 'Ligate':
+        return simulate_Ligate(step, sequences)
+    elif operation == 'Gibson':
+        return simulate_Gibson(step, sequences)
+    elif operation == 'GoldenGate':
+        return simulate_GoldenGate(step, sequences)
+    elif operation == 'Transform':
+        return simulate_Transform(step, sequences)
+    raise ValueError(f"Unrecognized operation: {operation}")
+
+
+def to_pydna(poly):
+    # Convert a Polynucleotide to a Dseqrecord or Primer
+    # A registered sequence keeps its Dseqrecord
+    # pydna is only imported by the steps that fall back to it; see warm_start
+    from pydna.primer import Primer
+    if poly.is_double_stranded:
+        return derived(poly, 'dseqrecord', lambda: polynucleotide_to_dseqrecord(poly))
+    return Primer(poly.sequence)
+
+
+def simulate_PCR(step, sequences):
+    # Get inputs
+    forward = sequences[step.forward_oligo]
+    reverse = sequences[step.reverse_oligo]
+    template = sequences[step.template]
+    # With mismatches allowed, search the template's bit masks instead
+    if step.max_mismatches is not None:
+        return find_amplicon_mismatched(forward, reverse, template, step.max_mismatches,
+                                        (step.forward_oligo, step.reverse_oligo, step.template))
+    # Find the product from the template's seed index
+    product = find_amplicon(forward, reverse, template)
+    if product is not None:
+        return product
+    # Otherwise simulate PCR with pydna
+    from pydna.amplify import pcr
+    amplicon = pcr(to_pydna(forward), to_pydna(reverse), to_pydna(template))
+    return dseqrecord_to_polynucleotide(amplicon, forward.mod_ext5, reverse.mod_ext5)
+
+
+def simulate_Digest(step, sequences):
+    # Get inputs
+    dna = sequences[step.dna]
+    # Simulate Digest and select fragment
+    return digest(dna, step.enzymes)[step.fragSelect]
+
+
+def digest(dna, enzyme_names):
+    # Digests of the same sequence and enzymes are shared by all simulations
+    return shared_digest_cache.fragments(dna, enzyme_names, cut)
+
+
+def cut(dna, enzyme_names, restriction_map):
+    # Cut at the sites found by the restriction scanner
+    fragments = digest_fragments(dna, enzyme_names, sites=restriction_map)
+    if fragments is not None:
+        return fragments
+    # Otherwise cut with pydna
+    from Bio import Restriction
+    sequence = to_pydna(dna)
+    enzymes = [Restriction.__dict__[name] for name in enzyme_names]
+    return [dseqrecord_to_polynucleotide(fragment, 'phosphate', 'phosphate') for fragment in sequence.cut(enzymes)]
+
+
+def simulate_Ligate(step, sequences):
+    # Get inputs
+    fragments = [sequences[dna] for dna in step.dnas]
+    for name, fragment in zip(step.dnas, fragments):
+        if not fragment.is_double_stranded or fragment.is_circular:
+            raise ValueError(f"The DNAs in the Ligate operation must be linear and double stranded, but '{name}' is not.")
+
+    # Check each junction and join all parts in one go
+    parts = [fragments[0].sequence]
+    for (left_name, left), (right_name, right) in zip(zip(step.dnas, fragments), zip(step.dnas[1:], fragments[1:])):
+        if not ends_ligate(left, right):
+            raise ValueError(f"The ends of '{left_name}' and '{right_name}' in the Ligate operation cannot be ligated.")
+        parts.append(left.ext3.lstrip('-'))
+        parts.append(right.sequence)
+    first, last = fragments[0], fragments[-1]
+    product = Polynucleotide(''.join(parts), first.ext5, last.ext3, True, False, first.mod_ext5, last.mod_ext3)
+
+    # Close the product into a circle if its ends pair and both are phosphorylated
+    if ends_circularize(product):
+        product.sequence = product.ext5.lstrip('-') + product.sequence
+        product.ext5 = ""
+        product.ext3 = ""
+        product.mod_ext5 = ""
+        product.mod_ext3 = ""
+        product.is_circular = True
+    return product
+
+
+def ends_ligate(left, right):
+    """
+    Return whether the right end of `left` can be ligated to the left end of
+    `right`: the overhangs must pair and at least one of the two 5' ends
+    meeting at the junction must be phosphorylated.
+    """
+    if left.ext3 != right.ext5:
+        return False
+    return left.mod_ext3 == 'phosphate' or right.mod_ext5 == 'phosphate'
+
+
+def ends_circularize(poly):
+    """
+    Return whether a linear product closes into a circle: its overhangs must
+    pair and, unlike a junction between two parts, both of its 5' ends must be
+    phosphorylated.
+    """
+    return poly.ext5 == poly.ext3 and poly.mod_ext5 == 'phosphate' and poly.mod_ext3 == 'phosphate'
+
+
+def simulate_Gibson(step, sequences):
+    # Get inputs
+    fragments = [sequences[dna] for dna in step.dnas]
+    for name, fragment in zip(step.dnas, fragments):
+        if fragment.is_circular:
+            raise ValueError(f"The DNAs in the Gibson operation must be linear, but '{name}' is not.")
+    # Top strands including any overhangs, which the exonuclease chews back
+    strands = [(fragment.ext5 or '').lstrip('-') + fragment.sequence + (fragment.ext3 or '').lstrip('-') for fragment in fragments]
+    # Simulate Gibson Assembly
+    min_overlap = step.min_overlap if step.min_overlap is not None else GIBSON_MIN_OVERLAP
+    product = assemble_gibson(strands, step.dnas, min_overlap)
+    return Polynucleotide(product, '', '', True, True, fragments[0].mod_ext5, fragments[-1].mod_ext3)
+
+
+def simulate_GoldenGate(step, sequences):
+    # Digest every part with the Type IIS enzyme
+    parts = [digest(sequences[dna], [step.enzyme]) for dna in step.dnas]
+    # Assemble the fragments by their overhangs
+    return assemble_golden_gate(parts, step.dnas, step.enzyme)
+
+
+def simulate_Transform(step, sequences):
+    # Get the input DNA
+    transPoly = sequences[step.dna]
+
+    # Check if DNA is circular
+    if not transPoly.is_circular:
+        raise ValueError(f"The DNA in the Transform operation must be circular, but '{step.dna}' is not.")
+    return transPoly
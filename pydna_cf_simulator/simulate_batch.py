@@ -0,0 +1,92 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .limits import iter_simulate_limited, LimitExceeded
+from .parse_CF_shorthand import parse_CF_shorthand
+from .simulate_CF import simulate_CF
+from .step_cache import StepCache
+from .warm_start import warm_context
+
+# Step products cached within each worker process
+worker_cache = StepCache()
+
+# Error of the CFs whose worker process died, such as when it ran out of
+# memory, before returning their result
+WORKER_DIED = "The worker process simulating this CF stopped unexpectedly."
+
+
+def init_worker_cache(max_bytes, persistent=None):
+    """
+    Replace the worker's step cache; meant as a process pool initializer, so
+    that workers can share a SQLiteStepCache file.
+    """
+    global worker_cache
+    worker_cache = StepCache(max_bytes, persistent)
+
+
+def simulate_shorthand(cf_shorthand, limits=None):
+    """
+    Parse and simulate a single CF shorthand string, or simulate a
+    ConstructionFile parsed already, such as one whose '@ID' references were
+    resolved where the sequence store is. With SimulationLimits,
+    its steps and sequence lengths are checked as iter_simulate_limited
+    does; the time limit is not.
+
+    Returns {"result": products} with the dictionary of Polynucleotides
+    returned by simulate_CF, or {"error": message} for any exception raised
+    while parsing or simulating, with the fields of LimitExceeded.to_dict for
+    a limit. Errors are returned as plain dicts rather than raised, so that a
+    worker process can report them back, even ones that cannot be pickled,
+    without failing the rest of its batch.
+    """
+    try:
+        cf = parse_CF_shorthand(cf_shorthand) if isinstance(cf_shorthand, str) else cf_shorthand
+        if limits is None:
+            return {'result': simulate_CF(cf, cache=worker_cache)}
+        result = dict(cf.sequences)
+        result.update(iter_simulate_limited(cf, limits, worker_cache))
+        return {'result': result}
+    except LimitExceeded as e:
+        return e.to_dict()
+    except Exception as e:
+        return {'error': str(e)}
+
+
+def run_batch(executor, cf_shorthands, limits):
+    # Results of simulate_shorthand on every CF, in order; the CFs left
+    # unfinished when a worker process died, or not taken by a pool that
+    # already had a dead worker, get WORKER_DIED
+    futures = []
+    for cf_shorthand in cf_shorthands:
+        try:
+            futures.append(executor.submit(simulate_shorthand, cf_shorthand, limits))
+        except BrokenProcessPool:
+            futures.append(None)
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result() if future is not None else {'error': WORKER_DIED})
+        except BrokenProcessPool:
+            results.append({'error': WORKER_DIED})
+    return results
+
+
+def simulate_batch(cf_shorthands, processes=None, executor=None, limits=None):
+    """
+    Simulate a list of CF shorthand strings, or parsed ConstructionFiles, on
+    a pool of worker processes, each CF under the length and step `limits`, if given.
+
+    Results are returned in input order, each as simulate_shorthand returns
+    it: {"result": products} or {"error": ...}. If a worker process dies, the
+    CFs it and the others had not finished get {"error": WORKER_DIED}, and
+    the results already returned are kept.
+
+    A new pool of `processes` workers (default: one per CPU), forked warm
+    from a fork server, is created for the call unless an existing
+    `executor` is given, which is left running.
+    """
+    if executor is not None:
+        return run_batch(executor, cf_shorthands, limits)
+
+    with ProcessPoolExecutor(max_workers=processes, mp_context=warm_context()) as pool:
+        return run_batch(pool, cf_shorthands, limits)
@@ -0,0 +1,90 @@
+import copy
+import threading
+
+from .plan_CF import plan_CF, step_inputs, contributing_steps
+from .simulate_CF import simulate_step, timed_step
+from . import instrumentation
+
+
+class SimulationSession:
+    """
+    Re-simulates successive versions of a CF, reusing unchanged products.
+
+    Each call to simulate compares the new CF with the previous one. A step
+    is re-run only if its definition changed, one of its input sequences
+    changed, or a step making one of its inputs was re-run; every other
+    product is taken from the previous results. The names of the re-run
+    steps' outputs are kept in `rerun`. With `targets`, only the steps
+    leading to them are considered, as in simulate_CF, and `on_step`
+    receives the StepRecords of the re-run steps.
+    """
+    def __init__(self, cache=None):
+        self.cache = cache
+        self.rerun = []
+        self._sequences = {}
+        self._steps = {}
+        self._lock = threading.Lock()
+
+    def simulate(self, construction_file, targets=None, on_step=None):
+        order = self._order(construction_file, targets)
+        polyDictionary = dict(construction_file.sequences)
+        with self._lock:
+            for name, product in self._run(construction_file, order, on_step):
+                polyDictionary[name] = product
+
+        # Return the products in the same order as simulate_CF
+        if targets is not None:
+            return {name: polyDictionary[name] for name in targets}
+        result = dict(construction_file.sequences)
+        for step in construction_file.steps:
+            result[step.output] = polyDictionary[step.output]
+        return result
+
+    def iter_simulate(self, construction_file, targets=None, on_step=None):
+        """
+        Like simulate, but yield each step's output name and product as
+        soon as it is known, as iter_simulate_CF does. The session is locked
+        until the generator finishes, and only a finished run is kept for
+        the next call.
+        """
+        order = self._order(construction_file, targets)
+        with self._lock:
+            yield from self._run(construction_file, order, on_step)
+
+    def _order(self, construction_file, targets):
+        # Checks names, undefined inputs and cycles before anything runs
+        if targets is None:
+            return plan_CF(construction_file).order()
+        return contributing_steps(construction_file, targets)
+
+    def _run(self, construction_file, order, on_step):
+        sequences = construction_file.sequences
+        polyDictionary = dict(sequences)
+        changed = {name for name, poly in sequences.items() if self._sequences.get(name) != poly}
+
+        steps = {}
+        rerun = []
+        timed = on_step is not None or bool(instrumentation.hooks)
+        for index in order:
+            step = construction_file.steps[index]
+            definition = vars(step)
+            previous = self._steps.get(step.output)
+            if previous is not None and previous[0] == definition and not changed.intersection(step_inputs(step)):
+                product = previous[1]
+            else:
+                product = timed_step(index, step, polyDictionary, self.cache, on_step) if timed else simulate_step(step, polyDictionary, self.cache)
+                changed.add(step.output)
+                rerun.append(step.output)
+            polyDictionary[step.output] = product
+            steps[step.output] = (copy.deepcopy(definition), product)
+            yield step.output, product
+
+        self._sequences = dict(sequences)
+        self._steps = steps
+        self.rerun = rerun
+
+    def reset(self):
+        with self._lock:
+            self._sequences = {}
+            self._steps = {}
+            self.rerun = []
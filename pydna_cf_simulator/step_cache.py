@@ -0,0 +1,130 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from .plan_CF import step_inputs
+
+# Step fields that change the product; input names, product names and the
+# expected product_size do not
+STEP_PARAMETERS = {
+    'PCR': ('max_mismatches',),
+    'Digest': ('enzymes', 'fragSelect'),
+    'Ligate': (),
+    'GoldenGate': ('enzyme',),
+    'Gibson': ('min_overlap',),
+}
+
+# Rough per-entry overhead of the key, the Polynucleotide and its strings
+ENTRY_OVERHEAD = 400
+
+
+def polynucleotide_digest(poly):
+    # Hash of every field of a Polynucleotide, independent of its name
+    h = hashlib.sha256()
+    for value in (poly.sequence, poly.ext5, poly.ext3, poly.is_double_stranded,
+                  poly.is_circular, poly.mod_ext5, poly.mod_ext3):
+        h.update(repr(value).encode())
+        h.update(b'\0')
+    return h.digest()
+
+
+def step_key(step, sequences):
+    """
+    Content-addressed key of a step: a hash of its operation, the parameters
+    that affect the product, and the content of its input sequences.
+
+    Returns None for operations that are not cached.
+    """
+    parameters = STEP_PARAMETERS.get(step.operation)
+    if parameters is None:
+        return None
+
+    h = hashlib.sha256(step.operation.encode())
+    for parameter in parameters:
+        h.update(repr(getattr(step, parameter)).encode())
+        h.update(b'\0')
+    for name in step_inputs(step):
+        h.update(polynucleotide_digest(sequences[name]))
+    return h.hexdigest()
+
+
+def polynucleotide_size(poly):
+    return poly.sequence_nbytes() + len(poly.ext5 or '') + len(poly.ext3 or '') + ENTRY_OVERHEAD
+
+
+class StepCache:
+    """
+    In-memory LRU cache of step products, keyed by step_key.
+
+    Entries are evicted least recently used first once their total estimated
+    size exceeds max_bytes. Cached Polynucleotides are shared between
+    simulations and must not be modified.
+
+    An optional persistent tier, such as a SQLiteStepCache, is consulted on
+    in-memory misses and written through on every put.
+    """
+    def __init__(self, max_bytes=64 * 1024 * 1024, persistent=None):
+        self.max_bytes = max_bytes
+        self.persistent = persistent
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.persistent_hits = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            poly = self._entries.get(key)
+            if poly is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return poly
+
+        if self.persistent is not None:
+            poly = self.persistent.get(key)
+            if poly is not None:
+                self._store(key, poly)
+                with self._lock:
+                    self.hits += 1
+                    self.persistent_hits += 1
+                return poly
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, poly):
+        self._store(key, poly)
+        if self.persistent is not None:
+            self.persistent.put(key, poly)
+
+    def _store(self, key, poly):
+        size = polynucleotide_size(poly)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = poly
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= polynucleotide_size(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.persistent_hits = 0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'persistent_hits': self.persistent_hits,
+                'entries': len(self._entries),
+                'bytes': self.current_bytes, 'max_bytes': self.max_bytes}
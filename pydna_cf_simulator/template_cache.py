@@ -0,0 +1,64 @@
+import threading
+from collections import OrderedDict
+
+
+class TemplateCache:
+    """
+    In-memory LRU cache of structures built from a template for searching it,
+    such as a PCR seed index, keyed by the template's sequence and topology.
+
+    Each structure reports its size with nbytes(), which counts the arrays it
+    holds or may go on to build. Entries are evicted least recently used
+    first once their total size, with their template sequences, exceeds
+    max_bytes. Cached structures are shared between simulations.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, sequence, circular, build):
+        """
+        Return the structure of a template, calling build(sequence, circular)
+        to make it on a miss.
+        """
+        key = (sequence, circular)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        value = build(sequence, circular)
+        size = value.nbytes() + len(sequence)
+        if size > self.max_bytes:
+            return value
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries),
+                'bytes': self.current_bytes, 'max_bytes': self.max_bytes}
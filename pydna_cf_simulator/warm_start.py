@@ -0,0 +1,59 @@
+import multiprocessing
+
+from .construction_file import ConstructionFile, PCR, Digest
+from .polynucleotide import oligo, dsDNA
+
+# Imported by the fork server of warm_context before it forks any worker
+WARM_PRELOAD = ['pydna_cf_simulator.prewarmed', 'pydna_cf_simulator.limits', 'pydna_cf_simulator.simulate_batch']
+
+# A small PCR and digest that runs through every backend: the seed index,
+# the restriction scanner and pydna's pcr and cut
+_TEMPLATE = 'CCGCAACACACTTAACCTTGGAATTCGGGATACGTACATTGGAGAACGGTTGGCTGGATCCTTAATACTTTTTATGATAATGATTTGACCGGCCACAACCACCG'
+_FORWARD = 'CCGCAACACACTTAACCTTG'
+_REVERSE = 'CGGTGGTTGTGGCCGGTCAAATC'
+
+
+def load_backends():
+    """
+    Import the libraries the operations load on first use, pydna and
+    Biopython's enzyme tables, and build the default restriction scanner.
+    """
+    import pydna.amplify
+    import pydna.dseqrecord
+    import pydna.primer
+    import Bio.Restriction
+    import pydna.utils
+    from .restriction_scanner import default_scanner
+    default_scanner()
+
+
+def warm_up():
+    """
+    Load the backends and run a small CF through each of them, so that the
+    first real simulation in this process does not pay for any lazy setup.
+    """
+    from Bio import Restriction
+    from pydna.amplify import pcr
+    from .simulate_CF import simulate_CF, to_pydna
+
+    load_backends()
+    forward, reverse, template = oligo(_FORWARD), oligo(_REVERSE), dsDNA(_TEMPLATE)
+    cf = ConstructionFile([PCR('forward', 'reverse', 'template', 'amplicon'),
+                           Digest('amplicon', ['EcoRI', 'BamHI'], 1, 'fragment')],
+                          {'forward': forward, 'reverse': reverse, 'template': template})
+    simulate_CF(cf)
+    pcr(to_pydna(forward), to_pydna(reverse), to_pydna(template)).cut(Restriction.EcoRI)
+
+
+def warm_context():
+    """
+    Return a multiprocessing context whose workers start warm: a fork server
+    is started once, warms up, and forks every worker from itself, which is
+    also safer than forking a threaded server directly. Where forkserver is
+    not available, workers are spawned and start cold.
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(WARM_PRELOAD)
+        return context
+    return multiprocessing.get_context('spawn')
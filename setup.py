@@ -7,8 +7,13 @@ setup(
     install_requires=[
         'flask',
         'flask-cors',
-        'pydna'
+        'pydna',
+        'numpy'
     ],
+    extras_require={
+        # uvicorn serves the ASGI front end in asgi.py
+        'server': ['uvicorn'],
+    },
     author='J. Christopher Anderson',
     author_email='jcanderson@berkeley.edu',
     description='A ChatGPT plugin wrapper of pydna to simulate construction file.',
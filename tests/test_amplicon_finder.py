@@ -0,0 +1,68 @@
+from pydna_cf_simulator.amplicon_finder import TemplateIndex, find_amplicon, template_index
+from pydna_cf_simulator.template_cache import TemplateCache
+from pydna_cf_simulator.polynucleotide import Polynucleotide, oligo, plasmid, dsDNA
+
+template_sequence = 'CCGCAACACACTTAACCTTGGCGTCGGGATACGTACATTGGAGAACGGTTGGCTGTACGGACTTAATACTTTTTATGATAATGATTTGACCGGCCACAACCACCG'
+forward = oligo('CCGCAACACACTTAACCTTG')
+reverse = oligo('GTGGTTGTGGCCGGTCAAATC')
+expected_sequence = 'CCGCAACACACTTAACCTTGGCGTCGGGATACGTACATTGGAGAACGGTTGGCTGTACGGACTTAATACTTTTTATGATAATGATTTGACCGGCCACAACCAC'
+
+def test_index_find():
+    index = TemplateIndex('AAACCCGGGTTTAAACCCGGGTTT', False, k=4)
+    assert index.find('AAAC') == [0, 12]
+    assert index.find('TTTT') == []
+    assert index.find('NAAC') is None
+
+def test_index_circular_origin():
+    index = TemplateIndex('GGGTTTAAACCC', True, k=4)
+    assert index.find('CCCG') == [9]
+    assert TemplateIndex('GGGTTTAAACCC', False, k=4).find('CCCG') == []
+
+def test_find_amplicon_linear():
+    product = find_amplicon(forward, reverse, dsDNA(template_sequence))
+    assert product == Polynucleotide(expected_sequence, '', '', True, False, 'hydroxyl', 'hydroxyl')
+
+def test_find_amplicon_with_tails():
+    tailed_forward = oligo('CCATAGGATCC' + forward.sequence)
+    tailed_reverse = oligo('GAGTCGAATTC' + reverse.sequence)
+    product = find_amplicon(tailed_forward, tailed_reverse, dsDNA(template_sequence))
+    assert product.sequence == 'CCATAGGATCC' + expected_sequence + 'GAATTCGACTC'
+
+def test_find_amplicon_across_origin():
+    # Rotate the template so that both primers span the origin
+    rotated = template_sequence[10:] + template_sequence[:10]
+    product = find_amplicon(forward, reverse, plasmid(rotated))
+    assert product.sequence == expected_sequence
+    assert product.is_circular == False
+
+def test_find_amplicon_swapped_primers():
+    product = find_amplicon(reverse, forward, dsDNA(template_sequence))
+    assert product.sequence == expected_sequence
+
+def test_find_amplicon_falls_back():
+    # Two forward sites, a degenerate 3' end and a sticky template are left to pydna
+    assert find_amplicon(forward, reverse, dsDNA(template_sequence + template_sequence)) is None
+    assert find_amplicon(oligo('CCGCAACACACTTAACCTTN'), reverse, dsDNA(template_sequence)) is None
+    assert find_amplicon(forward, reverse, Polynucleotide(template_sequence, 'AATT', '', True, False, 'phosphate', 'phosphate')) is None
+
+def test_template_index_is_reused():
+    assert template_index(template_sequence, False) is template_index(template_sequence, False)
+    assert template_index(template_sequence, False) is not template_index(template_sequence, True)
+
+def test_index_cache_byte_budget():
+    index = TemplateIndex(template_sequence, False)
+    assert index.nbytes() >= 12 * (len(template_sequence) - 12)
+    cache = TemplateCache(max_bytes=2 * (index.nbytes() + len(template_sequence)))
+
+    first = cache.get(template_sequence, False, TemplateIndex)
+    assert cache.get(template_sequence, False, TemplateIndex) is first
+    cache.get(template_sequence[::-1], False, TemplateIndex)
+    cache.get(template_sequence[1:] + template_sequence[0], False, TemplateIndex)
+
+    # The least recently used index went once the budget was full
+    assert len(cache) == 2 and cache.current_bytes <= cache.max_bytes
+    assert cache.get(template_sequence, False, TemplateIndex) is not first
+
+    # An index over the whole budget is built but not kept
+    assert cache.get(template_sequence * 3, False, TemplateIndex).find(template_sequence[:13]) == [0, len(template_sequence), 2 * len(template_sequence)]
+    assert len(cache) == 2
@@ -0,0 +1,328 @@
+import asyncio
+import gzip
+import json
+import threading
+
+import pytest
+
+from asgi import SimulatorApp, WorkerPool, QueueFull, QueueTimeout
+from tests.test_plan_CF import pTarg2_cf
+
+async def request(app, method, path, body=None):
+    messages = [{'type': 'http.request', 'body': json.dumps(body).encode() if body is not None else b'', 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    await app({'type': 'http', 'method': method, 'path': path, 'headers': []}, receive, send)
+    return sent[0]['status'], dict(sent[0]['headers']), b''.join(message['body'] for message in sent[1:])
+
+async def occupy(pool, count):
+    # Start `count` requests that block until the returned event is set
+    release = threading.Event()
+    tasks = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(count)]
+    while pool.pending < count:
+        await asyncio.sleep(0.01)
+    return release, tasks
+
+def test_simulate():
+    async def main():
+        app = SimulatorApp(WorkerPool(2, 2, 10))
+        status, headers, body = await request(app, 'POST', '/simulate', {'cf': pTarg2_cf})
+        app.pool.shutdown()
+        return status, headers, json.loads(body)
+
+    status, headers, products = asyncio.run(main())
+    assert status == 200
+    assert headers[b'access-control-allow-origin'] == b'*'
+    assert products['pTarg2']['is_circular']
+
+def test_simulate_stream():
+    async def main():
+        app = SimulatorApp(WorkerPool(1, 1, 10))
+        results = [await request(app, 'POST', '/simulate', {'cf': pTarg2_cf, 'stream': True, 'instrument': True}),
+                   await request(app, 'POST', '/simulate', {'cf': pTarg2_cf}),
+                   await request(app, 'POST', '/simulate', {'cf': pTarg2_cf, 'stream': True, 'targets': ['pcrA', 'p20N5']}),
+                   await request(app, 'POST', '/simulate', {'cf': pTarg2_cf, 'stream': True, 'targets': ['nothing']})]
+        app.pool.shutdown()
+        return results
+
+    (status, headers, body), (_, _, whole), (_, _, targeted), (_, _, failed) = asyncio.run(main())
+    assert status == 200 and headers[b'content-type'] == b'application/x-ndjson'
+    lines = [json.loads(line) for line in body.decode().splitlines()]
+    assert {line['name']: line['product'] for line in lines[:-1]} == json.loads(whole)
+    assert [line['name'] for line in lines[-5:-1]] == ['pcrA', 'pcrB', 'gib', 'pTarg2']
+    assert lines[-1]['summary']['products'] == len(lines) - 1
+    assert [step['output'] for step in lines[-1]['summary']['steps']] == ['pcrA', 'pcrB', 'gib', 'pTarg2']
+
+    assert [json.loads(line).get('name') for line in targeted.decode().splitlines()] == ['p20N5', 'pcrA', None]
+    assert 'nothing' in json.loads(failed)['error']
+
+def test_compact_responses():
+    async def main():
+        app = SimulatorApp(WorkerPool(1, 1, 10))
+        results = [await request(app, 'POST', '/simulate', {'cf': pTarg2_cf}),
+                   await request(app, 'POST', '/simulate', {'cf': pTarg2_cf, 'include': 'final', 'sequences': 'seguid'}),
+                   await request(app, 'POST', '/simulate', {'cf': pTarg2_cf, 'include': 'products', 'sequences': 'digest'}),
+                   await request(app, 'POST', '/simulate', {'cf': pTarg2_cf, 'compress': True})]
+        app.pool.shutdown()
+        return results
+
+    (_, _, full), (_, _, final), (_, _, products), (_, headers, compressed) = asyncio.run(main())
+    full = json.loads(full)
+    final = json.loads(final)
+    assert list(final) == ['pTarg2'] and final['pTarg2']['sequence'].startswith('cdseguid=')
+    products = json.loads(products)
+    assert list(products) == ['pcrA', 'pcrB', 'gib', 'pTarg2']
+    assert products['gib']['sequence']['length'] == len(full['gib']['sequence'])
+    assert headers[b'content-encoding'] == b'gzip'
+    assert json.loads(gzip.decompress(compressed)) == full
+
+def test_sequences():
+    template = pTarg2_cf.split('plasmid pTargetF ')[1].split()[0]
+
+    async def main():
+        app = SimulatorApp(WorkerPool(1, 1, 10))
+        status, _, body = await request(app, 'POST', '/sequences', {'sequence': template, 'type': 'plasmid'})
+        sequence_id = json.loads(body)['id']
+        cf = pTarg2_cf.replace('plasmid pTargetF ' + template, f'pTargetF @{sequence_id}')
+        results = [status, await request(app, 'GET', f'/sequences/{sequence_id}'),
+                   await request(app, 'GET', '/sequences/nothing'),
+                   await request(app, 'POST', '/simulate', {'cf': cf}),
+                   await request(app, 'POST', '/simulate', {'cf': pTarg2_cf})]
+        app.pool.shutdown()
+        return results
+
+    status, stored, missing, by_id, inline = asyncio.run(main())
+    assert status == 200
+    assert json.loads(stored[2])['sequence'] == template.upper()
+    assert missing[0] == 404
+    assert json.loads(by_id[2]) == json.loads(inline[2])
+
+def test_simulate_batch_sequence_ids():
+    template = pTarg2_cf.split('plasmid pTargetF ')[1].split()[0]
+
+    async def main():
+        app = SimulatorApp(WorkerPool(1, 1, 10))
+        _, _, body = await request(app, 'POST', '/sequences', {'sequence': template, 'type': 'plasmid'})
+        cf = pTarg2_cf.replace('plasmid pTargetF ' + template, f'pTargetF @{json.loads(body)["id"]}')
+        cfs = [cf, 'x @nothing', pTarg2_cf]
+        results = [await request(app, 'POST', '/simulate_batch', {'cfs': cfs}),
+                   await request(app, 'POST', '/simulate_batch', {'cfs': cfs, 'limits': {'max_seconds': 60}})]
+        app.pool.shutdown()
+        return results
+
+    for status, _, body in asyncio.run(main()):
+        assert status == 200
+        by_id, missing, inline = json.loads(body)
+        assert by_id == inline
+        assert "Unknown sequence ID '@nothing'" in missing['error']
+
+def test_limits():
+    async def main():
+        app = SimulatorApp(WorkerPool(1, 1, 10))
+        results = [await request(app, 'POST', '/simulate', {'cf': pTarg2_cf, 'limits': {'max_steps': 2}}),
+                   await request(app, 'POST', '/simulate', {'cf': pTarg2_cf, 'stream': True, 'limits': {'max_steps': 2}})]
+        app.pool.shutdown()
+        return results
+
+    (status, _, body), (_, _, streamed) = asyncio.run(main())
+    assert status == 422
+    assert json.loads(body)['limit'] == 'max_steps'
+    assert json.loads(streamed.decode().splitlines()[-1]) == json.loads(body)
+
+def test_invalid_limits():
+    async def main():
+        app = SimulatorApp(WorkerPool(1, 1, 10))
+        results = [await request(app, 'POST', '/simulate', {'cf': pTarg2_cf, 'limits': limits})
+                   for limits in ({'max_steps': '2'}, {'max_total_length': -1}, {'max_seconds': 0}, {'max_steps': True}, {'steps': 2}, [2])]
+        results.append(await request(app, 'POST', '/simulate_batch', {'cfs': [pTarg2_cf], 'limits': {'max_steps': 'many'}}))
+        app.pool.shutdown()
+        return results
+
+    for status, _, body in asyncio.run(main()):
+        assert status == 400
+        assert 'limit' in json.loads(body)['error']
+
+def test_invalid_response_options():
+    async def main():
+        app = SimulatorApp(WorkerPool(1, 1, 10))
+        results = [await request(app, 'POST', '/simulate', {'cf': pTarg2_cf, 'include': 'everything'}),
+                   await request(app, 'POST', '/simulate', {'cf': pTarg2_cf, 'sequences': 'short'}),
+                   # Checked before the CF, which would fail, is simulated
+                   await request(app, 'POST', '/simulate', {'cf': 'PCR a b c d', 'sequences': 'short', 'stream': True})]
+        app.pool.shutdown()
+        return results
+
+    (include_status, _, include), *formats = asyncio.run(main())
+    assert include_status == 400 and 'include' in json.loads(include)['error']
+    for status, _, body in formats:
+        assert status == 400
+        assert "Unknown sequence format 'short'" in json.loads(body)['error']
+
+def test_simulate_batch_limits():
+    async def main():
+        app = SimulatorApp(WorkerPool(1, 1, 10))
+        results = [await request(app, 'POST', '/simulate_batch', {'cfs': [pTarg2_cf, 'x ACGT'], 'limits': {'max_steps': 2}}),
+                   await request(app, 'POST', '/simulate_batch', {'cfs': [pTarg2_cf, 'x ACGT'], 'limits': {'max_steps': 2, 'max_seconds': 60}})]
+        app.pool.shutdown()
+        return results
+
+    for status, _, body in asyncio.run(main()):
+        assert status == 200
+        over, within = json.loads(body)
+        assert over['limit'] == 'max_steps'
+        assert within['result']['x']['sequence'] == 'ACGT'
+
+def test_limited_pool_made_once(monkeypatch):
+    import time
+    import app as flask_app
+    made = []
+
+    def slow_pool(size):
+        # Widen the window between checking for a pool and storing it
+        time.sleep(0.05)
+        made.append(size)
+        return object()
+
+    monkeypatch.setattr(flask_app, 'KillableWorkerPool', slow_pool)
+    monkeypatch.setattr(flask_app, 'limited_pool', None)
+    pools = []
+    threads = [threading.Thread(target=lambda: pools.append(flask_app.get_limited_pool())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(made) == 1
+    assert all(pool is pools[0] for pool in pools)
+
+def test_dead_batch_pool_replaced(monkeypatch):
+    import app as flask_app
+    from pydna_cf_simulator.simulate_batch import WORKER_DIED
+
+    class Executor:
+        def shutdown(self, wait=True):
+            self.shut_down = True
+
+    executor = Executor()
+    monkeypatch.setattr(flask_app, 'batch_executor', executor)
+    monkeypatch.setattr(flask_app, 'simulate_batch', lambda cfs, executor, limits: [{'error': WORKER_DIED} for _ in cfs])
+    assert flask_app.simulate_batch_response({'cfs': ['x ACGT']}) == [{'error': WORKER_DIED}]
+    assert flask_app.batch_executor is None and executor.shut_down
+
+def test_pcr_mismatches():
+    template = 'CCGCAACACACTTAACCTTGGCGTCGGGATACGTACATTGGAGAACGGTTGGCTGTACGGACTTAATACTTTTTATGATAATGATTTGACCGGCCACAACCACCG'
+    cf = f'f CCGCAACACAGTTAACCTTG\nr GTGGTTGTGGCCGGTCAAATC\nt {template}\nPCR f r t p\n'
+
+    async def main():
+        app = SimulatorApp(WorkerPool(1, 1, 10))
+        results = [await request(app, 'POST', '/simulate', {'cf': cf}),
+                   await request(app, 'POST', '/simulate', {'cf': cf, 'pcr_mismatches': 1}),
+                   await request(app, 'POST', '/simulate', {'cf': cf, 'pcr_mismatches': 'one'}),
+                   await request(app, 'POST', '/simulate', {'cf': cf, 'pcr_mismatches': -1})]
+        app.pool.shutdown()
+        return results
+
+    (exact_status, _, _), (status, _, body), *invalid = asyncio.run(main())
+    assert exact_status == 500
+    assert status == 200
+    assert json.loads(body)['p']['sequence'].startswith('CCGCAACACAGTTAACCTTGGCG')
+    for status, _, body in invalid:
+        assert status == 400
+        assert 'pcr_mismatches' in json.loads(body)['error']
+
+def test_simulate_error():
+    async def main():
+        app = SimulatorApp(WorkerPool(1, 1, 10))
+        results = [await request(app, 'POST', '/simulate', {'cf': 'PCR a b c d'}),
+                   await request(app, 'POST', '/simulate', None)]
+        app.pool.shutdown()
+        return results
+
+    (status, _, body), (bad_status, _, _) = asyncio.run(main())
+    assert status == 500 and 'error' in json.loads(body)
+    assert bad_status == 400
+
+def test_queue_full():
+    async def main():
+        pool = WorkerPool(1, 1, 10)
+        release, tasks = await occupy(pool, 2)
+        with pytest.raises(QueueFull):
+            await pool.run(print)
+        release.set()
+        results = await asyncio.gather(*tasks)
+        pool.shutdown()
+        return results
+
+    assert asyncio.run(main()) == [True, True]
+
+def test_queue_timeout():
+    async def main():
+        pool = WorkerPool(1, 1, 0.05)
+        release, tasks = await occupy(pool, 1)
+        with pytest.raises(QueueTimeout):
+            await pool.run(print)
+        release.set()
+        await asyncio.gather(*tasks)
+        assert pool.pending == 0
+        pool.shutdown()
+
+    asyncio.run(main())
+
+def test_saturated_responses():
+    async def main():
+        app = SimulatorApp(WorkerPool(1, 1, 0.05))
+        release, tasks = await occupy(app.pool, 1)
+        timed_out = await request(app, 'POST', '/simulate', {'cf': pTarg2_cf})
+        release.set()
+        await asyncio.gather(*tasks)
+        app.pool.shutdown()
+
+        app = SimulatorApp(WorkerPool(1, 1, 10))
+        release, tasks = await occupy(app.pool, 2)
+        full = await request(app, 'POST', '/simulate', {'cf': pTarg2_cf})
+        static = await request(app, 'GET', '/openapi.yaml')
+        plugin = await request(app, 'GET', '/.well-known/ai-plugin.json')
+        release.set()
+        await asyncio.gather(*tasks)
+        app.pool.shutdown()
+        return timed_out, full, static, plugin
+
+    timed_out, full, static, plugin = asyncio.run(main())
+    assert timed_out[0] == 503 and timed_out[1][b'retry-after'] == b'1'
+    assert full[0] == 429 and full[1][b'retry-after'] == b'1'
+    assert static[0] == 200 and b'openapi' in static[2]
+    assert plugin[0] == 200
+
+def test_unknown_routes():
+    async def main():
+        app = SimulatorApp(WorkerPool(1, 1, 1))
+        return [(await request(app, 'GET', '/nothing'))[0], (await request(app, 'GET', '/simulate'))[0],
+                (await request(app, 'OPTIONS', '/simulate'))[0]]
+
+    assert asyncio.run(main()) == [404, 405, 204]
+
+def test_serve_preforked():
+    import socket, subprocess, sys, time, urllib.request
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    server = subprocess.Popen([sys.executable, 'asgi.py', '--prefork', '2', '--port', str(port)],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        for _ in range(200):
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/openapi.yaml') as response:
+                    assert response.status == 200
+                break
+            except OSError:
+                time.sleep(0.05)
+        else:
+            raise AssertionError('The preforked server did not start.')
+    finally:
+        server.terminate()
+    assert server.wait(10) == 0
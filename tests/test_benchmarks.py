@@ -0,0 +1,48 @@
+from benchmarks.generate_CF import generate_CF, CF_to_JSON
+from benchmarks.run_benchmarks import run_benchmarks, compare
+from pydna_cf_simulator.parse_CF_shorthand import parse_CF_shorthand
+from pydna_cf_simulator.parse_CF_JSON import parse_CF_JSON
+from pydna_cf_simulator.simulate_CF import simulate_CF
+
+def test_generated_CF_is_valid():
+    cf = parse_CF_shorthand(generate_CF(3000, cloning_steps=2, gibson_parts=3, golden_gate_parts=4, seed=1).shorthand())
+    products = simulate_CF(cf)
+
+    for name in ('clone0', 'clone1', 'gibsonclone0', 'ggclone0'):
+        assert products[name].is_circular
+    assert simulate_CF(parse_CF_JSON(CF_to_JSON(cf))) == products
+
+def test_generated_CF_is_reproducible():
+    assert generate_CF(2000, seed=3).shorthand() == generate_CF(2000, seed=3).shorthand()
+    assert generate_CF(2000, seed=3).shorthand() != generate_CF(2000, seed=4).shorthand()
+
+def test_run_benchmarks():
+    results = run_benchmarks([('small', 1000, 1, 2, 2)], repeat=1)
+
+    case, = results['cases']
+    assert set(case['timings']) == {'parse_CF_shorthand', 'parse_CF_JSON', 'simulate_CF', 'simulate_CF_warm',
+                                    'polynucleotide_to_dseqrecord', 'dseqrecord_to_polynucleotide'}
+    assert set(case['operations']) == {'PCR', 'Digest', 'Ligate', 'Transform', 'Gibson', 'GoldenGate'}
+    assert sum(totals['count'] for totals in case['operations'].values()) == case['steps']
+    assert compare(results, results) == []
+
+    slower = {'cases': [dict(case, timings=dict(case['timings'], simulate_CF=case['timings']['simulate_CF'] * 2 + 1))]}
+    assert [(name, measurement) for name, measurement, _, _ in compare(results, slower)] == [('small', 'simulate_CF')]
+
+def test_simulation_timed_cold(monkeypatch):
+    from benchmarks import run_benchmarks as benchmarks
+    cleared = []
+    clear_caches = benchmarks.clear_caches
+    monkeypatch.setattr(benchmarks, 'clear_caches', lambda: cleared.append(clear_caches()))
+    benchmarks.run_benchmarks([('small', 1000, 1, 2, 2)], repeat=2)
+
+    # Every cold run starts from empty caches, which the warm run then reuses
+    assert len(cleared) == 2
+    assert len(benchmarks.index_cache) > 0 and len(benchmarks.shared_digest_cache) > 0
+    benchmarks.clear_caches()
+    assert len(benchmarks.index_cache) == len(benchmarks.mask_cache) == len(benchmarks.shared_digest_cache) == 0
+
+def test_time_command():
+    import sys
+    from benchmarks.startup import time_command
+    assert time_command([sys.executable, '-c', 'import pydna_cf_simulator'], repeat=1) > 0
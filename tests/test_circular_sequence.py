@@ -0,0 +1,67 @@
+import random
+
+import pytest
+from pydna_cf_simulator.circular_sequence import CircularView
+from pydna_cf_simulator.amplicon_finder import TemplateIndex, SEED_LENGTH, find_amplicon
+from pydna_cf_simulator.sequence_kernels import reverse_complement
+from pydna_cf_simulator.restriction_scanner import default_scanner, digest_fragments
+from pydna_cf_simulator.polynucleotide import oligo, plasmid
+
+def random_sequence(rng, length):
+    return ''.join(rng.choice('ACGT') for _ in range(length))
+
+def test_view_slice_wraps():
+    view = CircularView('ABCDEF')
+    assert len(view) == 6
+    assert view.slice(4, 8) == 'EFAB'
+    assert view.slice(-2, 1) == 'EFA'
+    assert view.slice(5, 18) == 'FABCDEFABCDEF'
+
+@pytest.mark.parametrize('sequence, length, expected', [
+    ('ABCDEF', 3, (4, 'EFAB')),
+    ('ABCDEF', 1, (6, '')),
+    ('ABC', 5, (0, 'ABCABCA')),
+    ('', 3, (0, '')),
+])
+def test_view_junction(sequence, length, expected):
+    assert CircularView(sequence).junction(length) == expected
+
+def test_view_spans_origin():
+    view = CircularView('ABCDEF')
+    assert view.spans_origin(4, 3)
+    assert not view.spans_origin(3, 3)
+
+@pytest.mark.parametrize('length', [5, 12, 13, 40, 500])
+def test_index_matches_appended_copy(length):
+    rng = random.Random(length)
+    sequence = random_sequence(rng, length)
+    # Every k-mer of the sequence read as a circle, from a copy wrapped around enough times
+    text = (sequence * (SEED_LENGTH // length + 2))[:length + SEED_LENGTH - 1]
+    index = TemplateIndex(sequence, True)
+    for start in range(length):
+        kmer = text[start:start + SEED_LENGTH]
+        assert index.find(kmer) == [site for site in range(length) if text[site:site + SEED_LENGTH] == kmer]
+
+@pytest.mark.parametrize('length', [4, 10, 60, 3000])
+def test_find_sites_matches_appended_copy(length):
+    rng = random.Random(length)
+    scanner = default_scanner()
+    sequence = random_sequence(rng, length)
+    for _ in range(5):
+        # Plant a site across the origin
+        site = rng.choice(['GAATTC', 'GGATCC', 'GGTCTC', 'GCGGCCGC'])
+        cut = rng.randint(1, len(site) - 1)
+        if length > len(site):
+            sequence = site[cut:] + sequence[len(site) - cut:length - cut] + site[:cut]
+        # The sites starting in the first copy of a sequence repeated past any site's length
+        expected = [site for site in scanner.find_sites(sequence * 3, False) if site[0] < length]
+        assert sorted(scanner.find_sites(sequence, True)) == sorted(expected)
+
+def test_pcr_and_digest_across_origin():
+    sequence = random_sequence(random.Random(7), 300)
+    template = plasmid(sequence[150:] + sequence[:150])
+    product = find_amplicon(oligo(sequence[100:120]), oligo(reverse_complement(sequence[:20])), template)
+    assert product.sequence == sequence[100:] + sequence[:20]
+
+    fragments = digest_fragments(plasmid('AATTC' + sequence + 'G'), ['EcoRI'])
+    assert [(fragment.sequence, fragment.ext5, fragment.ext3) for fragment in fragments] == [('C' + sequence + 'G', 'AATT', 'AATT')]
@@ -0,0 +1,44 @@
+from pydna_cf_simulator.digest_cache import DigestCache, shared_cache
+from pydna_cf_simulator.restriction_scanner import digest_fragments
+from pydna_cf_simulator.simulate_CF import simulate_CF, cut
+from pydna_cf_simulator.construction_file import ConstructionFile, Digest
+from pydna_cf_simulator.polynucleotide import plasmid
+
+backbone = plasmid('GAGTCGAATTCATACGAGGGATCCAATCGCCTTAACGCTCGAGTTACGATGCATCCGA')
+
+def test_fragments_reused_for_any_enzyme_order():
+    cache = DigestCache()
+    calls = []
+
+    def counting_cut(poly, enzymes, restriction_map):
+        calls.append(enzymes)
+        return cut(poly, enzymes, restriction_map)
+
+    fragments = cache.fragments(backbone, ['EcoRI', 'BamHI'], counting_cut)
+    assert cache.fragments(plasmid(backbone.sequence), ['BamHI', 'EcoRI', 'BamHI'], counting_cut) is fragments
+    assert fragments == digest_fragments(backbone, ['EcoRI', 'BamHI'])
+    assert calls == [('BamHI', 'EcoRI')]
+
+def test_restriction_map_shared_by_enzyme_sets():
+    cache = DigestCache()
+    cache.fragments(backbone, ['EcoRI'], cut)
+    cache.fragments(backbone, ['XhoI', 'BamHI'], cut)
+    assert len(cache) == 3
+    assert cache.fragments(backbone, ['XhoI', 'BamHI'], cut) == digest_fragments(backbone, ['BamHI', 'XhoI'])
+
+def test_eviction():
+    cache = DigestCache(max_bytes=2000)
+    for index in range(10):
+        cache.fragments(plasmid(backbone.sequence + 'A' * index), ['EcoRI', 'BamHI'], cut)
+    assert cache.current_bytes <= 2000
+    assert 0 < len(cache) < 20
+
+def test_repeated_digests_across_simulations():
+    shared_cache.clear()
+    cf = ConstructionFile([Digest('p', ['EcoRI', 'BamHI'], 0, 'insert'), Digest('p', ['BamHI', 'EcoRI'], 1, 'backbone')],
+                          {'p': backbone})
+    products = simulate_CF(cf)
+    assert products['insert'] != products['backbone']
+    misses = shared_cache.misses
+    assert simulate_CF(cf) == products
+    assert shared_cache.misses == misses
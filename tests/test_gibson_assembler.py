@@ -0,0 +1,80 @@
+import random
+import pytest
+from pydna_cf_simulator.gibson_assembler import find_overlaps, assemble_gibson
+from pydna_cf_simulator.sequence_kernels import reverse_complement
+from pydna_cf_simulator.simulate_CF import simulate_CF
+from pydna_cf_simulator.construction_file import ConstructionFile, Gibson
+from pydna_cf_simulator.polynucleotide import dsDNA
+
+random.seed(9)
+CIRCLE = ''.join(random.choice('ACGT') for _ in range(1200))
+
+def split_circle(parts, overlap):
+    # Fragments of CIRCLE, each running `overlap` bases into the next
+    size = len(CIRCLE) // parts
+    return [(CIRCLE * 2)[i * size:(i + 1) * size + overlap] for i in range(parts)]
+
+def test_find_overlaps():
+    overlaps = find_overlaps(['AAAACCGGTT', 'CCGGTTGGGG', 'TGACTCAGTA'], 4)
+    assert overlaps == {(0, 1): 6}
+
+def test_assemble_in_order():
+    fragments = split_circle(6, 30)
+    assert assemble_gibson(fragments, ['a', 'b', 'c', 'd', 'e', 'f']) == CIRCLE
+
+def test_assemble_shuffled_and_reversed():
+    fragments = split_circle(5, 25)
+    shuffled = [fragments[0], reverse_complement(fragments[3]), fragments[1], fragments[4], reverse_complement(fragments[2])]
+    assert assemble_gibson(shuffled, ['a', 'b', 'c', 'd', 'e']) == CIRCLE
+
+def test_no_assembly():
+    fragments = split_circle(4, 15)
+    with pytest.raises(ValueError, match="No Gibson assembly of a, b, c, d"):
+        assemble_gibson(fragments, ['a', 'b', 'c', 'd'])
+    assert assemble_gibson(fragments, ['a', 'b', 'c', 'd'], min_overlap=15) == CIRCLE
+
+def test_default_min_overlap():
+    fragments = split_circle(4, 24)
+    with pytest.raises(ValueError, match="overlaps of at least 25 bp"):
+        assemble_gibson(fragments, ['a', 'b', 'c', 'd'])
+    assert assemble_gibson(split_circle(4, 25), ['a', 'b', 'c', 'd']) == CIRCLE
+
+def pydna_gibson(fragments):
+    from pydna.assembly import Assembly
+    from pydna.dseqrecord import Dseqrecord
+    products = Assembly([Dseqrecord(fragment) for fragment in fragments], limit=25).assemble_circular()
+    return str(products[0].seq) if products else None
+
+@pytest.mark.filterwarnings('ignore::DeprecationWarning')
+def test_short_bridging_fragment_matches_pydna():
+    # The 26 bp overlaps at either end of the 36 bp fragment b cross each other
+    a, b, c = CIRCLE[:326], CIRCLE[300:336], CIRCLE[310:] + CIRCLE[:26]
+    assert assemble_gibson([a, b, c], ['a', 'b', 'c']) == pydna_gibson([a, b, c]) == CIRCLE
+
+    rng = random.Random(3)
+    for _ in range(30):
+        overlap = rng.randint(25, 35)
+        start = rng.randint(100, 900)
+        end = start + rng.randint(overlap + 1, 2 * overlap)
+        fragments = [CIRCLE[:start + overlap], CIRCLE[start:end], CIRCLE[end - overlap:] + CIRCLE[:overlap]]
+        assert assemble_gibson(fragments, ['a', 'b', 'c']) == pydna_gibson(fragments)
+
+def test_more_than_one_assembly():
+    # b and c share both overlaps, so either order closes the circle
+    a = 'GGATCCATGCATGCATGCATTTACGTCGAT' + 'A' * 40
+    b = 'A' * 40 + 'C' * 40 + 'T' * 40
+    c = 'T' * 40 + 'G' * 40 + 'A' * 40
+    d = 'A' * 40 + 'GGATCCATGCATGCATGCATTTACGTCGAT'
+    with pytest.raises(ValueError, match="More than one Gibson assembly"):
+        assemble_gibson([a, b, c, d], ['a', 'b', 'c', 'd'])
+
+def test_simulate_Gibson_min_overlap():
+    fragments = {name: dsDNA(sequence) for name, sequence in zip('abc', split_circle(3, 18))}
+    cf = ConstructionFile([Gibson(['a', 'b', 'c'], 'product')], fragments)
+    with pytest.raises(ValueError):
+        simulate_CF(cf)
+
+    cf = ConstructionFile([Gibson(['a', 'b', 'c'], 'product', min_overlap=15)], fragments)
+    product = simulate_CF(cf)['product']
+    assert product.sequence == CIRCLE
+    assert product.is_circular
@@ -0,0 +1,77 @@
+import random
+import time
+import pytest
+from pydna_cf_simulator.golden_gate_assembler import assemble_golden_gate, flip_fragment
+from pydna_cf_simulator.simulate_CF import simulate_CF
+from pydna_cf_simulator.construction_file import ConstructionFile, GoldenGate
+from pydna_cf_simulator.polynucleotide import Polynucleotide, plasmid
+from pydna_cf_simulator.sequence_kernels import reverse_complement
+
+random.seed(10)
+
+def random_dna(length):
+    # Random sequence without BsaI sites
+    while True:
+        sequence = ''.join(random.choice('ACGT') for _ in range(length))
+        if 'GGTCTC' not in sequence and 'GAGACC' not in sequence:
+            return sequence
+
+def moclo(parts):
+    # A destination vector and `parts` part plasmids joined by unique overhangs
+    overhangs = []
+    while len(overhangs) < parts + 1:
+        overhang = random_dna(4)
+        if not {overhang, reverse_complement(overhang)} & set(overhangs) and overhang != reverse_complement(overhang):
+            overhangs.append(overhang)
+    backbone, inserts = random_dna(300), [random_dna(60) for _ in range(parts)]
+    sequences = {'vector': plasmid('GGTCTCA' + overhangs[parts] + backbone + overhangs[0] + 'AGAGACC' + random_dna(100))}
+    for k in range(parts):
+        sequences[f'part{k}'] = plasmid('GGTCTCA' + overhangs[k] + inserts[k] + overhangs[k + 1] + 'AGAGACC' + random_dna(200))
+    expected = overhangs[parts] + backbone + ''.join(overhangs[k] + inserts[k] for k in range(parts))
+    return sequences, expected
+
+def test_flip_fragment():
+    fragment = Polynucleotide('CCAT', 'AATT', '-TGCA', True, False, 'phosphate', 'hydroxyl')
+    assert flip_fragment(fragment) == Polynucleotide('ATGG', '-TGCA', 'AATT', True, False, 'hydroxyl', 'phosphate')
+    assert flip_fragment(flip_fragment(fragment)) == fragment
+
+def test_simulate_GoldenGate():
+    sequences, expected = moclo(3)
+    cf = ConstructionFile([GoldenGate(list(sequences), 'BsaI', 'product')], sequences)
+    assert simulate_CF(cf)['product'] == Polynucleotide(expected, '', '', True, True, '', '')
+
+def test_simulate_GoldenGate_many_parts():
+    sequences, expected = moclo(24)
+    # Part order does not matter
+    names = list(sequences)
+    names = names[:1] + random.sample(names[1:], len(names) - 1)
+    cf = ConstructionFile([GoldenGate(names, 'BsaI', 'product')], sequences)
+    start = time.time()
+    assert simulate_CF(cf)['product'].sequence == expected
+    assert time.time() - start < 2
+
+def test_GoldenGate_reversed_part():
+    sequences, expected = moclo(3)
+    # A linear, reverse complemented copy of part1 assembles the same way
+    part1 = sequences['part1'].sequence
+    sequences['part1'] = Polynucleotide(reverse_complement(part1), '', '', True, False, 'hydroxyl', 'hydroxyl')
+    cf = ConstructionFile([GoldenGate(list(sequences), 'BsaI', 'product')], sequences)
+    assert simulate_CF(cf)['product'].sequence == expected
+
+def test_GoldenGate_missing_part():
+    sequences, _ = moclo(3)
+    del sequences['part1']
+    with pytest.raises(ValueError, match="No fragment has the overhang .* that follows part0"):
+        simulate_CF(ConstructionFile([GoldenGate(list(sequences), 'BsaI', 'product')], sequences))
+
+def test_GoldenGate_duplicate_overhang():
+    sequences, _ = moclo(3)
+    sequences['extra'] = sequences['part1']
+    with pytest.raises(ValueError, match=r"More than one fragment \(part1, extra\)"):
+        simulate_CF(ConstructionFile([GoldenGate(list(sequences), 'BsaI', 'product')], sequences))
+
+def test_GoldenGate_no_sites():
+    with pytest.raises(ValueError, match="no fragments"):
+        assemble_golden_gate([[]], ['a'], 'BsaI')
+    with pytest.raises(ValueError, match="no fragments"):
+        simulate_CF(ConstructionFile([GoldenGate(['a'], 'BsaI', 'product')], {'a': plasmid('ACGT' * 20)}))
@@ -0,0 +1,59 @@
+from pydna_cf_simulator import instrumentation
+from pydna_cf_simulator.instrumentation import StepRecord, ConversionRecord, add_hook, remove_hook
+from pydna_cf_simulator.simulate_CF import simulate_CF
+from pydna_cf_simulator.simulation_session import SimulationSession
+from pydna_cf_simulator.step_cache import StepCache
+from pydna_cf_simulator.parse_CF_shorthand import parse_CF_shorthand
+from pydna_cf_simulator.polynucleotide_to_dseqrecord import polynucleotide_to_dseqrecord
+from pydna_cf_simulator.dseqrecord_to_polynucleotide import dseqrecord_to_polynucleotide
+from pydna_cf_simulator.polynucleotide import dsDNA
+from tests.test_plan_CF import pTarg2_cf
+
+def test_on_step_records():
+    records = []
+    simulate_CF(parse_CF_shorthand(pTarg2_cf), on_step=records.append)
+
+    assert [(record.index, record.operation, record.output) for record in records] == [
+        (0, 'PCR', 'pcrA'), (1, 'PCR', 'pcrB'), (2, 'Gibson', 'gib'), (3, 'Transform', 'pTarg2')]
+    assert all(isinstance(record, StepRecord) and record.seconds >= 0 for record in records)
+    cf = parse_CF_shorthand(pTarg2_cf)
+    assert records[0].input_lengths == [len(cf.sequences[name].sequence) for name in ('targAf', 'targAr', 'p20N5')]
+    assert records[2].input_lengths == [records[0].output_length, records[1].output_length]
+    assert all(record.cache_hit is None for record in records)
+
+def test_on_step_cache_hits():
+    cache = StepCache()
+    simulate_CF(parse_CF_shorthand(pTarg2_cf), cache=cache)
+    records = []
+    simulate_CF(parse_CF_shorthand(pTarg2_cf), cache=cache, on_step=records.append)
+    # Transform is never cached
+    assert [record.cache_hit for record in records] == [True, True, True, None]
+
+def test_session_records_rerun_steps():
+    session = SimulationSession()
+    session.simulate(parse_CF_shorthand(pTarg2_cf))
+    records = []
+    edited = pTarg2_cf.replace('Transform gib Mach1 Amp pTarg2', 'Transform gib DH10B Amp pTarg2')
+    session.simulate(parse_CF_shorthand(edited), on_step=records.append)
+    assert [record.output for record in records] == ['pTarg2']
+
+def test_hooks():
+    records = []
+    add_hook(records.append)
+    try:
+        poly = dsDNA('GAGTCGAATTCATACGAGGGATCCAATCG')
+        dseqrecord = polynucleotide_to_dseqrecord(poly)
+        dseqrecord_to_polynucleotide(dseqrecord, 'phosphate', 'phosphate')
+        simulate_CF(parse_CF_shorthand(pTarg2_cf))
+    finally:
+        remove_hook(records.append)
+
+    conversions = [record for record in records if isinstance(record, ConversionRecord)]
+    assert [record.function for record in conversions[:2]] == ['polynucleotide_to_dseqrecord', 'dseqrecord_to_polynucleotide']
+    assert conversions[0].input_length == conversions[0].output_length == 29
+    assert [record.output for record in records if isinstance(record, StepRecord)] == ['pcrA', 'pcrB', 'gib', 'pTarg2']
+    assert instrumentation.hooks == []
+
+def test_no_output_without_hooks(capsys):
+    dseqrecord_to_polynucleotide(polynucleotide_to_dseqrecord(dsDNA('GAGTCGAATTCATACG')), 'phosphate', 'phosphate')
+    assert capsys.readouterr().out == ''
@@ -0,0 +1,63 @@
+import pickle
+
+import pytest
+from benchmarks.generate_CF import generate_CF
+from pydna_cf_simulator.limits import SimulationLimits, LimitExceeded, check_limits, iter_simulate_limited, KillableWorker
+from pydna_cf_simulator.parse_CF_shorthand import parse_CF_shorthand
+from pydna_cf_simulator.simulate_CF import simulate_CF
+from tests.test_plan_CF import pTarg2_cf
+
+def test_check_limits():
+    cf = parse_CF_shorthand(pTarg2_cf)
+    total = sum(len(poly.sequence) for poly in cf.sequences.values())
+    assert check_limits(cf, SimulationLimits(total, 4)) == ([0, 1, 2, 3], total)
+    with pytest.raises(LimitExceeded, match='The CF has 4 steps to simulate, more than the limit of 3'):
+        check_limits(cf, SimulationLimits(max_steps=3))
+    assert check_limits(cf, SimulationLimits(max_steps=1), targets=['pcrB'])[0] == [1]
+    with pytest.raises(LimitExceeded) as error:
+        check_limits(cf, SimulationLimits(max_total_length=total - 1))
+    assert error.value.to_dict() == {'error': str(error.value), 'limit': 'max_total_length', 'value': total,
+                                     'maximum': total - 1, 'step': None}
+
+def test_length_limit_names_step():
+    cf = parse_CF_shorthand(pTarg2_cf)
+    products = simulate_CF(cf)
+    total = sum(len(poly.sequence) for poly in cf.sequences.values())
+    limit = total + len(products['pcrA'].sequence) + len(products['pcrB'].sequence)
+
+    simulated = []
+    with pytest.raises(LimitExceeded, match='Step 3 \\(Gibson gib\\) brings the total sequence length') as error:
+        for name, _ in iter_simulate_limited(cf, SimulationLimits(max_total_length=limit)):
+            simulated.append(name)
+    assert simulated == ['pcrA', 'pcrB']
+    assert error.value.step == (2, 'Gibson', 'gib')
+
+def test_limit_exceeded_pickles():
+    error = pickle.loads(pickle.dumps(LimitExceeded('max_seconds', 1.0, 1.0, (0, 'PCR', 'pcrA'))))
+    assert error.to_dict()['step'] == {'index': 0, 'operation': 'PCR', 'output': 'pcrA'}
+    assert str(error) == 'Step 1 (PCR pcrA) was still running when the simulation reached its limit of 1.0 seconds.'
+
+def test_killable_worker():
+    worker = KillableWorker()
+    try:
+        small = parse_CF_shorthand(pTarg2_cf)
+        assert dict(worker.iter_simulate(small, SimulationLimits(max_seconds=30))) == {
+            name: poly for name, poly in simulate_CF(small).items() if name not in small.sequences}
+
+        # A 3 Mb template takes longer than the limit to index for PCR
+        slow = parse_CF_shorthand(generate_CF(3000000).shorthand())
+        process = worker.process
+        with pytest.raises(LimitExceeded, match='Step 1 \\(PCR pcr0\\) was still running') as error:
+            list(worker.iter_simulate(slow, SimulationLimits(max_seconds=0.05)))
+        assert error.value.limit == 'max_seconds'
+        assert not process.is_alive()
+
+        # The next simulation gets a new process
+        records = []
+        products = list(worker.iter_simulate(small, SimulationLimits(max_seconds=30), on_step=records.append))
+        assert [name for name, _ in products] == [record.output for record in records] == ['pcrA', 'pcrB', 'gib', 'pTarg2']
+
+        with pytest.raises(LimitExceeded, match='more than the limit of 3'):
+            list(worker.iter_simulate(small, SimulationLimits(max_steps=3, max_seconds=30)))
+    finally:
+        worker.shutdown()
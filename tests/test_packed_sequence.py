@@ -0,0 +1,45 @@
+import pickle
+import pytest
+from pydna_cf_simulator.packed_sequence import PackedSequence
+from pydna_cf_simulator.polynucleotide import Polynucleotide, plasmid
+from pydna_cf_simulator.polynucleotide_to_dseqrecord import polynucleotide_to_dseqrecord
+from pydna_cf_simulator.simulate_CF import simulate_CF
+from pydna_cf_simulator.construction_file import ConstructionFile, Digest
+
+@pytest.mark.parametrize('sequence', ['A', 'ACGT', 'ACGTA', 'GATTACAGATTACA', 'ATGCNRYKSWBVHDM', 'NNNN'])
+def test_round_trip(sequence):
+    packed = PackedSequence(sequence)
+    assert str(packed) == sequence
+    assert len(packed) == len(sequence)
+    assert packed == sequence
+    assert packed == PackedSequence(sequence)
+
+def test_packed_size():
+    packed = PackedSequence('ACGT' * 1000 + 'N')
+    assert packed.nbytes() == 1001 + 4 + 1
+
+def test_compact_polynucleotide_is_equal():
+    poly = Polynucleotide('atgcgctgacNNA', 'CGAA', '-TC', True, False, 'phosphate', 'hydroxyl')
+    compact = poly.compact()
+
+    assert compact.is_compact and not poly.is_compact
+    assert compact == poly and poly == compact
+    assert compact.sequence == 'ATGCGCTGACNNA'
+    assert compact.to_dict() == poly.to_dict()
+    assert compact != Polynucleotide('ATGCGCTGACNNT', 'CGAA', '-TC', True, False, 'phosphate', 'hydroxyl').compact()
+
+def test_compact_polynucleotide_interchangeable():
+    poly = plasmid('GAGTCGAATTCATACGAGGGATCCAATCG')
+    compact = poly.compact()
+
+    assert str(polynucleotide_to_dseqrecord(compact).seq) == str(polynucleotide_to_dseqrecord(poly).seq)
+    assert pickle.loads(pickle.dumps(compact)) == poly
+
+    cf = ConstructionFile([Digest('sequence', ['BamHI', 'EcoRI'], 0, 'product')], {'sequence': poly})
+    result = simulate_CF(cf, compact=True)
+    assert result['product'].is_compact
+    assert result == simulate_CF(cf)
+
+def test_polynucleotide_has_no_dict():
+    with pytest.raises(AttributeError):
+        plasmid('ATGC').extra = 1
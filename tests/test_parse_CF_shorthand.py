@@ -1,5 +1,6 @@
 import pytest
-from pydna_cf_simulator.parse_CF_shorthand import parse_CF_shorthand
+import io
+from pydna_cf_simulator.parse_CF_shorthand import parse_CF_shorthand, iter_CF_shorthand, SequenceDefinition
 from pydna_cf_simulator.construction_file import ConstructionFile, PCR, GoldenGate, Transform, Digest, Ligate, Gibson
 from pydna_cf_simulator.polynucleotide import Polynucleotide
 
@@ -19,8 +20,7 @@ def test_parse_golden_gate():
     assert isinstance(cf, ConstructionFile)
     assert len(cf.steps) == 1
     assert isinstance(cf.steps[0], GoldenGate)
-    assert 'Fragment1' in cf.steps[0].dnas
-    assert 'Fragment2' in cf.steps[0].dnas
+    assert cf.steps[0].dnas == ['Fragment1', 'Fragment2']
     assert cf.steps[0].enzyme == 'BsaI'
     assert cf.steps[0].output == 'ProductName'
 
@@ -145,6 +145,9 @@ def test_parse_invalid_sequence_format():
     with pytest.raises(ValueError) as e:
         parse_CF_shorthand('P6libF CCAAAGGTCTCATTATANNNNNNNNNNNNNNNNTGTCAXXXGAACCCAGGACTCCTCGAAGTCGTTCTTAAGACAAC')
     assert isinstance(e.value, ValueError)
+    assert str(e.value).startswith("Error in line 1: Invalid sequence format: character 'X' at position 39 ")
+    with pytest.raises(ValueError, match="Error in line 2: Invalid sequence format: character 'Z' at position 2 "):
+        parse_CF_shorthand('oligo a ACGT\nplasmid b AZGT')
 
 def test_parse_invalid_number_of_arguments_pcr():
     with pytest.raises(ValueError) as e:
@@ -190,3 +193,48 @@ def test_parse_invalid_sequence_number():
     with pytest.raises(ValueError) as e:
         parse_CF_shorthand('Digest DNA EcoRI,BamHI -1 ProductName')
     assert isinstance(e.value, ValueError)
+
+STREAMED_CF = """PCR fwd rev /* a comment
+spanning lines */ template pcrpdt
+// Digest pcrpdt EcoRI 0 skipped
+Digest pcrpdt EcoRI,BamHI 1 cut
+fwd ccagtGAATTCgtcc
+rev gcagtGGATCCtccg /* trailing */
+template """ + 'ACGT' * 50 + "\n"
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+def test_iter_cf_shorthand_chunks():
+    expected = parse_CF_shorthand(STREAMED_CF)
+    for size in (1, 2, 3, 7, 1000):
+        items = list(iter_CF_shorthand(chunked(STREAMED_CF, size)))
+        steps = [item for item in items if not isinstance(item, SequenceDefinition)]
+        sequences = {item.name: item.polynucleotide for item in items if isinstance(item, SequenceDefinition)}
+        assert [vars(step) for step in steps] == [vars(step) for step in expected.steps]
+        assert sequences == expected.sequences
+
+def test_iter_cf_shorthand_order():
+    items = list(iter_CF_shorthand(io.StringIO(STREAMED_CF)))
+    assert isinstance(items[0], PCR) and items[0].template == 'template'
+    assert isinstance(items[1], Digest)
+    assert [item.name for item in items[2:]] == ['fwd', 'rev', 'template']
+
+def test_iter_cf_shorthand_bytes():
+    data = STREAMED_CF.encode()
+    items = list(iter_CF_shorthand(io.BytesIO(data)))
+    assert len(items) == 5
+    assert len(list(iter_CF_shorthand(chunked(data, 5)))) == 5
+
+def test_iter_cf_shorthand_lazy():
+    def chunks():
+        yield 'Ligate a b c\n'
+        raise AssertionError('read past the first line')
+    assert isinstance(next(iter_CF_shorthand(chunks())), Ligate)
+
+def test_iter_cf_shorthand_line_numbers():
+    # Lines are counted after removing the comment, as parse_CF_shorthand does
+    with pytest.raises(ValueError, match="line 3"):
+        list(iter_CF_shorthand(['Ligate a b c\n/* one\ntwo */\nFoo', ' x y z']))
+    with pytest.raises(ValueError, match="line 3"):
+        parse_CF_shorthand('Ligate a b c\n/* one\ntwo */\nFoo x y z')
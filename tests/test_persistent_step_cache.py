@@ -0,0 +1,99 @@
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from pydna_cf_simulator.persistent_step_cache import SQLiteStepCache
+from pydna_cf_simulator.step_cache import StepCache, ENTRY_OVERHEAD
+from pydna_cf_simulator.simulate_CF import simulate_CF
+from pydna_cf_simulator.construction_file import ConstructionFile, PCR
+from pydna_cf_simulator.polynucleotide import Polynucleotide
+
+forward = Polynucleotide('CCGCAACACACTTAACCTTG', '', '', False, False, 'hydroxyl', 'hydroxyl')
+reverse = Polynucleotide('GTGGTTGTGGCCGGTCAAATC', '', '', False, False, 'hydroxyl', 'hydroxyl')
+template = Polynucleotide('CCGCAACACACTTAACCTTGGCGTCGGGATACGTACATTGGAGAACGGTTGGCTGTACGGACTTAATACTTTTTATGATAATGATTTGACCGGCCACAACCACCG', '', '', True, False, 'phosphate', 'phosphate')
+
+def write_entries(cache, prefix):
+    for i in range(20):
+        cache.put(f'{prefix}{i}', Polynucleotide('ATGC' * 10, '', '', True, False, 'hydroxyl', 'hydroxyl'))
+    return len(cache)
+
+def test_round_trip_survives_reopen(tmp_path):
+    path = str(tmp_path / 'steps.sqlite')
+    poly = Polynucleotide('ATGCGCTGAC', '-CGAA', 'TC', True, False, 'phosphate', None)
+    cache = SQLiteStepCache(path)
+    cache.put('key', poly)
+    cache.close()
+
+    reopened = SQLiteStepCache(path)
+    assert reopened.get('key') == poly
+    assert reopened.get('other') is None
+
+def test_eviction_by_size(tmp_path):
+    size = 100 + ENTRY_OVERHEAD
+    cache = SQLiteStepCache(str(tmp_path / 'steps.sqlite'), max_bytes=2 * size)
+    polys = [Polynucleotide('A' * 100, '', '', True, False, None, None) for _ in range(3)]
+
+    cache.put('a', polys[0])
+    cache.put('b', polys[1])
+    cache.get('a')
+    cache.put('c', polys[2])
+
+    assert cache.get('b') is None
+    assert cache.get('a') == polys[0]
+    assert cache.get('c') == polys[2]
+    assert cache.current_bytes() <= cache.max_bytes
+
+def test_running_total(tmp_path):
+    path = str(tmp_path / 'steps.sqlite')
+    size = 100 + ENTRY_OVERHEAD
+    cache = SQLiteStepCache(path, max_bytes=10 * size)
+    for i in range(30):
+        cache.put(f'k{i}', Polynucleotide('A' * 100, '', '', True, False, None, None))
+    cache.put('k29', Polynucleotide('A' * 50, '', '', True, False, None, None))
+    assert len(cache) == 10
+    assert cache.current_bytes() == 9 * size + 50 + ENTRY_OVERHEAD
+
+    # One large product evicts several small ones in a single put
+    cache.put('big', Polynucleotide('A' * (5 * size), '', '', True, False, None, None))
+    assert cache.get('k29') is not None and cache.get('k23') is None
+    assert cache.current_bytes() == sum(row[0] for row in sqlite3.connect(path).execute('SELECT size FROM products'))
+    assert cache.current_bytes() <= cache.max_bytes
+
+def test_hits_do_not_write(tmp_path):
+    path = str(tmp_path / 'steps.sqlite')
+    cache = SQLiteStepCache(path)
+    cache.put('a', Polynucleotide('ACGT', '', '', True, False, None, None))
+    last_used = lambda: sqlite3.connect(path).execute('SELECT last_used FROM products').fetchone()[0]
+    before = last_used()
+
+    cache.get('a')
+    assert last_used() == before
+    cache.close()
+    assert last_used() > before
+
+def test_total_of_existing_file(tmp_path):
+    path = str(tmp_path / 'steps.sqlite')
+    cache = SQLiteStepCache(path)
+    cache.put('a', Polynucleotide('ACGT', '', '', True, False, None, None))
+    cache.close()
+    # A file written before the running total was kept
+    with sqlite3.connect(path) as connection:
+        connection.execute('DROP TABLE metadata')
+
+    assert SQLiteStepCache(path).current_bytes() == 4 + ENTRY_OVERHEAD
+
+def test_concurrent_processes(tmp_path):
+    cache = SQLiteStepCache(str(tmp_path / 'steps.sqlite'))
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        list(executor.map(write_entries, [cache] * 4, ['a', 'b', 'c', 'd']))
+    assert len(cache) == 80
+
+def test_step_cache_warm_start(tmp_path):
+    path = str(tmp_path / 'steps.sqlite')
+    cf = ConstructionFile([PCR('f', 'r', 't', 'p')], {'f': forward, 'r': reverse, 't': template})
+    expected = simulate_CF(cf)['p']
+
+    simulate_CF(cf, cache=StepCache(persistent=SQLiteStepCache(path)))
+
+    # A new process-local cache is filled from the file
+    restarted = StepCache(persistent=SQLiteStepCache(path))
+    assert simulate_CF(cf, cache=restarted)['p'] == expected
+    assert (restarted.hits, restarted.persistent_hits, restarted.misses) == (1, 1, 0)
@@ -0,0 +1,107 @@
+import pytest
+from concurrent.futures import ProcessPoolExecutor
+from pydna_cf_simulator.plan_CF import plan_CF, contributing_steps, final_products
+from pydna_cf_simulator.simulate_CF import simulate_CF, simulate_CF_parallel
+from pydna_cf_simulator.parse_CF_shorthand import parse_CF_shorthand
+from pydna_cf_simulator.construction_file import ConstructionFile, PCR, Digest, Ligate, Transform
+from pydna_cf_simulator.polynucleotide import oligo, plasmid, dsDNA
+
+pTarg2_cf = """
+PCR targAf targAr p20N5 1200 pcrA
+PCR targBf targBr pTargetF 1172 pcrB
+Gibson pcrA pcrB gib
+Transform gib Mach1 Amp pTarg2
+oligo targAf    GAGTTCATGTGCAGCTCCATAAGCTGAAATTCTGCCTCGTGATAC
+oligo targAr    GTTAAGGGATTTTGGTCATGAGATTATCAAAAAGGATCTTC
+oligo targBf    GAAGATCCTTTTTGATAATCTCATGACCAAAATCCCTTAAC
+oligo targBr    GTATCACGAGGCAGAATTTCAGCTTATGGAGCTGCACATGAACTC
+plasmid p20N5   attaccgcctttgagtgagctgataccgctcgccgcagccgaacgaccgagcgcagcgagtcagtgagcgaggaagcctgcaaCTCGAGcgatcagatACTAGTaaccaatataccaaataaagagttgaggacgtcaaggATGGCTTCCTCCGAAGACGTTATCAAAGAGTTCATGCGTTTCAAAGTTCGTATGGAAGGTTCCGTTAACGGTCACGAGTTCGAAATCGAAGGTGAAGGTGAAGGTCGTCCGTACGAAGGTACCCAGACCGCTAAACTGAAAGTTACCAAAGGTGGTCCGCTGCCGTTCGCTTGGGACATCCTGTCCCCGCAGTTCCAGTACGGTTCCAAGGCTTACGTTAAACACCCGGCTGACATCCCGGACTACCTGAAACTGTCCTTCCCGGAAGGTTTCAAATGGGAACGTGTTATGAACTTCGAAGACGGTGGTGTTGTTACCGTTACCCAGGATTCCTCCCTGCAAGACGGTGAGTTCATCTACAAAGTTAAACTGCGTGGTACCAACTTCCCGTCCGACGGTCCGGTTATGCAGAAAAAAACCATGGGTTGGGAGGCTTCCACCGAACGTATGTACCCGGAAGACGGTGCTCTGAAAGGTGAAATCAAAATGCGTCTGAAACTGAAAGACGGTGGTCACTACGACGCTGAAGTTAAAACCACCTACATGGCTAAAAAACCGGTTCAGCTGCCGGGTGCTTACAAAACCGACATCAAACTGGACATCACCTCCCACAACGAAGACTACACCATCGTTGAACAGTACGAACGTGCTGAAGGTCGTCACTCCACCGGTGCTTAAGAATTCccctAGAGACCCCTCCTCcagaaatcatccttagcgaaagctaaggattttttttatctgaaattctgcctcgtgatacgcctatttttataggttaatgtcatgataataatggtttcttagacgtcaggtggcacttttcggggaaatgtgcgcggaacccctatttgtttatttttctaaatacattcaaatatgtatccgctcatgagacaataaccctgataaatgcttcaataatattgaaaaaggaagagtatgagtattcaacatttccgtgtcgcccttattcccttttttgcggcattttgccttcctgtttttgctcacccagaaacgctggtgaaagtaaaagatgctgaagatcagttgggtgcacgagtgggttacatcgaactggatctcaacagcggtaagatccttgagagttttcgccccgaagaacgttttccaatgatgagcacttttaaagttctgctatgtggcgcggtattatcccgtattgacgccgggcaagagcaactcggtcgccgcatacactattctcagaatgacttggttgagtactcaccagtcacagaaaagcatcttacggatggcatgacagtaagagaattatgcagtgctgccataaccatgagtgataacactgcggccaacttacttctgacaacgatcggaggaccgaaggagctaaccgcttttttgcacaacatgggggatcatgtaactcgccttgatcgttgggaaccggagctgaatgaagccataccaaacgacgagcgtgacaccacgatgcctgtagcaatggcaacaacgttgcgcaaactattaactggcgaactacttactctagcttcccggcaacaattaatagactggatggaggcggataaagttgcaggaccacttctgcgctcggcccttccggctggctggtttattgctgataaatctggagccggtgagcgtggCtctcgcggtatcattgcagcactggggccagatggtaagccctcccgtatcgtagttatctacacgacggggagtcaggcaactatggatgaacgaaatagacagatcgctgagataggtgcctcactgattaagcattggtaactgtcagaccaagtttactcatatatactttagattgatttaaaacttcatttttaatttaaaaggatctaggtgaagatcctttttgataatctcatgaccaaaatcccttaacgtgagttttcgttccactgagcgtcagaccccgtagaaaagatcaaaggatcttcttgagatcctttttttctgcgcgtaatctgctgcttgcaaacaaaaaaaccaccgctaccagcggtggtttgtttgccggatcaagagctaccaactctttttccgaaggtaactggcttcagcagagcgcagataccaaatactgtccttctagtgtagccgtagttaggccaccacttcaagaactctgtagcaccgcctacatacctcgctctgctaatcctgttaccagtggctgctgccagtggcgataagtcgtgtcttaccgggttggactcaagacgatagttaccggataaggcgcagcggtcgggctgaacggggggttcgtgcacacagcccagcttggagcgaacgacctacaccgaactgagatacctacagcgtgagctatgagaaagcgccacgcttcccgaagggagaaaggcggacaggtatccggtaagcggcagggtcggaacaggagagcgcacgagggagcttccagggggaaacgcctggtatctttatagtcctgtcgggtttcgccacctctgacttgagcgtcgatttttgtgatgctcgtcaggggggcggagcctatggaaaaacgccagcaacgcggcctttttacggttcctggccttttgctggccttttgctcacatgttctttcctgcgttatcccctgattctgtggataaccgt
+plasmid pTargetF catgttctttcctgcgttatcccctgattctgtggataaccgtattaccgcctttgagtgagctgataccgctcgccgcagccgaacgaccgagcgcagcgagtcagtgagcgaggaagcggaagagcgcctgatgcggtattttctccttacgcatctgtgcggtatttcacaccgcatatgctggatccttgacagctagctcagtcctaggtataatactagtcatcgccgcagcggtttcaggttttagagctagaaatagcaagttaaaataaggctagtccgttatcaacttgaaaaagtggcaccgagtcggtgctttttttgaattctctagagtcgacctgcagaagcttagatctattaccctgttatccctactcgagttcatgtgcagctccataagcaaaaggggatgataagtttatcaccaccgactatttgcaacagtgccgttgatcgtgctatgatcgactgatgtcatcagcggtggagtgcaatgtcatgagggaagcggtgatcgccgaagtatcgactcaactatcagaggtagttggcgtcatcgagcgccatctcgaaccgacgttgctggccgtacatttgtacggctccgcagtggatggcggcctgaagccacacagtgatattgatttgctggttacggtgaccgtaaggcttgatgaaacaacgcggcgagctttgatcaacgaccttttggaaacttcggcttcccctggagagagcgagattctccgcgctgtagaagtcaccattgttgtgcacgacgacatcattccgtggcgttatccagctaagcgcgaactgcaatttggagaatggcagcgcaatgacattcttgcaggtatcttcgagccagccacgatcgacattgatctggctatcttgctgacaaaagcaagagaacatagcgttgccttggtaggtccagcggcggaggaactctttgatccggttcctgaacaggatctatttgaggcgctaaatgaaaccttaacgctatggaactcgccgcccgactgggctggcgatgagcgaaatgtagtgcttacgttgtcccgcatttggtacagcgcagtaaccggcaaaatcgcgccgaaggatgtcgctgccgactgggcaatggagcgcctgccggcccagtatcagcccgtcatacttgaagctagacaggcttatcttggacaagaagaagatcgcttggcctcgcgcgcagatcagttggaagaatttgtccactacgtgaaaggcgagatcaccaaggtagtcggcaaataagatgccgctcgccagtcgattggctgagctcataagttcctattccgaagttccgcgaacgcgtaaaggatctaggtgaagatcctttttgataatctcatgaccaaaatcccttaacgtgagttttcgttccactgagcgtcagaccccgtagaaaagatcaaaggatcttcttgagatcctttttttctgcgcgtaatctgctgcttgcaaacaaaaaaaccaccgctaccagcggtggtttgtttgccggatcaagagctaccaactctttttccgaaggtaactggcttcagcagagcgcagataccaaatactgtccttctagtgtagccgtagttaggccaccacttcaagaactctgtagcaccgcctacatacctcgctctgctaatcctgttaccagtggctgctgccagtggcgataagtcgtgtcttaccgggttggactcaagacgatagttaccggataaggcgcagcggtcgggctgaacggggggttcgtgcacacagcccagcttggagcgaacgacctacaccgaactgagatacctacagcgtgagctatgagaaagcgccacgcttcccgaagggagaaaggcggacaggtatccggtaagcggcagggtcggaacaggagagcgcacgagggagcttccagggggaaacgcctggtatctttatagtcctgtcgggtttcgccacctctgacttgagcgtcgatttttgtgatgctcgtcaggggggcggagcctatggaaaaacgccagcaacgcggcctttttacggttcctggccttttgctggccttttgctca
+"""
+
+def make_cf(steps):
+    sequences = {'f': oligo('CCGCAACACACTTAACCTTG'), 'r': oligo('GTGGTTGTGGCCGGTCAAATC'), 'p': plasmid('CCGCAACACACTTAACCTTGGCGTCGGG')}
+    return ConstructionFile(steps, sequences)
+
+def test_plan_independent_steps():
+    cf = parse_CF_shorthand(pTarg2_cf)
+    plan = plan_CF(cf)
+
+    assert plan.ready() == [0, 1]
+    assert plan.dependencies == [set(), set(), {0, 1}, {2}]
+    assert plan.order() == [0, 1, 2, 3]
+
+def test_plan_undefined_input():
+    cf = make_cf([PCR('f', 'r', 'missing', 'pcr')])
+    with pytest.raises(ValueError, match="undefined input 'missing'"):
+        plan_CF(cf)
+
+def test_plan_duplicate_output():
+    cf = make_cf([PCR('f', 'r', 'p', 'pcr'), Digest('p', ['EcoRI'], 0, 'pcr')])
+    with pytest.raises(ValueError, match="defined more than once"):
+        plan_CF(cf)
+
+def test_plan_cycle():
+    cf = make_cf([Ligate(['p', 'b'], 'a'), Ligate(['a'], 'b'), Transform('b', 'Mach1', ['Amp'], 'c')])
+    with pytest.raises(ValueError, match="cycle"):
+        plan_CF(cf)
+
+def test_simulate_CF_parallel_threads():
+    expected = simulate_CF(parse_CF_shorthand(pTarg2_cf))
+    result = simulate_CF_parallel(parse_CF_shorthand(pTarg2_cf), max_workers=2)
+
+    assert list(result) == list(expected)
+    assert result == expected
+
+def test_simulate_CF_parallel_processes():
+    expected = simulate_CF(parse_CF_shorthand(pTarg2_cf))
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        result = simulate_CF_parallel(parse_CF_shorthand(pTarg2_cf), executor=executor)
+
+    assert result == expected
+
+def test_contributing_steps():
+    cf = parse_CF_shorthand(pTarg2_cf)
+    assert contributing_steps(cf, ['pcrB']) == [1]
+    assert contributing_steps(cf, ['pTarg2']) == [0, 1, 2, 3]
+    assert contributing_steps(cf, ['p20N5']) == []
+
+def test_contributing_steps_ignore_other_routes():
+    # The second route uses an undefined name, but is not needed for 'cut'
+    cf = make_cf([Digest('p', ['EcoRI'], 0, 'cut'), PCR('f', 'r', 'missing', 'pcr')])
+    assert contributing_steps(cf, ['cut']) == [0]
+    with pytest.raises(ValueError, match="undefined input 'missing'"):
+        contributing_steps(cf, ['pcr'])
+    with pytest.raises(ValueError, match="Target 'other'"):
+        contributing_steps(cf, ['other'])
+
+def test_contributing_steps_cycle():
+    cf = make_cf([Ligate(['p', 'b'], 'a'), Ligate(['a'], 'b'), Transform('b', 'Mach1', ['Amp'], 'c')])
+    with pytest.raises(ValueError, match="cycle"):
+        contributing_steps(cf, ['c'])
+
+def pcr_chain(length):
+    # Each PCR amplifies the product of the one before
+    template = dsDNA('CCGCAACACACTTAACCTTGGCGTCGGGATACGTACATTGGAGAACGGTTGGCTGTACGGACTTAATGATTTGACCGGCCACAACCACCG')
+    steps = [PCR('f', 'r', f'p{i - 1}', f'p{i}') for i in range(1, length + 1)]
+    return ConstructionFile(steps, {'f': oligo('CCGCAACACACTTAACCTTG'), 'r': oligo('GTGGTTGTGGCCGGTCAAATC'), 'p0': template})
+
+def test_contributing_steps_long_chain():
+    cf = pcr_chain(1500)
+    assert contributing_steps(cf, ['p1500']) == list(range(1500))
+    assert simulate_CF(cf, targets=['p1500'])['p1500'] == simulate_CF(pcr_chain(1))['p1']
+
+def test_simulate_CF_targets():
+    expected = simulate_CF(parse_CF_shorthand(pTarg2_cf))
+    cf = parse_CF_shorthand(pTarg2_cf)
+    # An alternative route that would fail is skipped
+    cf.steps.append(Transform('pcrA', 'Mach1', ['Amp'], 'unused'))
+
+    result = simulate_CF(cf, targets=['pTarg2', 'pcrA'])
+    assert list(result) == ['pTarg2', 'pcrA']
+    assert result['pTarg2'] == expected['pTarg2']
+
+def test_final_products():
+    assert final_products(parse_CF_shorthand(pTarg2_cf)) == ['pTarg2']
+    cf = parse_CF_shorthand(pTarg2_cf.replace('Gibson pcrA pcrB gib', 'Gibson pcrA pcrB gib\nDigest pcrB EcoRI 0 cut'))
+    assert final_products(cf) == ['cut', 'pTarg2']
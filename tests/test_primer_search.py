@@ -0,0 +1,97 @@
+import random
+
+import pytest
+from pydna_cf_simulator.primer_search import TemplateMasks, IUPAC_BASES, find_amplicon_mismatched
+from pydna_cf_simulator.amplicon_finder import find_amplicon
+from pydna_cf_simulator.simulate_CF import simulate_CF
+from pydna_cf_simulator.parse_CF_JSON import parse_CF_JSON
+from pydna_cf_simulator.construction_file import ConstructionFile, PCR
+from pydna_cf_simulator.polynucleotide import oligo, plasmid, dsDNA
+
+template_sequence = 'CCGCAACACACTTAACCTTGGCGTCGGGATACGTACATTGGAGAACGGTTGGCTGTACGGACTTAATACTTTTTATGATAATGATTTGACCGGCCACAACCACCG'
+forward = oligo('CCGCAACACACTTAACCTTG')
+reverse = oligo('GTGGTTGTGGCCGGTCAAATC')
+expected_sequence = 'CCGCAACACACTTAACCTTGGCGTCGGGATACGTACATTGGAGAACGGTTGGCTGTACGGACTTAATACTTTTTATGATAATGATTTGACCGGCCACAACCAC'
+
+def naive_find(sequence, circular, pattern, max_mismatches, anchor):
+    n, length = len(sequence), len(pattern)
+    text = (sequence * (length // n + 2))[:n + length - 1] if circular else sequence
+    sites = []
+    for start in range(n if circular else n - length + 1):
+        mismatched = [offset for offset, base in enumerate(pattern)
+                      if not set(IUPAC_BASES[base]) & set(IUPAC_BASES[text[start + offset]])]
+        if len(mismatched) <= max_mismatches and anchor not in mismatched:
+            sites.append(start)
+    return sites
+
+def test_find_matches_naive_search():
+    rng = random.Random(1)
+    for _ in range(200):
+        sequence = ''.join(rng.choice('ACGTACGTACGTNRY') for _ in range(rng.randint(1, 200)))
+        circular = rng.random() < 0.5
+        pattern = ''.join(rng.choice('ACGTACGTACGTNRYKMSWBDHV') for _ in range(rng.randint(1, 18)))
+        max_mismatches = rng.randint(0, 3)
+        anchor = rng.choice([None, 0, len(pattern) - 1])
+        masks = TemplateMasks(sequence, circular)
+        assert masks.find(pattern, max_mismatches, anchor) == naive_find(sequence, circular, pattern, max_mismatches, anchor)
+
+def test_find_across_origin_and_word_boundaries():
+    sequence = ''.join(random.Random(2).choice('ACGT') for _ in range(300))
+    masks = TemplateMasks(sequence, True)
+    for start in (0, 63, 64, 127, 290):
+        assert start in masks.find((sequence + sequence)[start:start + 18], 0)
+
+def test_same_product_as_exact_search():
+    product = find_amplicon_mismatched(forward, reverse, dsDNA(template_sequence), 0)
+    assert product == find_amplicon(forward, reverse, dsDNA(template_sequence))
+
+def test_mismatch_and_tail():
+    # One mismatch in the middle of each primer, and a 5' tail on the forward one
+    mismatched_forward = oligo('GGATCC' + forward.sequence[:10] + 'G' + forward.sequence[11:])
+    mismatched_reverse = oligo(reverse.sequence[:12] + 'A' + reverse.sequence[13:])
+    template = dsDNA(template_sequence)
+    with pytest.raises(ValueError):
+        find_amplicon_mismatched(mismatched_forward, mismatched_reverse, template, 0)
+    product = find_amplicon_mismatched(mismatched_forward, mismatched_reverse, template, 1)
+    assert product.sequence.startswith(mismatched_forward.sequence)
+    assert len(product.sequence) == len(expected_sequence) + 6
+
+def test_degenerate_primer():
+    degenerate = oligo(forward.sequence[:8] + 'NMHW' + forward.sequence[12:])
+    product = find_amplicon_mismatched(degenerate, reverse, dsDNA(template_sequence), 0)
+    assert product.sequence == degenerate.sequence + expected_sequence[20:]
+
+def test_three_prime_base_must_match():
+    wrong_end = oligo(forward.sequence[:-1] + 'A')
+    with pytest.raises(ValueError, match='do not anneal'):
+        find_amplicon_mismatched(wrong_end, reverse, dsDNA(template_sequence), 2)
+
+def test_circular_template_and_swapped_primers():
+    rotated = template_sequence[10:] + template_sequence[:10]
+    product = find_amplicon_mismatched(reverse, forward, plasmid(rotated), 1)
+    assert product.sequence == expected_sequence
+
+def test_several_sites():
+    repeated = dsDNA(template_sequence[:60] + template_sequence)
+    with pytest.raises(ValueError, match='anneal at 3 sites'):
+        find_amplicon_mismatched(forward, reverse, repeated, 1, ('f', 'r', 't'))
+
+def test_simulate_PCR_with_mismatches():
+    sequences = {'f': oligo(forward.sequence[:10] + 'G' + forward.sequence[11:]), 'r': reverse, 't': dsDNA(template_sequence)}
+    with pytest.raises(Exception):
+        simulate_CF(ConstructionFile([PCR('f', 'r', 't', 'p')], sequences))
+    product = simulate_CF(ConstructionFile([PCR('f', 'r', 't', 'p', max_mismatches=1)], sequences))['p']
+    assert product.sequence[20:] == expected_sequence[20:]
+
+def test_JSON_max_mismatches():
+    cf = parse_CF_JSON('{"steps": [{"operation": "PCR", "forward_oligo": "f", "reverse_oligo": "r", "template": "t", '
+                       '"output": "p", "max_mismatches": 2}], "sequences": {}}')
+    assert cf.steps[0].max_mismatches == 2
+
+def test_masks_size_covers_code_masks():
+    masks = TemplateMasks(template_sequence * 10, True)
+    for code in IUPAC_BASES:
+        masks.find(code * 5, 1)
+    held = sum(mask.nbytes for mask in masks._base_masks.values()) + sum(mask.nbytes for mask in masks._code_masks.values())
+    assert held <= masks.nbytes()
+    assert masks.nbytes() <= 3 * len(masks.sequence)
@@ -0,0 +1,51 @@
+from pydna_cf_simulator.restriction_scanner import RestrictionScanner, CutSite, default_scanner, digest_fragments, circular_slice
+from pydna_cf_simulator.polynucleotide import Polynucleotide, dsDNA, plasmid
+
+def test_scan_all_enzymes_in_one_pass():
+    cuts = default_scanner().scan('GAGTCGAATTCATACGAGGGATCCAATCG', False)
+    assert cuts == [CutSite('EcoRI', 6, 10, -4, 'AATT'), CutSite('BamHI', 19, 23, -4, 'GATC')]
+
+def test_scan_selected_enzymes():
+    cuts = default_scanner().scan('GAGTCGAATTCATACGAGGGATCCAATCG', False, ['BamHI'])
+    assert [cut.enzyme for cut in cuts] == ['BamHI']
+
+def test_scan_type_IIS_both_strands():
+    scanner = RestrictionScanner(['BsaI'])
+    # GGTCTC N^NNNN_ on the top strand, _NNNN^N GAGACC on the bottom strand
+    forward = scanner.scan('AAGGTCTCATGCAAAAA', False)
+    reverse = scanner.scan('AAAAATGCAGAGACCAA', False)
+    assert forward == [CutSite('BsaI', 9, 13, -4, 'TGCA')]
+    assert reverse == [CutSite('BsaI', 4, 8, -4, 'ATGC')]
+
+def test_scan_3prime_overhang():
+    cuts = default_scanner().scan('AAAACTGCAGAAAA', False, ['PstI'])
+    assert cuts == [CutSite('PstI', 9, 5, 4, 'TGCA')]
+
+def test_scan_circular_origin():
+    # The EcoRI site spans the origin
+    cuts = default_scanner().scan('AATTCATACGAGGGATCCAATCGGAGTCG', True, ['EcoRI'])
+    assert cuts == [CutSite('EcoRI', 0, 4, -4, 'AATT')]
+    assert default_scanner().scan('AATTCATACGAGGGATCCAATCGGAGTCG', False, ['EcoRI']) == []
+
+def test_digest_fragments_linear():
+    fragments = digest_fragments(dsDNA('GAGTCGAATTCATACGAGGGATCCAATCG'), ['EcoRI', 'BamHI'])
+    assert fragments == [
+        Polynucleotide('GAGTCG', '', 'AATT', True, False, 'phosphate', 'phosphate'),
+        Polynucleotide('CATACGAGG', 'AATT', 'GATC', True, False, 'phosphate', 'phosphate'),
+        Polynucleotide('CAATCG', 'GATC', '', True, False, 'phosphate', 'phosphate'),
+    ]
+
+def test_digest_fragments_circular_single_cut():
+    fragments = digest_fragments(plasmid('GAGTCGAATTCATACG'), ['EcoRI'])
+    assert fragments == [Polynucleotide('CATACGGAGTCG', 'AATT', 'AATT', True, False, 'phosphate', 'phosphate')]
+
+def test_digest_fragments_no_cut():
+    assert digest_fragments(dsDNA('AAAAAAAAAA'), ['EcoRI']) == []
+
+def test_digest_fragments_falls_back():
+    # Sticky inputs are left to pydna
+    assert digest_fragments(Polynucleotide('GAGTCGAATTCATACG', 'AATT', '', True, False, 'phosphate', 'phosphate'), ['EcoRI']) is None
+
+def test_circular_slice():
+    assert circular_slice('ABCDEF', 4, 8) == 'EFAB'
+    assert circular_slice('ABCDEF', -2, 1) == 'EFA'
@@ -0,0 +1,61 @@
+import hashlib
+import random
+
+import pytest
+from seguid import cdseguid, csseguid, ldseguid, lsseguid
+
+from pydna_cf_simulator.result_encoding import min_rotation, least_rotation, seguid, encode_polynucleotide
+from pydna_cf_simulator.polynucleotide import Polynucleotide, dsDNA, plasmid, oligo
+from pydna_cf_simulator.polynucleotide_to_dseqrecord import polynucleotide_to_dseqrecord
+from pydna_cf_simulator.sequence_kernels import reverse_complement
+
+def naive_min_rotation(sequence):
+    return min(sequence[start:] + sequence[:start] for start in range(len(sequence)))
+
+def test_min_rotation():
+    rng = random.Random(0)
+    for _ in range(2000):
+        length = rng.randrange(1, 120)
+        sequence = ''.join(rng.choices(rng.choice(['ACGT', 'AC', 'AAAAAC', 'A']), k=length))
+        assert min_rotation(sequence) == naive_min_rotation(sequence)
+
+def test_min_rotation_repeats():
+    assert min_rotation('CA' * 200) == 'AC' * 200
+    assert min_rotation('TTTA' * 50 + 'TTTAA') == 'AA' + 'TTTA' * 50 + 'TTT'
+    for sequence in ['CA' * 7 + 'C', 'ACGACC' * 5, 'TTTA' * 9 + 'T']:
+        start = least_rotation(sequence + sequence)
+        assert sequence[start:] + sequence[:start] == naive_min_rotation(sequence)
+
+def test_seguid():
+    sequence = 'GAGTCGAATTCATACGAGGGATCCAATCGTACGATTACG'
+    assert seguid(oligo(sequence)) == lsseguid(sequence)
+    assert seguid(Polynucleotide(sequence, '', '', False, True, None, None)) == csseguid(sequence)
+    assert seguid(dsDNA(sequence)) == ldseguid(sequence, reverse_complement(sequence))
+    assert seguid(plasmid(sequence)) == cdseguid(sequence, reverse_complement(sequence))
+    assert seguid(plasmid(sequence[10:] + sequence[:10])) == seguid(plasmid(sequence))
+    assert seguid(plasmid(reverse_complement(sequence))) == seguid(plasmid(sequence))
+
+def test_seguid_double_stranded_ends():
+    # The same top strand, blunt or with a 5' overhang, gives different checksums
+    sticky = Polynucleotide('ACGTTGCA', 'AATT', '', True, False, None, None)
+    assert seguid(Polynucleotide('AATTACGTTGCA', '', '', True, False, None, None)) != seguid(sticky)
+    assert seguid(sticky) == ldseguid('AATTACGTTGCA', 'TGCAACGT----')
+
+    rng = random.Random(1)
+    extension = lambda: ''.join(rng.choices('ACGT', k=rng.randint(1, 4)))
+    for _ in range(300):
+        sequence = ''.join(rng.choices('ACGT', k=rng.randint(1, 40)))
+        ext5 = rng.choice(['', extension(), '-' + extension()])
+        ext3 = rng.choice(['', extension(), '-' + extension()])
+        poly = Polynucleotide(sequence, ext5, ext3, True, False, None, None)
+        assert seguid(poly) == polynucleotide_to_dseqrecord(poly).seq.seguid()
+
+def test_encode_polynucleotide():
+    poly = Polynucleotide('ACGTTGCA', 'AATT', '', True, False, 'phosphate', 'hydroxyl')
+    assert encode_polynucleotide(poly) == poly.to_dict()
+    assert encode_polynucleotide(poly, 'seguid') == dict(poly.to_dict(), sequence=ldseguid('AATTACGTTGCA', 'TGCAACGT----'))
+    assert encode_polynucleotide(poly, 'digest')['sequence'] == {'length': 8, 'sha1': hashlib.sha1(b'ACGTTGCA').hexdigest(), 'gc': 0.5}
+    primer = Polynucleotide('CCGCAACACACTTAACCTTG', '', '', False, False, None, None)
+    assert encode_polynucleotide(primer, 'digest')['sequence']['tm'] == pytest.approx(64.9 + 41 * (10 - 16.4) / 20)
+    with pytest.raises(ValueError, match="Unknown sequence format 'short'"):
+        encode_polynucleotide(poly, 'short')
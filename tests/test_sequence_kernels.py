@@ -0,0 +1,74 @@
+import random
+
+import pytest
+from pydna.dseq import Dseq
+from pydna_cf_simulator.sequence_kernels import (KERNEL_THRESHOLD, uppercase, reverse_complement, reverse_complements,
+                                                 invalid_position, normalize_sequence, GCProfile, melting_temperature)
+from pydna_cf_simulator.polynucleotide import Polynucleotide
+from pydna_cf_simulator.polynucleotide_to_dseqrecord import polynucleotide_to_dseqrecord, strands_to_dseq
+from pydna_cf_simulator.dseqrecord_to_polynucleotide import dseqrecord_to_polynucleotide
+
+def random_sequence(rng, length, alphabet='ACGTNRYKMSWBDHV'):
+    return ''.join(rng.choice(alphabet) for _ in range(length))
+
+@pytest.mark.parametrize('length', [0, 10, KERNEL_THRESHOLD + 10])
+def test_kernels_match_str_methods(length):
+    sequence = random_sequence(random.Random(length), length, 'ACGTNRYKMSWBDHVacgtnrykmswbdhv')
+    assert uppercase(sequence) == sequence.upper()
+    assert reverse_complement(sequence).upper() == reverse_complement(sequence.upper())
+
+def test_reverse_complement():
+    assert reverse_complement('AACGTN') == 'NACGTT'
+    assert reverse_complement('RYKMSWBDHV') == 'BDHVWSKMRY'
+    assert reverse_complement('acgT') == 'Acgt'
+
+def test_reverse_complements():
+    assert reverse_complements(['AAC', 'GT', '', 'N']) == ['GTT', 'AC', '', 'N']
+    assert reverse_complements([]) == []
+
+@pytest.mark.parametrize('length', [10, KERNEL_THRESHOLD + 10])
+def test_invalid_position(length):
+    sequence = random_sequence(random.Random(0), length)
+    assert invalid_position(sequence) is None
+    for position in (0, length // 2, length - 1):
+        assert invalid_position(sequence[:position] + 'X' + sequence[position + 1:]) == position
+    assert invalid_position(sequence[:3] + 'é' + sequence[4:]) == 3
+    assert invalid_position(sequence, 'ACGT') == min(i for i, base in enumerate(sequence) if base not in 'ACGT')
+
+def test_normalize_sequence():
+    assert normalize_sequence('acgtn') == 'ACGTN'
+    with pytest.raises(ValueError, match="character 'X' at position 3"):
+        normalize_sequence('acxt')
+    with pytest.raises(ValueError, match='at least one character'):
+        normalize_sequence('')
+
+def test_gc_profile():
+    sequence = random_sequence(random.Random(3), 500, 'ACGTS')
+    profile = GCProfile(sequence.lower())
+    for start, end in [(0, 500), (10, 28), (499, 500), (20, 20)]:
+        window = sequence[start:end]
+        count = sum(base in 'GCS' for base in window)
+        assert profile.gc_count(start, end) == count
+        assert profile.gc_fraction(start, end) == (count / len(window) if window else 0.0)
+        assert profile.melting_temperature(start, end) == melting_temperature(len(window), count)
+    assert profile.gc_count() == profile.gc_count(0, 500)
+
+def test_melting_temperature():
+    assert melting_temperature(10, 5) == 30.0
+    assert melting_temperature(20, 10) == pytest.approx(64.9 + 41 * (10 - 16.4) / 20)
+
+def test_conversion_matches_strand_construction():
+    rng = random.Random(4)
+    extension = lambda: random_sequence(rng, rng.randint(1, 5), 'ACGT')
+    for _ in range(300):
+        circular = rng.random() < 0.2
+        ext5 = '' if circular else rng.choice(['', extension(), '-' + extension()])
+        ext3 = '' if circular else rng.choice(['', extension(), '-' + extension()])
+        poly = Polynucleotide(random_sequence(rng, rng.randint(1, 30)), ext5, ext3, True, circular, None, None)
+        converted = polynucleotide_to_dseqrecord(poly).seq
+        built = strands_to_dseq(poly, Dseq)
+        assert (converted.watson, converted.crick, converted.ovhg, converted.circular) == \
+               (built.watson, built.crick, built.ovhg, built.circular)
+        assert converted._data == built._data
+        back = dseqrecord_to_polynucleotide(polynucleotide_to_dseqrecord(poly), None, None)
+        assert (back.sequence, back.ext5, back.ext3, back.is_circular) == (poly.sequence, ext5, ext3, circular)
@@ -0,0 +1,67 @@
+import pytest
+from pydna_cf_simulator.sequence_store import SequenceStore, derived
+from pydna_cf_simulator.parse_CF_shorthand import parse_CF_shorthand, make_sequence
+from pydna_cf_simulator.simulate_CF import simulate_CF, to_pydna
+from pydna_cf_simulator.polynucleotide import plasmid, dsDNA
+from tests.test_plan_CF import pTarg2_cf
+
+def test_register_and_get():
+    store = SequenceStore()
+    poly = plasmid('ACGT' * 50)
+    sequence_id = store.register(poly)
+
+    assert store.get(sequence_id) is poly
+    assert store.register(plasmid('ACGT' * 50)) == sequence_id
+    assert store.get(sequence_id) is poly
+    assert store.register(dsDNA('ACGT' * 50)) != sequence_id
+    assert store.get('nothing') is None
+
+def test_least_recently_used_dropped():
+    store = SequenceStore(max_sequences=2)
+    first, second = store.register(plasmid('A' * 200)), store.register(plasmid('C' * 200))
+    store.get(first)
+    third = store.register(plasmid('G' * 200))
+    assert first in store and third in store and second not in store
+
+def test_derived_kept_with_registered_sequences():
+    store = SequenceStore()
+    poly = plasmid('ACGT' * 50)
+    store.register(poly)
+    assert derived(poly, 'key', object) is derived(poly, 'key', object)
+    assert derived(plasmid('ACGT' * 50), 'key', object) is not derived(plasmid('ACGT' * 50), 'key', object)
+    assert to_pydna(poly) is to_pydna(poly)
+
+    store.clear()
+    assert derived(poly, 'key', object) is not derived(poly, 'key', object)
+
+def test_parse_sequence_ids():
+    store = SequenceStore()
+    template = parse_CF_shorthand(pTarg2_cf).sequences['pTargetF']
+    sequence_id = store.register(template)
+    cf = parse_CF_shorthand(f'pTargetF @{sequence_id}\nplasmid other @{sequence_id}', store)
+    assert cf.sequences['pTargetF'] is template and cf.sequences['other'] is template
+
+    with pytest.raises(ValueError, match=f"Sequence '@{sequence_id}' was not registered as dsdna"):
+        parse_CF_shorthand(f'dsdna pTargetF @{sequence_id}', store)
+    with pytest.raises(ValueError, match="Error in line 1: Unknown sequence ID '@abc'"):
+        parse_CF_shorthand('pTargetF @abc', store)
+    with pytest.raises(ValueError, match="Unknown sequence ID"):
+        parse_CF_shorthand(f'pTargetF @{sequence_id}')
+
+def test_simulate_with_sequence_ids():
+    store = SequenceStore()
+    cf = parse_CF_shorthand(pTarg2_cf)
+    lines = [line for line in pTarg2_cf.splitlines() if not line.startswith('plasmid')]
+    for name in ('p20N5', 'pTargetF'):
+        lines.append(f'{name} @{store.register(cf.sequences[name])}')
+
+    assert simulate_CF(parse_CF_shorthand('\n'.join(lines), store)) == simulate_CF(cf)
+
+def test_make_sequence():
+    assert make_sequence('acgt') == make_sequence('ACGT', 'oligo')
+    assert make_sequence('A' * 100).is_circular
+    assert not make_sequence('A' * 100, 'dsdna').is_circular
+    with pytest.raises(ValueError, match='Invalid sequence format'):
+        make_sequence('ACGU')
+    with pytest.raises(ValueError, match="Unknown sequence type 'rna'"):
+        make_sequence('ACGT', 'rna')
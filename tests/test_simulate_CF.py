@@ -1,5 +1,6 @@
 import pytest
-from pydna_cf_simulator.simulate_CF import simulate_CF
+from pydna_cf_simulator.simulate_CF import simulate_CF, simulate_CF_parallel, simulate_CF_stream, iter_simulate_CF
+from pydna_cf_simulator.parse_CF_shorthand import parse_CF_shorthand, iter_CF_shorthand
 from pydna_cf_simulator.construction_file import ConstructionFile, PCR, Digest, Ligate, GoldenGate, Gibson, Transform
 from pydna_cf_simulator.polynucleotide import Polynucleotide
 
@@ -219,6 +220,80 @@ def test_simulate_ligate_single_circular():
     expected = Polynucleotide('GATCGTATACCCA', '', '', True, True, '', '')
     assert result['product'] == expected
 
+def test_simulate_ligate_3prime_overhang_circular():
+    # Define sequences
+    polyL = Polynucleotide('GTATACCCA', '-TGCA', '-ACGT', True, False, 'phosphate', 'phosphate')
+    polyR = Polynucleotide('CATATGCAG', '-ACGT', '-TGCA', True, False, 'phosphate', 'phosphate')
+
+    # Define steps
+    step = Ligate(['polyL', 'polyR'], 'product')
+
+    # Define ConstructionFile
+    cf = ConstructionFile([step], {'polyL': polyL, 'polyR': polyR})
+
+    # Simulate ConstructionFile
+    result = simulate_CF(cf)
+
+    # Assert that the product is correct
+    expected = Polynucleotide('TGCAGTATACCCAACGTCATATGCAG', '', '', True, True, '', '')
+    assert result['product'] == expected
+
+def test_simulate_ligate_many_parts():
+    # Define sequences
+    parts = {f'part{i}': Polynucleotide('ACGTTGCA', 'GATC', 'GATC', True, False, 'phosphate', 'phosphate') for i in range(200)}
+
+    # Define steps
+    step = Ligate(list(parts), 'product')
+
+    # Define ConstructionFile
+    cf = ConstructionFile([step], parts)
+
+    # Simulate ConstructionFile
+    result = simulate_CF(cf)
+
+    # Assert that the product is correct
+    expected = Polynucleotide('GATCACGTTGCA' * 200, '', '', True, True, '', '')
+    assert result['product'] == expected
+
+def test_simulate_ligate_one_phosphate_stays_linear():
+    # Define sequences
+    polyL = Polynucleotide('GTATACCCA', 'AATT', 'GATC', True, False, 'hydroxyl', 'phosphate')
+    polyR = Polynucleotide('CATATGCAG', 'GATC', 'AATT', True, False, 'phosphate', 'phosphate')
+
+    # Define ConstructionFile
+    cf = ConstructionFile([Ligate(['polyL', 'polyR'], 'product')], {'polyL': polyL, 'polyR': polyR})
+
+    # Simulate ConstructionFile
+    result = simulate_CF(cf)
+
+    # Both 5' ends must be phosphorylated to circularize, as before
+    expected = Polynucleotide('GTATACCCAGATCCATATGCAG', 'AATT', 'AATT', True, False, 'hydroxyl', 'phosphate')
+    assert result['product'] == expected
+
+def test_simulate_ligate_incompatible_ends():
+    # Define sequences
+    polyL = Polynucleotide('GTATACCCA', '', 'GATC', True, False, 'phosphate', 'phosphate')
+    polyR = Polynucleotide('CATATGCAG', 'AATT', '', True, False, 'phosphate', 'phosphate')
+
+    # Define ConstructionFile
+    cf = ConstructionFile([Ligate(['polyL', 'polyR'], 'product')], {'polyL': polyL, 'polyR': polyR})
+
+    # Simulate ConstructionFile
+    with pytest.raises(ValueError, match="'polyL' and 'polyR'"):
+        simulate_CF(cf)
+
+def test_simulate_ligate_unphosphorylated_ends():
+    # Define sequences
+    polyL = Polynucleotide('GTATACCCA', '', 'GATC', True, False, 'hydroxyl', 'hydroxyl')
+    polyR = Polynucleotide('CATATGCAG', 'GATC', '', True, False, 'hydroxyl', 'hydroxyl')
+
+    # Define ConstructionFile
+    cf = ConstructionFile([Ligate(['polyL', 'polyR'], 'product')], {'polyL': polyL, 'polyR': polyR})
+
+    # Simulate ConstructionFile
+    with pytest.raises(ValueError, match="cannot be ligated"):
+        simulate_CF(cf)
+
 def test_simulate_Gibson():
     # Define sequences
     poly1 = Polynucleotide('GAACTACTTACTCTAGCTTCCCGGCAACAATTAATAGACTGGATGGAGGCGGATAAAGTTGCAGGACCACTTCTGCGCTCGGCCCTTCCGGCTGGCTG', '', '', True, False, '', '')
@@ -236,3 +311,43 @@ def test_simulate_Gibson():
     # Assert that the product is correct
     expected = Polynucleotide('GAACTACTTACTCTAGCTTCCCGGCAACAATTAATAGACTGGATGGAGGCGGATAAAGTTGCAGGACCACTTCTGCGCTCGGCCCTTCCGGCTGGCTGGTTTATT', '', '', True, True, '', '')
     assert result['product'] == expected
+
+def test_simulate_CF_stream():
+    lines = ['Digest cut EcoRI 0 half\n', 'Digest sequence BamHI 0 cut\n',
+             'sequence ' + 'GAGTCGAATTCATACGAGGGATCCAATCG' * 4 + '\n', 'other ACGT\n']
+    read = []
+    def chunks():
+        for line in lines:
+            read.append(line)
+            yield line
+
+    products = simulate_CF_stream(iter_CF_shorthand(chunks()))
+
+    # Both steps run as soon as the sequence is read
+    expected = simulate_CF_parallel(parse_CF_shorthand(''.join(lines)))
+    assert next(products) == ('cut', expected['cut'])
+    assert next(products) == ('half', expected['half'])
+    assert len(read) == 3
+    assert list(products) == []
+
+def test_simulate_CF_stream_undefined_input():
+    with pytest.raises(ValueError, match="Step 1 \\(Ligate product\\) uses undefined input 'b'"):
+        list(simulate_CF_stream(iter_CF_shorthand('Ligate a b product\na ' + 'A' * 100)))
+
+def test_simulate_CF_stream_long_chain():
+    # 1,500 PCRs, each amplifying the one before, listed before the sequences they need
+    lines = [f'PCR f r p{i - 1} p{i}\n' for i in range(1, 1501)]
+    lines += ['f CCGCAACACACTTAACCTTG\n', 'r GTGGTTGTGGCCGGTCAAATC\n',
+              'dsdna p0 CCGCAACACACTTAACCTTGGCGTCGGGATACGTACATTGGAGAACGGTTGGCTGTACGGACTTAATGATTTGACCGGCCACAACCACCG\n']
+    products = list(simulate_CF_stream(iter_CF_shorthand(lines)))
+    assert [name for name, _ in products] == [f'p{i}' for i in range(1, 1501)]
+    assert products[-1][1] == products[0][1]
+
+def test_iter_simulate_CF():
+    cf = parse_CF_shorthand('Digest sequence EcoRI 0 cut\nDigest cut BamHI 0 half\nsequence ' + 'GAGTCGAATTCATACGAGGGATCCAATCG' * 4 + '\n')
+    products = iter_simulate_CF(cf)
+
+    expected = simulate_CF(cf)
+    assert next(products) == ('cut', expected['cut'])
+    assert list(products) == [('half', expected['half'])]
+    assert list(iter_simulate_CF(cf, targets=['cut'])) == [('cut', expected['cut'])]
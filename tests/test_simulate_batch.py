@@ -0,0 +1,75 @@
+import multiprocessing
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from pydna_cf_simulator import simulate_batch as simulate_batch_module
+from pydna_cf_simulator.simulate_batch import simulate_batch, simulate_shorthand, WORKER_DIED
+from pydna_cf_simulator.polynucleotide import Polynucleotide
+from pydna_cf_simulator.limits import SimulationLimits
+
+pcr_cf = """
+forward CCGCAACACACTTAACCTTG
+reverse GTGGTTGTGGCCGGTCAAATC
+template CCGCAACACACTTAACCTTGGCGTCGGGATACGTACATTGGAGAACGGTTGGCTGTACGGACTTAATACTTTTTATGATAATGATTTGACCGGCCACAACCACCG
+PCR forward reverse template product
+"""
+
+digest_cf = """
+dsdna sequence GAGTCGAATTCATACGAGGGATCCAATCG
+Digest sequence EcoRI,BamHI 1 product
+"""
+
+def test_simulate_batch_preserves_order():
+    results = simulate_batch([pcr_cf, digest_cf, pcr_cf], processes=2)
+
+    assert len(results) == 3
+    assert results[0]['result']['product'].sequence == 'CCGCAACACACTTAACCTTGGCGTCGGGATACGTACATTGGAGAACGGTTGGCTGTACGGACTTAATACTTTTTATGATAATGATTTGACCGGCCACAACCAC'
+    assert results[1]['result']['product'] == Polynucleotide('CATACGAGG', 'AATT', 'GATC', True, False, 'phosphate', 'phosphate')
+    assert results[2]['result']['product'] == results[0]['result']['product']
+
+def test_simulate_batch_isolates_failures():
+    bad_cf = "PCR forward reverse missing_template product"
+    results = simulate_batch([pcr_cf, bad_cf, digest_cf], processes=2)
+
+    assert 'result' in results[0]
+    assert set(results[1]) == {'error'}
+    assert 'result' in results[2]
+
+def test_simulate_batch_limits():
+    results = simulate_batch([pcr_cf, digest_cf], processes=2, limits=SimulationLimits(max_total_length=150))
+
+    assert results[0]['limit'] == 'max_total_length'
+    assert results[1]['result']['product'] == Polynucleotide('CATACGAGG', 'AATT', 'GATC', True, False, 'phosphate', 'phosphate')
+
+class UnpicklableError(Exception):
+    def __init__(self):
+        super().__init__('cannot be sent back')
+        self.callback = lambda: None
+
+def test_errors_returned_as_plain_dicts(monkeypatch):
+    def fail(cf, cache):
+        raise UnpicklableError()
+
+    monkeypatch.setattr(simulate_batch_module, 'simulate_CF', fail)
+    result = simulate_shorthand(pcr_cf)
+    assert result == {'error': 'cannot be sent back'}
+    assert pickle.loads(pickle.dumps(result)) == result
+
+def crash_on_marker(cf_shorthand, limits):
+    # Let the earlier CFs' results come back, then die as an out-of-memory kill would
+    if cf_shorthand == 'crash':
+        time.sleep(0.5)
+        os._exit(1)
+    return simulate_shorthand(cf_shorthand, limits)
+
+def test_dead_worker_fails_only_unfinished_CFs(monkeypatch):
+    monkeypatch.setattr(simulate_batch_module, 'simulate_shorthand', crash_on_marker)
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('fork')) as executor:
+        results = simulate_batch([pcr_cf, 'crash', digest_cf], executor=executor)
+        assert 'result' in results[0]
+        assert results[1:] == [{'error': WORKER_DIED}] * 2
+
+        # A pool that already lost a worker fails the whole batch the same way
+        assert simulate_batch([pcr_cf], executor=executor) == [{'error': WORKER_DIED}]
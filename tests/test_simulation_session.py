@@ -0,0 +1,57 @@
+from pydna_cf_simulator.simulation_session import SimulationSession
+from pydna_cf_simulator.simulate_CF import simulate_CF
+from pydna_cf_simulator.parse_CF_shorthand import parse_CF_shorthand
+from tests.test_plan_CF import pTarg2_cf
+
+def test_first_run_simulates_everything():
+    session = SimulationSession()
+    result = session.simulate(parse_CF_shorthand(pTarg2_cf))
+    assert result == simulate_CF(parse_CF_shorthand(pTarg2_cf))
+    assert session.rerun == ['pcrA', 'pcrB', 'gib', 'pTarg2']
+
+def test_unchanged_cf_reuses_everything():
+    session = SimulationSession()
+    first = session.simulate(parse_CF_shorthand(pTarg2_cf))
+    second = session.simulate(parse_CF_shorthand(pTarg2_cf))
+    assert session.rerun == []
+    assert second == first
+    assert second['gib'] is first['gib']
+
+def test_changed_template_reruns_downstream():
+    session = SimulationSession()
+    first = session.simulate(parse_CF_shorthand(pTarg2_cf))
+    # A point mutation in the template of pcrB
+    edited = pTarg2_cf.replace('tacgcatctgtgcgg', 'tacgcatgtgtgcgg')
+    assert edited != pTarg2_cf
+    result = session.simulate(parse_CF_shorthand(edited))
+    assert session.rerun == ['pcrB', 'gib', 'pTarg2']
+    assert result['pcrA'] is first['pcrA']
+    assert result == simulate_CF(parse_CF_shorthand(edited))
+
+def test_changed_step_reruns_downstream():
+    session = SimulationSession()
+    session.simulate(parse_CF_shorthand(pTarg2_cf))
+    edited = pTarg2_cf.replace('Transform gib Mach1 Amp pTarg2', 'Transform gib DH10B Amp pTarg2')
+    session.simulate(parse_CF_shorthand(edited))
+    assert session.rerun == ['pTarg2']
+
+def test_targets():
+    session = SimulationSession()
+    result = session.simulate(parse_CF_shorthand(pTarg2_cf), targets=['pcrB'])
+    assert list(result) == ['pcrB']
+    assert session.rerun == ['pcrB']
+    session.simulate(parse_CF_shorthand(pTarg2_cf))
+    assert session.rerun == ['pcrA', 'gib', 'pTarg2']
+
+def test_iter_simulate():
+    session = SimulationSession()
+    cf = parse_CF_shorthand(pTarg2_cf)
+    products = session.iter_simulate(cf)
+    assert next(products)[0] == 'pcrA'
+    # An unfinished run is not kept
+    products.close()
+    assert session.simulate(cf) == simulate_CF(cf)
+    assert session.rerun == ['pcrA', 'pcrB', 'gib', 'pTarg2']
+
+    assert [name for name, _ in session.iter_simulate(cf)] == ['pcrA', 'pcrB', 'gib', 'pTarg2']
+    assert session.rerun == []
@@ -0,0 +1,58 @@
+import pytest
+from pydna_cf_simulator.simulate_CF import simulate_CF
+from pydna_cf_simulator.step_cache import StepCache, step_key, polynucleotide_size, ENTRY_OVERHEAD
+from pydna_cf_simulator.construction_file import ConstructionFile, PCR, Digest, Transform
+from pydna_cf_simulator.polynucleotide import Polynucleotide
+from pydna_cf_simulator.packed_sequence import PackedSequence
+
+forward = Polynucleotide('CCGCAACACACTTAACCTTG', '', '', False, False, 'hydroxyl', 'hydroxyl')
+reverse = Polynucleotide('GTGGTTGTGGCCGGTCAAATC', '', '', False, False, 'hydroxyl', 'hydroxyl')
+template = Polynucleotide('CCGCAACACACTTAACCTTGGCGTCGGGATACGTACATTGGAGAACGGTTGGCTGTACGGACTTAATACTTTTTATGATAATGATTTGACCGGCCACAACCACCG', '', '', True, False, 'phosphate', 'phosphate')
+
+def test_step_key_ignores_names():
+    key1 = step_key(PCR('f', 'r', 't', 'p1'), {'f': forward, 'r': reverse, 't': template})
+    key2 = step_key(PCR('fwd', 'rev', 'tmp', 'p2', 120), {'fwd': forward, 'rev': reverse, 'tmp': template})
+    assert key1 == key2
+
+def test_step_key_depends_on_content_and_parameters():
+    sequences = {'f': forward, 'r': reverse, 't': template}
+    assert step_key(PCR('f', 'r', 't', 'p'), sequences) != step_key(PCR('r', 'f', 't', 'p'), sequences)
+    assert step_key(Digest('t', ['EcoRI'], 0, 'p'), sequences) != step_key(Digest('t', ['EcoRI'], 1, 'p'), sequences)
+    assert step_key(Transform('t', 'Mach1', ['Amp'], 'p'), sequences) is None
+
+def test_simulate_CF_with_cache():
+    cache = StepCache()
+    steps = [PCR('f', 'r', 't', 'p1'), PCR('f', 'r', 't', 'p2')]
+    cf = ConstructionFile(steps, {'f': forward, 'r': reverse, 't': template})
+
+    result = simulate_CF(cf, cache=cache)
+
+    assert result['p1'] == result['p2'] == simulate_CF(cf)['p1']
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    simulate_CF(cf, cache=cache)
+    assert (cache.hits, cache.misses) == (3, 1)
+
+def test_cache_lru_eviction():
+    cache = StepCache(max_bytes=2 * (300 + ENTRY_OVERHEAD))
+    polys = [Polynucleotide('A' * 300, '', '', True, False, None, None) for _ in range(3)]
+
+    cache.put('a', polys[0])
+    cache.put('b', polys[1])
+    assert cache.get('a') is polys[0]
+    cache.put('c', polys[2])
+
+    assert cache.get('b') is None
+    assert cache.get('a') is polys[0]
+    assert cache.get('c') is polys[2]
+    assert cache.current_bytes <= cache.max_bytes
+
+def test_compact_size_from_packed_buffer(monkeypatch):
+    poly = Polynucleotide('ACGT' * 250 + 'N', 'AATT', '', True, False, None, None).compact()
+    # Sizing a packed product must not decode it
+    monkeypatch.setattr(PackedSequence, '__str__', lambda self: pytest.fail('sequence decoded'))
+    assert polynucleotide_size(poly) == 251 + 4 + 1 + 4 + ENTRY_OVERHEAD
+
+    cache = StepCache()
+    cache.put('a', poly)
+    assert cache.current_bytes == polynucleotide_size(poly)
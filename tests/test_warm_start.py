@@ -0,0 +1,26 @@
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from pydna_cf_simulator.warm_start import warm_context, warm_up
+from pydna_cf_simulator.simulate_CF import simulate_CF
+from pydna_cf_simulator.parse_CF_shorthand import parse_CF_shorthand
+from tests.test_plan_CF import pTarg2_cf
+
+def loaded_modules(*names):
+    return [name in sys.modules for name in names]
+
+def test_heavy_imports_are_lazy():
+    statement = ('import sys, app, asgi, pydna_cf_simulator; '
+                 'print("pydna" in sys.modules, "Bio.Restriction" in sys.modules)')
+    output = subprocess.run([sys.executable, '-c', statement], capture_output=True, text=True, check=True).stdout
+    assert output.split() == ['False', 'False']
+
+def test_warm_up():
+    warm_up()
+    assert loaded_modules('pydna.amplify', 'Bio.Restriction') == [True, True]
+    assert simulate_CF(parse_CF_shorthand(pTarg2_cf))['pTarg2'].is_circular
+
+def test_workers_start_warm():
+    with ProcessPoolExecutor(1, mp_context=warm_context()) as pool:
+        assert pool.submit(loaded_modules, 'pydna.amplify', 'Bio.Restriction').result() == [True, True]